@@ -5,297 +5,302 @@ Includes all steps with bulk HTML styling
 
 import streamlit as st
 import pandas as pd
-import json
+import atexit
+import importlib.machinery
 import io
-import re
-from typing import List, Dict, Any
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Callable
+
+import perf
+from styling import process_pipe_separated_data
+from engine import (
+    LRUCache, estimate_nbytes, upload_digest, dataframe_to_csv_bytes,
+    dataframe_to_parquet_bytes, parse_geojson_uploads, parse_workers, iter_upload_sources, gc_paused, JSON_BACKEND,
+    geojson_to_dataframe, read_geojson_dataframe, geometry_sidecar_bytes,
+    read_geometry_sidecar, feature_ids_digest, dataframe_to_geojson_bytes, iter_combined_features,
+    JoinIndex, STYLING_CHUNK_SIZE, GeometrySimplifier, METERS_PER_DEGREE, PolygonIndex, frame_geometries,
+    write_geojson_archive, ARCHIVE_MAX_FEATURES, ARCHIVE_MAX_ZOOM, compact_dataframe,
+    blank_tokens, expand_dataframe, dataframe_to_geojsonseq_bytes,
+)
+from pipeline import (
+    read_table, read_tables, table_kind, join_attributes, bulk_apply_html_styling, make_styling_cache,
+)
+
+# Streamlit runs this script as a "__main__" module without a spec, which
+# spawned worker processes (engine.process_pool) would re-execute as their
+# own main module. With a spec named "__main__" multiprocessing leaves it
+# alone; the workers only need engine, pipeline and styling.
+__spec__ = importlib.machinery.ModuleSpec("__main__", None)
 
 st.set_page_config(page_title="GeoJSON ↔ CSV Bulk Editor", layout="wide")
 st.title("GeoJSON ↔ CSV Bulk Editor — Complete Workflow")
 
+# Stage timings of this session, shown in the Performance panel at the bottom.
+perf.use_records(st.session_state.setdefault("perf_records", []))
+
 # --------------------------
 # --- IMPROVED Helper functions -----
 # --------------------------
 
-def read_csv_with_fallback(file_buffer):
-    try:
-        file_buffer.seek(0)
-        df = pd.read_csv(file_buffer, encoding='utf-8', dtype=str, keep_default_na=False)
-        st.success("✅ CSV dibaca dengan encoding: UTF-8")
-        return df
-    except UnicodeDecodeError:
-        st.warning("❌ UTF-8 gagal, mencoba Latin-1...")
-    try:
-        file_buffer.seek(0)
-        df = pd.read_csv(file_buffer, encoding='latin-1', dtype=str, keep_default_na=False)
-        st.success("✅ CSV dibaca dengan encoding: Latin-1")
-        return df
-    except UnicodeDecodeError:
-        st.warning("❌ Latin-1 gagal, mencoba CP1252...")
-    try:
-        file_buffer.seek(0)
-        df = pd.read_csv(file_buffer, encoding='cp1252', dtype=str, keep_default_na=False)
-        st.success("✅ CSV dibaca dengan encoding: CP1252")
-        return df
-    except Exception as e:
-        st.error(f"❌ Semua encoding gagal: {e}")
-        return None
-
-def read_xlsx_with_fallback(file_buffer):
-    try:
-        file_buffer.seek(0)
-        df = pd.read_excel(file_buffer, dtype=str, keep_default_na=False)
-        st.success("✅ XLSX berhasil dibaca")
-        return df
-    except Exception as e:
-        st.error(f"❌ Gagal membaca XLSX: {e}")
-        return None
-
-def geojson_to_dataframe(geojson: Dict[str, Any]) -> pd.DataFrame:
-    features = geojson.get("features", [])
-    rows = []
-    for i, feat in enumerate(features):
-        props = feat.get("properties", {}) or {}
-        geom = feat.get("geometry", None)
-        fid = feat.get("id", f"feature_{i}")
-        
-        row = {"_feature_id": fid, "geometry_json": json.dumps(geom) if geom else ""}
-        
-        for k, v in props.items():
-            row[k] = v
-            
-        rows.append(row)
-    
-    if not rows:
-        return pd.DataFrame()
-        
-    df = pd.DataFrame(rows)
-    cols = ["_feature_id", "geometry_json"] + [c for c in df.columns if c not in ("_feature_id", "geometry_json")]
-    return df[cols]
-
-def dataframe_to_geojson(df: pd.DataFrame) -> Dict[str, Any]:
-    features = []
-    for _, row in df.iterrows():
-        geom_json = row.get("geometry_json", "")
-        try:
-            geom = json.loads(geom_json) if pd.notna(geom_json) and geom_json and geom_json.strip() else None
-        except:
-            geom = None
-            
-        props = {}
-        for col in df.columns:
-            if col not in ("geometry_json", "_feature_id"):
-                value = row[col]
-                if pd.notna(value) and value != "":
-                    props[col] = value
-        
-        features.append({
-            "type": "Feature",
-            "properties": props,
-            "geometry": geom,
-            "id": row.get("_feature_id")
-        })
-    
-    return {"type": "FeatureCollection", "features": features}
-
-def combine_geojson_files(geojson_files: List[Dict[str, Any]]) -> Dict[str, Any]:
-    all_features = []
-    feature_ids = set()
-    for geojson_obj in geojson_files:
-        for feature in geojson_obj.get("features", []):
-            original_id = feature.get("id")
-            if original_id and original_id in feature_ids:
-                counter = 1
-                new_id = f"{original_id}_{counter}"
-                while new_id in feature_ids:
-                    counter += 1
-                    new_id = f"{original_id}_{counter}"
-                feature["id"] = new_id
-                st.warning(f"⚠️ Duplicate ID '{original_id}' renamed to '{new_id}'")
-            if feature.get("id"):
-                feature_ids.add(feature["id"])
-            all_features.append(feature)
-    return {"type":"FeatureCollection","features":all_features}
-
-def clean_dataframe(df):
-    if df is None:
-        return None
-        
-    df = df.copy()
-    df = df.replace(['', 'NaN', 'NaT', 'None', 'nan', 'N/A'], None)
-    df = df.fillna('')
-    
-    for col in df.columns:
-        df[col] = df[col].astype(str)
-        
-    return df
-
-def join_attributes(main_df, add_df, join_key):
-    if main_df is None or add_df is None:
-        return None
-        
-    main_df = clean_dataframe(main_df)
-    add_df = clean_dataframe(add_df)
-    
-    if join_key not in main_df.columns:
-        st.error(f"❌ Key '{join_key}' tidak ditemukan di file utama. Kolom yang tersedia: {list(main_df.columns)}")
-        return None
-        
-    if join_key not in add_df.columns:
-        st.error(f"❌ Key '{join_key}' tidak ditemukan di file tambahan. Kolom yang tersedia: {list(add_df.columns)}")
-        return None
-    
-    main_df[join_key] = main_df[join_key].astype(str).str.strip()
-    add_df[join_key] = add_df[join_key].astype(str).str.strip()
-    
-    joined = pd.merge(main_df, add_df, on=join_key, how="left", suffixes=('', '_add'))
-    
-    for col in joined.columns:
-        if col.endswith('_add'):
-            original_col = col[:-4]
-            if original_col in joined.columns:
-                joined = joined.drop(columns=[col])
-    
-    st.success(f"✅ Join berhasil! {len(main_df)} records digabung dengan {len(add_df)} records")
-    return joined
+# Parsed uploads, converted frames and download payloads, keyed by a hash of
+# the uploaded bytes plus the parameters, so widget reruns skip the work.
+UPLOAD_CACHE_MAX_BYTES = int(os.environ.get("UPLOAD_CACHE_MB", "512")) * 1024 * 1024
+UPLOAD_CACHE_MAX_ENTRIES = 256
+
+_CACHE_MISS = object()
+
+@st.cache_resource
+def get_upload_cache() -> LRUCache:
+    return LRUCache(UPLOAD_CACHE_MAX_ENTRIES, max_bytes=UPLOAD_CACHE_MAX_BYTES, sizeof=estimate_nbytes)
+
+def cached_by_content(stage: str, digest: str, compute: Callable[[], Any], *params):
+    """Return ``compute()`` memoized under (stage, digest, params).
+
+    Cached values are shared between reruns and sessions: treat them as
+    read-only. ``None`` results and exceptions are not cached.
+    """
+    cache = get_upload_cache()
+    key = (stage, digest) + params
+    value = cache.get(key, _CACHE_MISS)
+    if value is _CACHE_MISS:
+        value = compute()
+        if value is not None:
+            cache.put(key, value)
+    else:
+        perf.event(f"{stage} (cache)", cached=True)
+    return value
+
+def read_uploaded_table(uploaded_file) -> Optional[pd.DataFrame]:
+    """Read a CSV/XLSX/Parquet/GeoJSON upload into a compacted frame (cached by content)."""
+    return cached_by_content(f"read_{table_kind(uploaded_file.name)}", upload_digest(uploaded_file),
+                             lambda: read_table(uploaded_file, reporter=st))
+
+def read_uploaded_tables(uploaded_files) -> List[Optional[pd.DataFrame]]:
+    """read_uploaded_table for several uploads; those not cached yet are read concurrently, with per-file timing."""
+    cache = get_upload_cache()
+    keys = [(f"read_{table_kind(f.name)}", upload_digest(f)) for f in uploaded_files]
+    pending = [i for i, key in enumerate(keys) if key not in cache]
+    frames = {}
+    if len(pending) > 1:
+        results = read_tables([(uploaded_files[i].name, uploaded_files[i].getvalue()) for i in pending])
+        for i, (df, messages, seconds) in zip(pending, results):
+            messages.replay(st)
+            st.caption(f"⏱️ {uploaded_files[i].name} dibaca dalam {seconds:.2f} s")
+            frames[i] = df if df is None else cached_by_content(*keys[i], lambda: df)
+    return [frames[i] if i in frames else read_uploaded_table(f) for i, f in enumerate(uploaded_files)]
 
 # --------------------------
 # --- STEP D: BULK HTML STYLING FOR PIPE-SEPARATED DATA
 # --------------------------
 
-def create_universal_html(fields, style_type="default"):
-    styles = {
-        "road": {"background": "#e8f4fd", "border": "2px solid #b8daff"},
-        "poi": {"background": "#e8f4fd", "border": "2px solid #b8daff"},
-        "default": {"background": "#e8f4fd", "border": "2px solid #b8daff"}
-    }
-    
-    style = styles.get(style_type, styles["default"])
-    
-    fields_html = ""
-    for field_name, field_value in fields.items():
-        if field_value and field_value.strip():
-            fields_html += f'''
-  <div style="display: flex; align-items: start; margin-bottom: 8px;">
-  <div style="min-width: 160px; font-weight: bold; color: #2c3e50;">{field_name}</div>
-  <div style="flex: 1;">: {field_value}</div>
-  </div>
-'''
-    
-    html_template = f'''
-<div style="font-family: Arial, sans-serif; background: {style['background']}; border: {style['border']}; border-radius: 8px; padding: 15px; margin-bottom: 20px;">
-<div style="display: grid; gap: 8px;">
-{fields_html}
-</div>
-</div>
-'''
-    return html_template.strip()
-
-def standardize_indonesian(text):
-    if not text or pd.isna(text):
-        return ""
-        
-    text = str(text)
-    replacements = {
-        r'\bbisa di lalu\b': 'Dapat dilalui',
-        r'\bdi lalu\b': 'dilalui',
-        r'\bdi pakai\b': 'dipakai',
-        r'\bdi jadikan\b': 'dijadikan',
-        r'\bdi rencanakan\b': 'direncanakan',
-        r'\bdi pake\b': 'dipakai',
-        r'\bhelp\b': 'helip',
-        r'\b(\d)\s*m\b': r'\1 m',
-        r'\b(\d)\s*are\b': r'\1 are',
-        r'\+\-\s*': '±',
-        r'^\s*jalur\s*': '',
-    }
-    
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    
-    return text.strip()
-
-def extract_fields_from_pipe(text):
-    fields = {}
-    
-    if not text or pd.isna(text):
-        return fields
-        
-    text = str(text)
-    parts = [part.strip() for part in text.split('|') if part.strip()]
-    
-    for part in parts:
-        if ':' in part:
-            field_parts = part.split(':', 1)
-            field_name = field_parts[0].strip()
-            field_value = field_parts[1].strip() if len(field_parts) > 1 else ""
-            
-            field_name = field_name.replace('Nama PO', 'Nama Fasilitas')
-            field_name = field_name.replace('Kontak person', 'Kontak Person')
-            
-            if field_value:
-                fields[field_name] = standardize_indonesian(field_value)
-        else:
-            if 'Informasi' not in fields:
-                fields['Informasi'] = standardize_indonesian(part)
-            else:
-                fields['Informasi'] += f", {standardize_indonesian(part)}"
-    
-    return fields
-
-def process_pipe_separated_data(text):
-    if not text or pd.isna(text):
-        return ""
-        
-    fields = extract_fields_from_pipe(text)
-    
-    if not fields:
-        return "<div style='padding: 10px; background: #f8f9fa; border: 1px solid #dee2e6; border-radius: 4px;'>No data to display</div>"
-    
-    return create_universal_html(fields, "poi")
-
-def bulk_apply_html_styling(df, columns_to_style):
-    if df is None or df.empty:
-        return df
-        
-    df_styled = df.copy()
-    
-    for col in columns_to_style:
-        if col in df_styled.columns:
-            new_col_name = f"{col}_styled"
-            df_styled[new_col_name] = df_styled[col].apply(process_pipe_separated_data)
-            st.write(f"✅ Styled column: {col} → {new_col_name} ({len(df_styled)} cells processed)")
-    
-    return df_styled
+@st.cache_resource
+def get_styling_cache() -> LRUCache:
+    # Shared by every column, rerun and session of this server process;
+    # bounded by STYLING_CACHE_MB (default 128).
+    return make_styling_cache()
+
+def simplification_controls(key: str) -> Optional[tuple]:
+    """Optional rounding/simplification settings for a GeoJSON export: (tolerance in degrees, decimals) or None."""
+    with st.expander("🪶 Sederhanakan geometri (opsional)"):
+        enabled = st.checkbox("Bulatkan koordinat & sederhanakan garis/poligon", value=False, key=f"{key}_simplify")
+        precision = st.number_input(
+            "Jumlah desimal koordinat", min_value=0, max_value=15, value=6, step=1,
+            key=f"{key}_precision", help="6 desimal ≈ 11 cm, 5 desimal ≈ 1,1 m"
+        )
+        tolerance_m = st.number_input(
+            "Toleransi penyederhanaan (meter, 0 = hanya pembulatan)", min_value=0.0, max_value=10_000.0,
+            value=1.0, step=0.5, key=f"{key}_tolerance"
+        )
+    if not enabled:
+        return None
+    return tolerance_m / METERS_PER_DEGREE, int(precision)
+
+def show_simplification_stats(stats: Dict[str, int]):
+    if not stats or not stats["geometries"]:
+        return
+    saved = 1 - stats["bytes_after"] / stats["bytes_before"] if stats["bytes_before"] else 0
+    st.caption(
+        f"🪶 {stats['geometries']} geometri: {stats['vertices_before']:,} → {stats['vertices_after']:,} vertex, "
+        f"≈ {stats['bytes_before'] / 1024:,.0f} → {stats['bytes_after'] / 1024:,.0f} KB geometri (−{saved:.0%})"
+    )
+
+# GeoJSON documents and GeoJSONSeq (one feature per line) are both accepted.
+GEOJSON_UPLOAD_TYPES = ["geojson", "json", "geojsonl", "geojsons", "geojsonseq", "ndjson", "jsonl"]
+
+# Step D output: the HTML popup column, one column per pipe field, or both.
+STYLING_OUTPUT_LABELS = {
+    "html": "🎨 HTML (`<kolom>_styled`)",
+    "fields": "🧩 Kolom per field",
+    "both": "🎨+🧩 Keduanya",
+}
+
+ARCHIVE_MODE_LABELS = {
+    "single": "📄 Satu file GeoJSON",
+    "geojsonseq": "📜 GeoJSONSeq (satu feature per baris)",
+    "grid": "🧱 Zip: tile grid (zoom tetap)",
+    "quadtree": "🌳 Zip: quadtree (maks. feature per tile)",
+    "chunks": "📦 Zip: chunk (maks. feature / ukuran per file)",
+}
+
+def archive_controls(key: str) -> Optional[Dict[str, Any]]:
+    """Export settings: None for one GeoJSON file, {"mode": "geojsonseq", "rs": ...} for GeoJSONSeq,
+    else the tiled/chunked zip settings (keyword args of write_geojson_archive)."""
+    with st.expander("🧱 Export GeoJSONSeq / per tile / chunk untuk layer besar (opsional)"):
+        mode = st.radio("Format download:", list(ARCHIVE_MODE_LABELS), format_func=ARCHIVE_MODE_LABELS.get,
+                        key=f"{key}_archive_mode")
+        settings = {"mode": mode}
+        if mode == "geojsonseq":
+            settings["rs"] = st.checkbox(
+                "Awali tiap record dengan RS (RFC 8142, .geojsons)", value=False, key=f"{key}_seq_rs",
+                help="Tanpa RS: newline-delimited GeoJSON (.geojsonl), dibaca GDAL/ogr2ogr dan tippecanoe."
+            )
+        elif mode == "grid":
+            settings["zoom"] = int(st.number_input("Zoom tile (XYZ)", min_value=0, max_value=22, value=12,
+                                                   key=f"{key}_archive_zoom", help="zoom 12 ≈ tile 10 km"))
+        elif mode == "quadtree":
+            settings["max_features"] = int(st.number_input(
+                "Maks. feature per tile", min_value=100, max_value=1_000_000, value=ARCHIVE_MAX_FEATURES,
+                step=1000, key=f"{key}_archive_max_features"
+            ))
+            settings["max_zoom"] = int(st.number_input("Zoom maksimum", min_value=1, max_value=22,
+                                                       value=ARCHIVE_MAX_ZOOM, key=f"{key}_archive_max_zoom"))
+        elif mode == "chunks":
+            max_features = st.number_input("Maks. feature per file (0 = tanpa batas)", min_value=0,
+                                           max_value=10_000_000, value=ARCHIVE_MAX_FEATURES, step=1000,
+                                           key=f"{key}_archive_max_features")
+            max_mb = st.number_input("Maks. ukuran per file, MB (0 = tanpa batas)", min_value=0.0,
+                                     max_value=10_000.0, value=0.0, step=5.0, key=f"{key}_archive_max_mb")
+            settings["max_features"] = int(max_features) or None
+            settings["max_bytes"] = int(max_mb * 1024 * 1024) or None
+        if mode not in ("single", "geojsonseq"):
+            st.caption("Zip berisi file GeoJSON per tile/chunk dan index.json (path, jumlah feature, bbox tiap file).")
+    return None if mode == "single" else settings
+
+# Zip downloads are written to files in one temp directory per server
+# process. The oldest files are unlinked once there are too many or they
+# take too much space, whichever session built them; the directory goes at exit.
+ARCHIVE_TEMP_MAX_FILES = 16
+ARCHIVE_TEMP_MAX_BYTES = int(os.environ.get("ARCHIVE_TEMP_MB", "2048")) * 1024 * 1024
+
+@st.cache_resource
+def get_archive_files() -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="umap_styler_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return {"dir": directory, "files": OrderedDict(), "lock": threading.Lock()}
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def register_archive_file(path: str, replaces: Optional[str] = None) -> None:
+    """Track a new zip (unlinking ``replaces``) and evict the oldest zips beyond the count/size limits."""
+    registry = get_archive_files()
+    files = registry["files"]
+    with registry["lock"]:
+        if replaces is not None:
+            files.pop(replaces, None)
+            _unlink(replaces)
+        files[path] = os.path.getsize(path)
+        # The newest file is never evicted, however big: it is being offered right now.
+        while len(files) > 1 and (len(files) > ARCHIVE_TEMP_MAX_FILES or sum(files.values()) > ARCHIVE_TEMP_MAX_BYTES):
+            old_path, _ = files.popitem(last=False)
+            _unlink(old_path)
+
+def geojsonseq_file_name(base: str, settings: Dict[str, Any]) -> str:
+    return f"{base}.geojsons" if settings["rs"] else f"{base}.geojsonl"
+
+def geojson_archive_download(key: str, make_frame: Callable[[], pd.DataFrame], geometry_store,
+                             settings: Dict[str, Any], simplify_settings: Optional[tuple],
+                             file_name: str, build_key=None):
+    """Write the zip to a temporary file, rebuilt only when ``build_key`` changes (None: always), and offer it.
+
+    The file is also rebuilt when it has been evicted (see register_archive_file).
+    """
+    state = st.session_state.get(f"{key}_archive")
+    if (state is None or build_key is None or state["build_key"] != build_key
+            or not os.path.exists(state["path"])):
+        simplifier = GeometrySimplifier(*simplify_settings) if simplify_settings else None
+        fd, path = tempfile.mkstemp(prefix="archive_", suffix=".zip", dir=get_archive_files()["dir"])
+        try:
+            with st.spinner("Menulis arsip zip..."), os.fdopen(fd, "wb") as out:
+                manifest = write_geojson_archive(make_frame(), out, geometry_store=geometry_store,
+                                                 simplifier=simplifier, **settings)
+        except BaseException:
+            _unlink(path)
+            raise
+        register_archive_file(path, replaces=state["path"] if state is not None else None)
+        state = st.session_state[f"{key}_archive"] = {
+            "build_key": build_key, "path": path, "manifest": manifest,
+            "simplify_stats": simplifier.stats if simplifier else None,
+        }
+    show_simplification_stats(state["simplify_stats"])
+    manifest = state["manifest"]
+    st.caption(
+        f"🧱 {len(manifest['files'])} file, {manifest['features']} feature: "
+        f"{manifest['bytes'] / 2**20:,.1f} MB GeoJSON → {os.path.getsize(state['path']) / 2**20:,.1f} MB zip"
+    )
+    with open(state["path"], "rb") as archive:
+        st.download_button(f"💾 Download {file_name}", archive, file_name, "application/zip",
+                           key=f"{key}_archive_download")
 
 # --------------------------
 # --- STEP 0: Combine GeoJSON
 # --------------------------
 st.header("🔄 Step 0 — Combine Multiple GeoJSON Files")
 multi_geojson_files = st.file_uploader(
-    "Upload multiple GeoJSON files", 
-    type=["geojson", "json"], 
+    "Upload multiple GeoJSON / GeoJSONSeq files", 
+    type=GEOJSON_UPLOAD_TYPES, 
     key="multi_geo",
     accept_multiple_files=True
 )
 if multi_geojson_files and len(multi_geojson_files) > 1:
-    geojson_objects = []
-    valid_files = True
-    for uploaded_file in multi_geojson_files:
-        try:
-            geojson_obj = json.load(uploaded_file)
-            if geojson_obj.get("type") == "FeatureCollection":
-                geojson_objects.append(geojson_obj)
-            else:
-                st.error(f"❌ File {uploaded_file.name} bukan FeatureCollection")
-                valid_files = False
-        except Exception as e:
-            st.error(f"❌ File {uploaded_file.name} error: {e}")
-            valid_files = False
-    if valid_files and geojson_objects:
-        combined_geojson = combine_geojson_files(geojson_objects)
-        st.success(f"✅ Combined {len(geojson_objects)} files ({len(combined_geojson['features'])} features)")
+    @perf.instrument("combine_geojson")
+    def combine_uploads():
+        # Every file is header-peeked (non-FeatureCollections rejected at once), then streamed feature by
+        # feature into the combined collection; big batches on several cores are parsed in parallel instead.
+        renames = []
+        timings = []
+        progress_bar = st.progress(0.0, text="Parsing...")
+
+        def file_parsed(name, n_features, seconds):
+            timings.append({"file": name, "features": n_features, "detik": round(seconds, 3)})
+            progress_bar.progress(len(timings) / len(multi_geojson_files),
+                                  text=f"{name}: {n_features} features ({seconds:.2f} s)")
+
+        if parse_workers([f.size for f in multi_geojson_files]) > 1:
+            parser = f"{JSON_BACKEND}, paralel"
+            uploads = [(f.name, f.getvalue()) for f in multi_geojson_files]
+            sources = zip([name for name, _ in uploads], parse_geojson_uploads(uploads, progress=file_parsed))
+        else:
+            parser = "streaming"
+            sources = iter_upload_sources([(f.name, f) for f in multi_geojson_files], progress=file_parsed)
+        with gc_paused():
+            features = list(iter_combined_features(sources, renames))
+        progress_bar.empty()
+        return {"type": "FeatureCollection", "features": features}, renames, timings, parser
+
+    combined_digest = "+".join(upload_digest(f) for f in multi_geojson_files)
+    try:
+        combined_geojson, renames, parse_timings, parser = cached_by_content("combine_geojson", combined_digest, combine_uploads)
+        st.success(f"✅ Combined {len(multi_geojson_files)} files ({len(combined_geojson['features'])} features)")
+        with st.expander(f"⏱️ Waktu parse per file (parser: {parser})"):
+            st.dataframe(pd.DataFrame(parse_timings))
+        if renames:
+            st.warning(f"⚠️ {len(renames)} duplicate ID di-rename")
+            with st.expander("Lihat daftar ID yang di-rename"):
+                st.dataframe(pd.DataFrame(renames))
         st.session_state.combined_geojson = combined_geojson
+        st.session_state.combined_digest = combined_digest
+    except ValueError as e:
+        st.error(f"❌ {e}")
+    except Exception as e:
+        st.error(f"❌ Gagal menggabungkan file: {e}")
 
 # --------------------------
 # --- STEP A: GeoJSON → CSV
@@ -303,34 +308,80 @@ if multi_geojson_files and len(multi_geojson_files) > 1:
 st.header("📥 Step A — Convert GeoJSON → CSV")
 col1, col2 = st.columns([1,1])
 with col1:
-    uploaded_geojson = st.file_uploader("Upload GeoJSON", type=["geojson", "json"], key="upload_geo")
+    uploaded_geojson = st.file_uploader("Upload GeoJSON / GeoJSONSeq", type=GEOJSON_UPLOAD_TYPES, key="upload_geo")
     paste_geo_text = st.text_area("Atau paste GeoJSON di sini (optional)", height=120)
 with col2:
     st.write("Upload GeoJSON asli → CSV untuk bulk edit")
-
-geojson_obj = None
+    sidecar_mode = st.checkbox(
+        "🧊 Simpan geometri di server (CSV tanpa geometry_json)",
+        value=False, key="sidecar_mode",
+        help="CSV hanya berisi _feature_id + properties. Geometri disimpan di sesi ini "
+             "(dan bisa diunduh sebagai sidecar .json.gz) lalu dipasang kembali di Step B/D."
+    )
+
+def convert_with_sidecar(convert):
+    # Returns (df, geometry store or None) so both are cached together.
+    if not sidecar_mode:
+        return compact_dataframe(convert(None)), None
+    geometry_store = {}
+    return compact_dataframe(convert(geometry_store)), geometry_store
+
+df_out = None
+geometry_store = None
+source_digest = None
 if 'combined_geojson' in st.session_state:
-    geojson_obj = st.session_state.combined_geojson
+    source_digest = st.session_state.get("combined_digest", "combined")
+    df_out, geometry_store = cached_by_content(
+        "geojson_to_dataframe", source_digest,
+        lambda: convert_with_sidecar(lambda store: geojson_to_dataframe(st.session_state.combined_geojson, store)),
+        sidecar_mode
+    )
 elif uploaded_geojson is not None:
     try: 
-        geojson_obj = json.load(uploaded_geojson)
+        source_digest = upload_digest(uploaded_geojson)
+        df_out, geometry_store = cached_by_content(
+            "geojson_to_dataframe", source_digest,
+            lambda: convert_with_sidecar(lambda store: read_geojson_dataframe(uploaded_geojson, geometry_store=store)),
+            sidecar_mode
+        )
         st.success("✅ GeoJSON berhasil dimuat")
     except Exception as e: 
         st.error(f"❌ Gagal parse GeoJSON: {e}")
 elif paste_geo_text.strip() != "":
     try: 
-        geojson_obj = json.loads(paste_geo_text)
+        source_digest = upload_digest(paste_geo_text)
+        df_out, geometry_store = cached_by_content(
+            "geojson_to_dataframe", source_digest,
+            lambda: convert_with_sidecar(lambda store: read_geojson_dataframe(io.StringIO(paste_geo_text), geometry_store=store)),
+            sidecar_mode
+        )
         st.success("✅ GeoJSON dari teks berhasil dimuat")
     except Exception as e: 
         st.error(f"❌ Gagal parse GeoJSON dari teks: {e}")
 
-if geojson_obj:
-    df_out = geojson_to_dataframe(geojson_obj)
+if df_out is not None:
     if not df_out.empty:
-        st.dataframe(df_out.head(10))
-        csv_buffer = io.StringIO()
-        df_out.to_csv(csv_buffer, index=False, encoding='utf-8')
-        st.download_button("💾 Download CSV untuk diedit", csv_buffer.getvalue().encode("utf-8"), "export_properties.csv", "text/csv")
+        st.dataframe(expand_dataframe(df_out.head(10)))
+        csv_payload = cached_by_content("csv_payload", source_digest, lambda: dataframe_to_csv_bytes(df_out), sidecar_mode)
+        st.download_button("💾 Download CSV untuk diedit", csv_payload, "export_properties.csv", "text/csv")
+        st.download_button(
+            "📦 Download Parquet",
+            cached_by_content("parquet_payload", source_digest, lambda: dataframe_to_parquet_bytes(df_out), sidecar_mode),
+            "export_properties.parquet", "application/vnd.apache.parquet"
+        )
+        if geometry_store is not None:
+            st.session_state.geometry_sidecar = geometry_store
+            st.session_state.geometry_sidecar_digest = source_digest
+            st.session_state.geometry_sidecar_ids = cached_by_content(
+                "feature_ids_digest", source_digest, lambda: feature_ids_digest(df_out["_feature_id"].tolist())
+            )
+            if len(geometry_store) < df_out["_feature_id"].nunique(dropna=False):
+                st.warning("⚠️ Sebagian feature tanpa geometri, tanpa id, atau dengan _feature_id ganda: geometrinya tidak ikut disimpan")
+            st.download_button(
+                "🧊 Download geometry sidecar",
+                cached_by_content("sidecar_payload", source_digest, lambda: geometry_sidecar_bytes(geometry_store)),
+                "geometry_sidecar.json.gz", "application/gzip"
+            )
     else:
         st.warning("⚠️ GeoJSON tidak mengandung features atau kosong")
 
@@ -339,13 +390,68 @@ if geojson_obj:
 # --------------------------
 st.markdown("---")
 st.header("📤 Step B — Upload CSV hasil edit → Merge → Download GeoJSON")
-edited_csv = st.file_uploader("Upload CSV hasil edit (Step A)", type=["csv"], key="upload_csv")
+edited_csv = st.file_uploader("Upload CSV/Parquet hasil edit (Step A)", type=["csv", "parquet"], key="upload_csv")
+sidecar_file = st.file_uploader(
+    "Upload geometry sidecar (opsional, untuk CSV tanpa geometry_json)", type=["gz"], key="upload_sidecar"
+)
+
+def resolve_geometry_store(df, key):
+    """Geometry sidecar for a frame without geometry_json: uploaded file first, then this session's Step A.
+
+    The Step A sidecar is reused as-is only when the frame holds the same
+    _feature_id set as the Step A output; for any other frame the user has
+    to opt in (``key`` names that checkbox).
+    """
+    if df is None or "geometry_json" in df.columns:
+        return None, None
+    if sidecar_file is not None:
+        sidecar_digest = upload_digest(sidecar_file)
+        return cached_by_content("read_sidecar", sidecar_digest, lambda: read_geometry_sidecar(sidecar_file)), sidecar_digest
+    if st.session_state.get("geometry_sidecar") is None or "_feature_id" not in df.columns:
+        return None, None
+    if feature_ids_digest(df["_feature_id"].tolist()) != st.session_state.get("geometry_sidecar_ids"):
+        st.warning("⚠️ _feature_id di file ini tidak sama dengan hasil Step A sesi ini: "
+                   "geometri Step A bisa jadi milik file lain. Upload sidecar yang sesuai, atau pakai tetap atas risiko sendiri.")
+        if not st.checkbox("Tetap pakai geometri dari Step A sesi ini", value=False, key=f"{key}_reuse_sidecar"):
+            return None, None
+    return st.session_state.geometry_sidecar, st.session_state.geometry_sidecar_digest
+
 if edited_csv:
-    df_edited = read_csv_with_fallback(edited_csv)
+    edited_digest = upload_digest(edited_csv)
+    df_edited = read_uploaded_table(edited_csv)
     if df_edited is not None:
-        df_edited = df_edited.replace(['','NaN','NaT','None'], None)
-        geo_out = dataframe_to_geojson(df_edited)
-        st.download_button("💾 Download merged GeoJSON", json.dumps(geo_out, indent=2, ensure_ascii=False).encode("utf-8"), "merged.geojson", "application/json")
+        edited_geometry_store, sidecar_digest = resolve_geometry_store(df_edited, "step_b")
+        if "geometry_json" not in df_edited.columns and edited_geometry_store is None:
+            st.warning("⚠️ CSV tidak punya kolom geometry_json dan tidak ada geometry sidecar: GeoJSON akan tanpa geometri")
+        simplify_settings = simplification_controls("step_b")
+        archive_settings = archive_controls("step_b")
+
+        def export_edited(write=dataframe_to_geojson_bytes, **options):
+            simplifier = GeometrySimplifier(*simplify_settings) if simplify_settings else None
+            payload = write(blank_tokens(df_edited, ['','NaN','NaT','None']), edited_geometry_store, simplifier, **options)
+            return payload, simplifier.stats if simplifier else None
+
+        if archive_settings and archive_settings["mode"] == "geojsonseq":
+            seq_payload, simplify_stats = cached_by_content(
+                "geojsonseq_payload", edited_digest,
+                lambda: export_edited(dataframe_to_geojsonseq_bytes, rs=archive_settings["rs"]),
+                sidecar_digest, simplify_settings, archive_settings["rs"]
+            )
+            show_simplification_stats(simplify_stats)
+            st.download_button("💾 Download merged GeoJSONSeq", seq_payload,
+                               geojsonseq_file_name("merged", archive_settings), "application/geo+json-seq")
+        elif archive_settings:
+            geojson_archive_download(
+                "step_b", lambda: blank_tokens(df_edited, ['','NaN','NaT','None']), edited_geometry_store,
+                archive_settings, simplify_settings, "merged_tiles.zip",
+                build_key=(edited_digest, sidecar_digest, simplify_settings, tuple(archive_settings.items()))
+            )
+        else:
+            geojson_payload, simplify_stats = cached_by_content(
+                "geojson_payload", edited_digest, export_edited, sidecar_digest, simplify_settings
+            )
+            show_simplification_stats(simplify_stats)
+            st.download_button("💾 Download merged GeoJSON", geojson_payload, "merged.geojson", "application/json")
 
 # --------------------------
 # --- STEP C: IMPROVED Stand-alone Join Attributes
@@ -356,15 +462,24 @@ st.header("🧩 Step C — Stand-alone Join Attributes")
 col1, col2 = st.columns(2)
 with col1:
     st.subheader("File Utama")
-    main_file = st.file_uploader("Upload MAIN file", type=["csv","xlsx","geojson","json"], key="main_file")
+    main_file = st.file_uploader("Upload MAIN file", type=["csv","xlsx","parquet"] + GEOJSON_UPLOAD_TYPES, key="main_file")
 with col2:
     st.subheader("File Tambahan") 
-    add_file = st.file_uploader("Upload ADDITIONAL file", type=["csv","xlsx","geojson","json"], key="add_file")
+    add_file = st.file_uploader("Upload ADDITIONAL file", type=["csv","xlsx","parquet"] + GEOJSON_UPLOAD_TYPES, key="add_file")
 
-join_key_options = ["id", "_feature_id", "name", "ID", "Id"]
-join_key_c = st.selectbox("Pilih kolom untuk join:", options=join_key_options, index=0, key="join_key_c")
-custom_join_key = st.text_input("Atau masukkan nama kolom manual:", key="custom_join_key")
-final_join_key = custom_join_key if custom_join_key else join_key_c
+join_mode_c = st.radio(
+    "Mode join:", ["attribute", "spatial"], horizontal=True, key="join_mode_c",
+    format_func=lambda mode: {"attribute": "🔑 Atribut (kolom key)", "spatial": "📍 Spasial (titik di dalam poligon)"}[mode]
+)
+final_join_key = None
+if join_mode_c == "attribute":
+    join_key_options = ["id", "_feature_id", "name", "ID", "Id"]
+    join_key_c = st.selectbox("Pilih kolom untuk join:", options=join_key_options, index=0, key="join_key_c")
+    custom_join_key = st.text_input("Atau masukkan nama kolom manual:", key="custom_join_key")
+    final_join_key = custom_join_key if custom_join_key else join_key_c
+else:
+    st.caption("File utama: layer titik (mis. POI). File tambahan: layer poligon (mis. batas desa). "
+               "Setiap titik mendapat atribut poligon tempat ia berada.")
 
 if 'df_joined_c' not in st.session_state:
     st.session_state.df_joined_c = None
@@ -374,23 +489,7 @@ if st.button("🔗 Join Attributes (Step C)", type="primary", key="join_button_i
         st.error("❌ Both files must be uploaded")
     else:
         try:
-            main_df = None
-            if main_file.name.lower().endswith(".csv"):
-                main_df = read_csv_with_fallback(main_file)
-            elif main_file.name.lower().endswith(".xlsx"):
-                main_df = read_xlsx_with_fallback(main_file)
-            else:
-                main_geo = json.load(main_file)
-                main_df = geojson_to_dataframe(main_geo)
-
-            add_df = None
-            if add_file.name.lower().endswith(".csv"):
-                add_df = read_csv_with_fallback(add_file)
-            elif add_file.name.lower().endswith(".xlsx"):
-                add_df = read_xlsx_with_fallback(add_file)
-            else:
-                add_geo = json.load(add_file)
-                add_df = geojson_to_dataframe(add_geo)
+            main_df, add_df = read_uploaded_tables([main_file, add_file])
 
             if main_df is None or main_df.empty:
                 st.error("❌ File utama tidak dapat dibaca atau kosong")
@@ -400,21 +499,39 @@ if st.button("🔗 Join Attributes (Step C)", type="primary", key="join_button_i
                 st.write(f"✅ File utama: {len(main_df)} records")
                 st.write(f"✅ File tambahan: {len(add_df)} records")
                 
-                df_joined_c = join_attributes(main_df, add_df, final_join_key)
+                join_index = None
+                polygon_index = None
+                if join_mode_c == "spatial":
+                    if "geometry_json" in add_df.columns:
+                        polygon_index = cached_by_content(
+                            "polygon_index", upload_digest(add_file),
+                            lambda: PolygonIndex(frame_geometries(add_df))
+                        )
+                elif final_join_key in add_df.columns:
+                    join_index = cached_by_content(
+                        "join_index", upload_digest(add_file),
+                        lambda: JoinIndex(add_df, final_join_key), final_join_key
+                    )
+                df_joined_c = join_attributes(main_df, add_df, final_join_key, join_index, join_mode_c, polygon_index, reporter=st)
                 
                 if df_joined_c is not None:
+                    df_joined_c = compact_dataframe(df_joined_c)
                     st.session_state.df_joined_c = df_joined_c
                     st.subheader("📋 Hasil Join")
-                    st.dataframe(df_joined_c.head(10))
+                    st.dataframe(expand_dataframe(df_joined_c.head(10)))
                     
-                    csv_buffer_c = io.StringIO()
-                    df_joined_c.to_csv(csv_buffer_c, index=False, encoding='utf-8')
                     st.download_button(
                         "💾 Download CSV after join", 
-                        csv_buffer_c.getvalue().encode("utf-8"), 
+                        dataframe_to_csv_bytes(df_joined_c), 
                         "joined_attributes_stepC.csv", 
                         "text/csv"
                     )
+                    st.download_button(
+                        "📦 Download Parquet after join",
+                        dataframe_to_parquet_bytes(df_joined_c),
+                        "joined_attributes_stepC.parquet",
+                        "application/vnd.apache.parquet"
+                    )
 
         except Exception as e:
             st.error(f"❌ Failed to join attributes: {e}")
@@ -433,6 +550,7 @@ st.subheader("📁 Pilih Sumber Data")
 data_source = st.radio(
     "Pilih sumber data:",
     ["Gunakan data dari Step C", "Upload CSV baru"],
+    format_func=lambda option: "Upload CSV/Parquet baru" if option == "Upload CSV baru" else option,
     index=0
 )
 
@@ -447,23 +565,25 @@ if data_source == "Gunakan data dari Step C":
         data_source = "Upload CSV baru"
 
 if data_source == "Upload CSV baru" or current_df is None:
-    uploaded_csv = st.file_uploader("Upload CSV file untuk styling", type=["csv"], key="html_styling_csv")
+    uploaded_csv = st.file_uploader("Upload CSV/Parquet file untuk styling", type=["csv", "parquet"], key="html_styling_csv")
     if uploaded_csv:
-        current_df = read_csv_with_fallback(uploaded_csv)
+        current_df = read_uploaded_table(uploaded_csv)
         if current_df is not None:
-            st.success(f"✅ CSV berhasil dimuat ({len(current_df)} records)")
+            st.success(f"✅ {uploaded_csv.name} berhasil dimuat ({len(current_df)} records)")
 
 # Process styling jika ada data
 if current_df is not None:
     st.subheader("🎯 Pilih Kolom untuk Styling")
     
     st.write("**Preview Data:**")
-    st.dataframe(current_df.head(5))
+    st.dataframe(expand_dataframe(current_df.head(5)))
     
-    # Get text columns
+    # Get text columns (object, string, categorical or sparse: frames are compacted after loading)
     text_columns = [col for col in current_df.columns 
                    if col not in ['_feature_id', 'geometry_json', 'geometry'] 
-                   and current_df[col].dtype == 'object']
+                   and (pd.api.types.is_string_dtype(current_df[col].dtype)
+                        or isinstance(current_df[col].dtype, pd.CategoricalDtype)
+                        or (isinstance(current_df[col].dtype, pd.SparseDtype) and current_df[col].dtype.subtype == object))]
     
     if text_columns:
         selected_columns = st.multiselect(
@@ -474,6 +594,16 @@ if current_df is not None:
         
         if selected_columns:
             st.write(f"Selected {len(selected_columns)} columns for styling")
+            compact_html = st.checkbox(
+                "🗜️ HTML ringkas (payload uMap lebih kecil)", value=False, key="styling_compact",
+                help="Kartu yang sama sebagai grid dua kolom dengan style inline ringkas, tanpa wrapper per baris: HTML ±3.5x lebih kecil."
+            )
+            styling_output = st.radio(
+                "Output styling:", list(STYLING_OUTPUT_LABELS), key="styling_output", horizontal=True,
+                format_func=STYLING_OUTPUT_LABELS.get,
+                help="Kolom per field: satu kolom `<kolom>.<field>` untuk setiap field pipe "
+                     "(mis. `keterangan.Kecamatan`), bisa dipakai filter/label di uMap tanpa parsing HTML."
+            )
             
             # Preview
             st.subheader("👁️ Preview Sebelum & Sesudah Styling")
@@ -495,7 +625,7 @@ if current_df is not None:
                     )
                 
                 with col2:
-                    html_output = process_pipe_separated_data(current_df.iloc[preview_row][col])
+                    html_output = process_pipe_separated_data(current_df.iloc[preview_row][col], compact_html)
                     if html_output:
                         st.components.v1.html(html_output, height=200, scrolling=True)
                         with st.expander("Lihat HTML Code"):
@@ -504,11 +634,47 @@ if current_df is not None:
                         st.info("Tidak ada data untuk di-styling")
             
             # Bulk processing
+            with st.expander("⚡ Mode paralel (multi-core)"):
+                parallel_mode = st.checkbox("Proses di beberapa core sekaligus", value=False, key="styling_parallel")
+                styling_workers = st.number_input(
+                    "Jumlah worker:", min_value=1, max_value=64,
+                    value=os.cpu_count() or 1, step=1, key="styling_workers"
+                )
+                styling_chunk_size = st.number_input(
+                    "Ukuran chunk (nilai unik per tugas):", min_value=100, max_value=100_000,
+                    value=STYLING_CHUNK_SIZE, step=100, key="styling_chunk_size"
+                )
+
+            styled_simplify_settings = simplification_controls("step_d")
+            styled_archive_settings = archive_controls("step_d")
+            # Resolved before styling so the opt-in checkbox does not discard the results.
+            styled_geometry_store, _ = resolve_geometry_store(current_df, "step_d")
+
             if st.button("🚀 APPLY BULK HTML STYLING", type="primary"):
                 with st.spinner(f"Memproses {len(current_df)} records..."):
-                    df_styled = bulk_apply_html_styling(current_df, selected_columns)
+                    styling_cache = get_styling_cache()
+                    hits_before, misses_before = styling_cache.hits, styling_cache.misses
+                    progress_bar = st.progress(0.0, text="Styling...")
+                    df_styled = bulk_apply_html_styling(
+                        current_df, selected_columns, styling_cache,
+                        workers=int(styling_workers) if parallel_mode else 1,
+                        chunk_size=int(styling_chunk_size),
+                        progress=lambda done, total: progress_bar.progress(
+                            done / total, text=f"Styling chunk {done}/{total}"
+                        ),
+                        compact=compact_html, reporter=st,
+                        html=styling_output != "fields", field_columns=styling_output != "html",
+                    )
+                    progress_bar.empty()
+                    st.caption(
+                        f"🧠 Cache styling: {styling_cache.hits - hits_before} hit, "
+                        f"{styling_cache.misses - misses_before} miss "
+                        f"({len(styling_cache)} entri tersimpan, "
+                        f"{styling_cache.nbytes / 2**20:,.1f}/{styling_cache.max_bytes / 2**20:,.0f} MB)"
+                    )
                     
                     if df_styled is not None:
+                        df_styled = compact_dataframe(df_styled)
                         st.session_state.df_styled_final = df_styled
                         st.success(f"✅ Berhasil memproses {len(current_df)} records!")
                         
@@ -518,10 +684,12 @@ if current_df is not None:
                         # Show comparison
                         comparison_cols = []
                         for col in selected_columns[:3]:
-                            comparison_cols.extend([col, f"{col}_styled"])
+                            comparison_cols.append(col)
+                            comparison_cols.extend(c for c in df_styled.columns
+                                                   if c == f"{col}_styled" or c.startswith(f"{col}."))
                         
                         if comparison_cols:
-                            st.dataframe(df_styled[comparison_cols].head(5))
+                            st.dataframe(expand_dataframe(df_styled[comparison_cols].head(5)))
                         
                         # Download options
                         st.subheader("💾 Download Hasil")
@@ -529,40 +697,67 @@ if current_df is not None:
                         col1, col2, col3 = st.columns(3)
                         
                         with col1:
-                            csv_full = io.StringIO()
-                            df_styled.to_csv(csv_full, index=False, encoding='utf-8')
                             st.download_button(
                                 "📥 Download Full CSV", 
-                                csv_full.getvalue().encode("utf-8"), 
+                                dataframe_to_csv_bytes(df_styled), 
                                 "styled_data_full.csv", 
                                 "text/csv"
                             )
+                            st.download_button(
+                                "📦 Download Full Parquet",
+                                dataframe_to_parquet_bytes(df_styled),
+                                "styled_data_full.parquet",
+                                "application/vnd.apache.parquet"
+                            )
                         
                         with col2:
-                            styled_cols = [col for col in df_styled.columns if col.endswith('_styled')]
+                            styled_cols = [col for col in df_styled.columns if col.endswith('_styled')
+                                           or col.startswith(tuple(f"{c}." for c in selected_columns))]
                             original_ids = [col for col in ['_feature_id', 'id'] if col in df_styled.columns]
                             
                             if styled_cols:
                                 df_only_styled = df_styled[original_ids + styled_cols]
-                                csv_styled = io.StringIO()
-                                df_only_styled.to_csv(csv_styled, index=False, encoding='utf-8')
                                 st.download_button(
                                     "🎨 Download Styled Columns Only", 
-                                    csv_styled.getvalue().encode("utf-8"), 
+                                    dataframe_to_csv_bytes(df_only_styled), 
                                     "only_styled_columns.csv", 
                                     "text/csv"
                                 )
                         
                         with col3:
-                            if '_feature_id' in df_styled.columns and 'geometry_json' in df_styled.columns:
-                                geojson_output = dataframe_to_geojson(df_styled)
-                                geo_str = json.dumps(geojson_output, indent=2, ensure_ascii=False)
-                                st.download_button(
-                                    "🗺️ Download as GeoJSON", 
-                                    geo_str.encode("utf-8"), 
-                                    "styled_data.geojson", 
-                                    "application/json"
-                                )
+                            if '_feature_id' in df_styled.columns and (
+                                'geometry_json' in df_styled.columns or styled_geometry_store is not None
+                            ):
+                                if styled_archive_settings and styled_archive_settings["mode"] == "geojsonseq":
+                                    styled_simplifier = (
+                                        GeometrySimplifier(*styled_simplify_settings) if styled_simplify_settings else None
+                                    )
+                                    st.download_button(
+                                        "🗺️ Download as GeoJSONSeq",
+                                        dataframe_to_geojsonseq_bytes(df_styled, styled_geometry_store, styled_simplifier,
+                                                                      rs=styled_archive_settings["rs"]),
+                                        geojsonseq_file_name("styled_data", styled_archive_settings),
+                                        "application/geo+json-seq"
+                                    )
+                                    if styled_simplifier:
+                                        show_simplification_stats(styled_simplifier.stats)
+                                elif styled_archive_settings:
+                                    geojson_archive_download(
+                                        "step_d", lambda: df_styled, styled_geometry_store,
+                                        styled_archive_settings, styled_simplify_settings, "styled_tiles.zip"
+                                    )
+                                else:
+                                    styled_simplifier = (
+                                        GeometrySimplifier(*styled_simplify_settings) if styled_simplify_settings else None
+                                    )
+                                    st.download_button(
+                                        "🗺️ Download as GeoJSON", 
+                                        dataframe_to_geojson_bytes(df_styled, styled_geometry_store, styled_simplifier), 
+                                        "styled_data.geojson", 
+                                        "application/json"
+                                    )
+                                    if styled_simplifier:
+                                        show_simplification_stats(styled_simplifier.stats)
     else:
         st.warning("⚠️ Tidak ditemukan kolom teks untuk di-styling")
 
@@ -575,15 +770,75 @@ test_input = st.text_area(
     value="Nama Fasilitas: Kantor Perbekel Desa Pidpid | Kecamatan: Abang | Desa: Pidpid | Banjar: Pidpid Kelod | Jenis Fasum: Wantilan | Daya Tampung: 300 orang | Fasilitas Pendukung: toilet, listrik, sumber air, dapur umum",
     height=150
 )
+quick_compact = st.checkbox("🗜️ HTML ringkas", value=False, key="quick_compact")
 
 if st.button("🔄 Convert to HTML"):
     if test_input.strip():
-        html_result = process_pipe_separated_data(test_input)
+        html_result = process_pipe_separated_data(test_input, quick_compact)
         st.components.v1.html(html_result, height=400, scrolling=True)
         with st.expander("Lihat HTML Code"):
             st.code(html_result, language='html')
     else:
         st.warning("Masukkan data terlebih dahulu")
 
+# Session state entries that can hold a whole layer.
+SESSION_DATA_KEYS = ("combined_geojson", "geometry_sidecar")
+
+def session_memory() -> Dict[str, int]:
+    """Approximate bytes per session_state entry holding a frame or geometry (sizes memoized per object)."""
+    memo = st.session_state.setdefault("_memory_sizes", {})
+    sizes = {}
+    for key, value in list(st.session_state.items()):
+        if not (isinstance(value, pd.DataFrame) or (key in SESSION_DATA_KEYS and value is not None)):
+            continue
+        if key not in memo or memo[key][0] != id(value):
+            memo[key] = (id(value), estimate_nbytes(value))
+        sizes[key] = memo[key][1]
+    return sizes
+
+upload_cache = get_upload_cache()
+session_sizes = session_memory()
+st.sidebar.caption(
+    f"🧮 Memori sesi ini ≈ {sum(session_sizes.values()) / 2**20:,.1f} MB"
+    + (": " + ", ".join(f"{key} {size / 2**20:,.1f} MB" for key, size in session_sizes.items()) if session_sizes else "")
+)
+st.sidebar.caption(
+    f"🗄️ Cache upload: {upload_cache.nbytes / 2**20:.1f} / {UPLOAD_CACHE_MAX_BYTES / 2**20:.0f} MB, "
+    f"{len(upload_cache)} entri ({upload_cache.hits} hit, {upload_cache.misses} miss)"
+)
+# The memory level measures process-wide tracemalloc peaks, which concurrent
+# sessions would mix up; it is only listed when PERF_INSTRUMENTATION set it.
+perf_levels = [perf.OFF, perf.TIME] + ([perf.MEMORY] if perf.get_level() == perf.MEMORY else [])
+perf_level = st.sidebar.selectbox(
+    "⏱️ Instrumentasi performa", options=perf_levels,
+    index=perf_levels.index(perf.get_level()), format_func=lambda level: {
+        perf.OFF: "Mati", perf.TIME: "Waktu + jumlah baris",
+        perf.MEMORY: "Waktu + baris + memori (PERF_INSTRUMENTATION, satu sesi saja)",
+    }[level],
+    help="Berlaku untuk seluruh server. Puncak memori per stage hanya tersedia lewat "
+         "PERF_INSTRUMENTATION=memory, benchmarks.run atau CLI --memory: tracemalloc tidak bisa "
+         "memisahkan sesi yang berjalan bersamaan."
+)
+if perf_level != perf.get_level():
+    perf.set_level(perf_level)
+    st.rerun()
+
+with st.expander("⏱️ Performance"):
+    perf_records = st.session_state.perf_records
+    if not perf_records:
+        st.caption("Belum ada data. Aktifkan instrumentasi di sidebar lalu jalankan salah satu step.")
+    else:
+        st.write("**Ringkasan per stage**")
+        st.dataframe(pd.DataFrame(perf.summarize(perf_records)), hide_index=True)
+        st.write("**Riwayat (urut waktu mulai, 200 terakhir)**")
+        history = pd.DataFrame(sorted(perf_records, key=lambda r: r["seq"])[-200:])
+        history["stage"] = ["· " * depth + name for depth, name in zip(history["depth"], history["stage"])]
+        shown = [col for col in ["stage", "seconds", "rows", "peak_mb", "peak_shared", "output_bytes", "ok", "thread"]
+                 if col in history.columns]
+        st.dataframe(history[shown], hide_index=True)
+        if st.button("🧹 Reset data performa"):
+            perf_records.clear()
+            st.rerun()
+
 st.markdown("---")
 st.write("**✨ Complete GeoJSON ↔ CSV Editor with Bulk HTML Styling**")
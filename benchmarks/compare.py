@@ -0,0 +1,67 @@
+"""
+Compare two benchmark reports stage by stage.
+
+    python -m benchmarks.compare before.json after.json --threshold 1.2
+
+Prints the new/old ratio of median time and peak memory for every stage and
+size both reports contain; exits with status 1 when any ratio exceeds
+``--threshold``.
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+METRICS = ("seconds_median", "peak_mb")
+# Config keys that only select what runs; they do not change the inputs.
+RUN_OPTIONS = ("sizes", "stages", "repeat", "no_memory")
+
+
+def compare(base: dict, new: dict, threshold: float) -> tuple:
+    """Return (table lines, regressions) for the stages both reports share."""
+    lines = [f"{'size':>9}  {'stage':32s} {'time old':>9} {'time new':>9} {'ratio':>6}  {'MB old':>8} {'MB new':>8} {'ratio':>6}"]
+    regressions = []
+    for size, stages in base["results"].items():
+        for stage, old in stages.items():
+            cur = new["results"].get(size, {}).get(stage)
+            if cur is None:
+                continue
+            ratios = {}
+            for metric in METRICS:
+                if old.get(metric) and cur.get(metric) is not None:
+                    ratios[metric] = cur[metric] / old[metric]
+                    if ratios[metric] > threshold:
+                        regressions.append((size, stage, metric, ratios[metric]))
+            lines.append(
+                f"{size:>9}  {stage:32s} {old['seconds_median']:9.3f} {cur['seconds_median']:9.3f} "
+                f"{ratios.get('seconds_median', float('nan')):6.2f}  {old.get('peak_mb', float('nan')):8.1f} "
+                f"{cur.get('peak_mb', float('nan')):8.1f} {ratios.get('peak_mb', float('nan')):6.2f}"
+            )
+    return lines, regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio above which a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    inputs = [{k: v for k, v in r["config"].items() if k not in RUN_OPTIONS} for r in (base, new)]
+    if inputs[0] != inputs[1]:
+        print("⚠️ Config berbeda antara kedua report; rasio mungkin tidak sebanding.", file=sys.stderr)
+
+    lines, regressions = compare(base, new, args.threshold)
+    print("\n".join(lines))
+    for size, stage, metric, ratio in regressions:
+        print(f"❌ {stage} @ {size}: {metric} x{ratio:.2f}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Time and memory-profile every pipeline stage on synthetic data, without Streamlit.
+
+    python -m benchmarks.run --sizes 1k 10k 100k --out before.json
+    python -m benchmarks.run --sizes 1M --geometry Point --repeat 1 --out big.json
+    python -m benchmarks.compare before.json after.json
+
+Each stage is timed ``--repeat`` times (min and median are reported), then
+run once more under tracemalloc for the peak of Python-tracked allocations
+(pandas/NumPy buffers included; process-pool workers are not). Inputs are
+rebuilt before every run and never counted. The report is JSON with sorted
+keys, so two reports can be diffed or fed to benchmarks.compare.
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from engine import (
+    LRUCache, geojson_to_dataframe, read_geojson_dataframe, dataframe_to_csv_bytes,
+    dataframe_to_parquet_bytes, combine_geojson_files, iter_combined_features,
+    iter_geojson_features, write_geojson, style_columns,
+    dataframe_to_geojson, dataframe_to_geojson_bytes, GeometrySimplifier, METERS_PER_DEGREE,
+    PolygonIndex, spatial_join, frame_geometries, write_geojson_archive, dataframe_to_geojsonseq_bytes,
+    parse_geojson_uploads, iter_upload_sources, gc_paused,
+)
+from pipeline import bulk_apply_html_styling, join_attributes
+from styling import pipe_field_columns
+from benchmarks.synthetic import (
+    GEOMETRY_TYPES, iter_features, feature_collection_bytes, split_feature_collection, make_attribute_table,
+    make_point_frame, feature_sequence_bytes,
+)
+
+REPORT_SCHEMA = 1
+TEXT_COLUMN = "keterangan"
+JOIN_KEY = "kode"
+
+
+class Dataset:
+    """Synthetic inputs for one size, generated once and shared by all stages."""
+
+    def __init__(self, n: int, args: argparse.Namespace):
+        features = list(iter_features(n, args.geometry, args.vertices, args.id_duplicate_rate,
+                                      args.text_duplicate_rate, args.seed))
+        self.n = n
+        self.geojson_bytes = feature_collection_bytes(features)
+        self.geojsonseq_bytes = feature_sequence_bytes(features)
+        self.parts = split_feature_collection(features, args.parts)
+        del features
+        frame = read_geojson_dataframe(io.BytesIO(self.geojson_bytes))
+        self.frame = frame
+        # Steps B-D work on the edited CSV, which comes back as all-string columns.
+        self.table = pd.read_csv(io.BytesIO(dataframe_to_csv_bytes(frame)), dtype=str, keep_default_na=False)
+        self.attributes = make_attribute_table(n, args.match_rate, args.key_duplicate_rate, args.seed)
+        self.workers = args.workers
+        self._points = None
+        self.seed = args.seed
+
+    @property
+    def points(self) -> pd.DataFrame:
+        """Point layer (one point per feature) for the spatial join, built on first use."""
+        if self._points is None:
+            self._points = make_point_frame(self.n, self.seed)
+        return self._points
+
+    def warm_styling_cache(self) -> LRUCache:
+        cache = LRUCache(max(len(self.table), 1))
+        style_columns(self.table, [TEXT_COLUMN], cache)
+        return cache
+
+
+def _combine_streaming(parts: List[bytes]) -> bytes:
+    sources = ((f"#{i + 1}", iter_geojson_features(io.BytesIO(p), "FeatureCollection")) for i, p in enumerate(parts))
+    out = io.BytesIO()
+    write_geojson(iter_combined_features(sources, renames=[]), out)
+    return out.getvalue()
+
+
+def _combine_uploads(parts: List[bytes]) -> List[Dict[str, Any]]:
+    # Step 0 on a single parse worker: peeked, then streamed into one feature list.
+    uploads = [(f"part{i}.geojson", io.BytesIO(p)) for i, p in enumerate(parts)]
+    with gc_paused():
+        return list(iter_combined_features(iter_upload_sources(uploads), renames=[]))
+
+
+def _spatial_join(points: pd.DataFrame, polygons: pd.DataFrame) -> pd.DataFrame:
+    joined, _ = spatial_join(points, polygons)
+    return joined
+
+
+# name -> (prepare(dataset) -> args, run(*args) -> result); prepare is not timed.
+STAGES: "OrderedDict[str, tuple]" = OrderedDict([
+    ("geojson_to_dataframe", (lambda d: (json.loads(d.geojson_bytes),), geojson_to_dataframe)),
+    ("read_geojson_dataframe", (lambda d: (io.BytesIO(d.geojson_bytes),), read_geojson_dataframe)),
+    ("read_geojsonseq_dataframe", (lambda d: (io.BytesIO(d.geojsonseq_bytes),), read_geojson_dataframe)),
+    ("dataframe_to_csv_bytes", (lambda d: (d.frame,), dataframe_to_csv_bytes)),
+    ("dataframe_to_parquet_bytes", (lambda d: (d.frame,), dataframe_to_parquet_bytes)),
+    ("combine_geojson_files", (lambda d: ([json.loads(p) for p in d.parts], []), combine_geojson_files)),
+    ("combine_streaming", (lambda d: (d.parts,), _combine_streaming)),
+    ("combine_uploads_streaming", (lambda d: (d.parts,), _combine_uploads)),
+    ("parse_geojson_uploads", (lambda d: ([(f"part{i}.geojson", p) for i, p in enumerate(d.parts)],),
+                               parse_geojson_uploads)),
+    ("join_attributes", (lambda d: (d.table, d.attributes, JOIN_KEY), join_attributes)),
+    ("spatial_index", (lambda d: (frame_geometries(d.table),), PolygonIndex)),
+    ("spatial_join", (lambda d: (d.points, d.table), _spatial_join)),
+    ("bulk_apply_html_styling", (lambda d: (d.table, [TEXT_COLUMN], LRUCache(max(len(d.table), 1)), d.workers),
+                                 bulk_apply_html_styling)),
+    ("bulk_apply_html_styling_compact", (lambda d: (d.table, [TEXT_COLUMN], LRUCache(max(len(d.table), 1)), d.workers),
+                                         lambda *args: bulk_apply_html_styling(*args, compact=True))),
+    ("bulk_apply_html_styling_cached", (lambda d: (d.table, [TEXT_COLUMN], d.warm_styling_cache()),
+                                        bulk_apply_html_styling)),
+    ("pipe_field_columns", (lambda d: (d.table[TEXT_COLUMN],), pipe_field_columns)),
+    ("dataframe_to_geojson", (lambda d: (d.table,), dataframe_to_geojson)),
+    ("dataframe_to_geojson_bytes", (lambda d: (d.table,), dataframe_to_geojson_bytes)),
+    ("dataframe_to_geojson_bytes_simplified",
+     (lambda d: (d.table, None, GeometrySimplifier(1.0 / METERS_PER_DEGREE, 6)), dataframe_to_geojson_bytes)),
+    ("dataframe_to_geojsonseq_bytes", (lambda d: (d.table,), dataframe_to_geojsonseq_bytes)),
+    ("geojson_archive_quadtree", (lambda d: (d.table, io.BytesIO(), "quadtree"), write_geojson_archive)),
+    ("geojson_archive_chunks", (lambda d: (d.table, io.BytesIO(), "chunks"), write_geojson_archive)),
+])
+
+
+def describe(result) -> Dict[str, Any]:
+    if isinstance(result, pd.DataFrame):
+        return {"rows": len(result), "columns": len(result.columns)}
+    if isinstance(result, (bytes, bytearray)):
+        return {"output_bytes": len(result)}
+    if isinstance(result, dict) and result.get("type") == "GeoJSONArchive":
+        return {"rows": result["features"], "output_bytes": result["bytes"], "files": len(result["files"])}
+    if isinstance(result, list) and result and isinstance(result[0], list):
+        return {"rows": sum(len(part) for part in result)}
+    if isinstance(result, dict) and "features" in result:
+        return {"rows": len(result["features"])}
+    if isinstance(result, dict):
+        # Styled columns: also report the HTML size, the uMap payload.
+        return {"rows": sum(len(v) for v in result.values()),
+                "output_bytes": int(sum(v.str.len().sum() for v in result.values()))}
+    return {}
+
+
+def measure(dataset: Dataset, prepare: Callable, run: Callable, repeat: int, memory: bool) -> Dict[str, Any]:
+    times = []
+    result = None
+    for _ in range(repeat):
+        args = prepare(dataset)
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = run(*args)
+        times.append(time.perf_counter() - start)
+    entry = {"seconds_min": round(min(times), 6), "seconds_median": round(statistics.median(times), 6)}
+    entry.update(describe(result))
+    del result
+    if memory:
+        args = prepare(dataset)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        entry["peak_mb"] = round(peak / 2**20, 3)
+    return entry
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def environment() -> Dict[str, Any]:
+    def version(module):
+        try:
+            return __import__(module).__version__
+        except ImportError:
+            return None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": version("pandas"),
+        "numpy": version("numpy"),
+        "pyarrow": version("pyarrow"),
+    }
+
+
+def run_benchmarks(args: argparse.Namespace, log=print) -> Dict[str, Any]:
+    stages = args.stages or list(STAGES)
+    results = {}
+    for n in args.sizes:
+        log(f"== {n} features: generating...")
+        dataset = Dataset(n, args)
+        results[str(n)] = {}
+        for name in stages:
+            prepare, run = STAGES[name]
+            entry = measure(dataset, prepare, run, args.repeat, not args.no_memory)
+            results[str(n)][name] = entry
+            log(f"   {name:32s} {entry['seconds_median']:9.3f} s  {entry.get('peak_mb', float('nan')):9.1f} MB")
+        del dataset
+        gc.collect()
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "stages")}
+    config["stages"] = stages
+    return {"schema": REPORT_SCHEMA, "environment": environment(), "config": config, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[1_000, 10_000, 100_000],
+                        help="feature counts, e.g. 1k 10k 100k 1M (default: 1k 10k 100k)")
+    parser.add_argument("--geometry", choices=GEOMETRY_TYPES, default="Polygon")
+    parser.add_argument("--vertices", type=int, default=16, help="vertices per line/ring")
+    parser.add_argument("--id-duplicate-rate", type=float, default=0.05,
+                        help="share of features reusing an earlier id")
+    parser.add_argument("--text-duplicate-rate", type=float, default=0.5,
+                        help="share of features repeating an earlier pipe text")
+    parser.add_argument("--key-duplicate-rate", type=float, default=0.0,
+                        help="share of attribute rows repeating a join key")
+    parser.add_argument("--match-rate", type=float, default=0.9, help="share of features with an attribute row")
+    parser.add_argument("--parts", type=int, default=4, help="files the collection is split into for combine")
+    parser.add_argument("--workers", type=int, default=1, help="styling worker processes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="subset of stages to run")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", default="-", help="report path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args, log=lambda msg: print(msg, file=sys.stderr))
+    text = json.dumps(report, indent=2, sort_keys=True) + "\n"
+    if args.out == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
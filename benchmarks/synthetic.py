@@ -0,0 +1,149 @@
+"""
+Deterministic synthetic inputs for the benchmarks: FeatureCollections with
+pipe-separated description text, and an attribute table to join onto them.
+
+Everything is driven by a seed, so the same arguments always produce the
+same bytes.
+"""
+
+import json
+import math
+import random
+from typing import Any, Dict, Iterator, List
+
+import pandas as pd
+
+GEOMETRY_TYPES = ("Point", "LineString", "Polygon", "MultiPolygon")
+
+KECAMATAN = ["Kuta", "Ubud", "Sukawati", "Gianyar", "Tabanan", "Denpasar Barat", "Mengwi", "Abiansemal"]
+JENIS_FASUM = ["Lapangan", "Balai Banjar", "Sekolah", "Pura", "Wantilan", "Puskesmas"]
+KONDISI = ["bisa di lalu mobil", "jalur di lalu motor", "di pakai warga", "di rencanakan +- 2m",
+           "help pad", "akses 3m", "luas 12 are", "baik"]
+
+
+def make_geometry(rng: random.Random, geometry_type: str = "Polygon", vertices: int = 16) -> Dict[str, Any]:
+    """A geometry around a random point in Bali; ``vertices`` sets the complexity."""
+    lon = 114.4 + rng.random() * 1.2
+    lat = -8.85 + rng.random() * 0.8
+    if geometry_type == "Point":
+        return {"type": "Point", "coordinates": [round(lon, 7), round(lat, 7)]}
+    if geometry_type == "LineString":
+        coords = [[round(lon + k * 1e-4, 7), round(lat + rng.uniform(-1e-4, 1e-4), 7)] for k in range(max(vertices, 2))]
+        return {"type": "LineString", "coordinates": coords}
+    ring = _ring(rng, lon, lat, max(vertices, 3))
+    if geometry_type == "Polygon":
+        return {"type": "Polygon", "coordinates": [ring]}
+    if geometry_type == "MultiPolygon":
+        other = _ring(rng, lon + 0.01, lat + 0.01, max(vertices, 3))
+        return {"type": "MultiPolygon", "coordinates": [[ring], [other]]}
+    raise ValueError(f"geometry type tidak dikenal: {geometry_type}")
+
+
+def _ring(rng: random.Random, lon: float, lat: float, vertices: int) -> List[List[float]]:
+    radius = 1e-3 + rng.random() * 2e-3
+    ring = []
+    for k in range(vertices):
+        angle = 2 * math.pi * k / vertices
+        r = radius * (0.8 + 0.4 * rng.random())
+        ring.append([round(lon + r * math.cos(angle), 7), round(lat + r * math.sin(angle), 7)])
+    ring.append(ring[0])
+    return ring
+
+
+def make_pipe_text(rng: random.Random, i: int) -> str:
+    """Pipe-separated description in the shape Step D styles."""
+    return " | ".join([
+        f"Nama PO: Posko {i}",
+        f"Kecamatan: {rng.choice(KECAMATAN)}",
+        f"Desa: Desa {rng.randrange(500)}",
+        f"Jenis Fasum: {rng.choice(JENIS_FASUM)}",
+        f"Daya Tampung: {rng.randrange(20, 2000)} orang",
+        f"Kondisi: {rng.choice(KONDISI)}",
+        f"Kontak person: 08{rng.randrange(10**9, 10**10)}",
+        rng.choice(KONDISI),
+    ])
+
+
+def iter_features(n: int, geometry_type: str = "Polygon", vertices: int = 16,
+                  id_duplicate_rate: float = 0.0, text_duplicate_rate: float = 0.0,
+                  seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield ``n`` features.
+
+    ``id_duplicate_rate`` is the share of features reusing an earlier id
+    (what combine has to rename); ``text_duplicate_rate`` is the share whose
+    pipe text repeats an earlier one (what the styling cache can reuse).
+    """
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        if i and rng.random() < id_duplicate_rate:
+            fid = f"F{rng.randrange(i):07d}"
+        else:
+            fid = f"F{i:07d}"
+        if texts and rng.random() < text_duplicate_rate:
+            text = texts[rng.randrange(len(texts))]
+        else:
+            text = make_pipe_text(rng, i)
+            if len(texts) < 10_000:
+                texts.append(text)
+        yield {
+            "type": "Feature",
+            "id": fid,
+            "properties": {
+                "kode": f"K{i:07d}",
+                "nama": f"Posko {i}",
+                "kecamatan": rng.choice(KECAMATAN),
+                "kapasitas": rng.randrange(20, 2000),
+                "luas_m2": round(rng.uniform(10, 5000), 2),
+                "aktif": rng.random() < 0.8,
+                "keterangan": text,
+            },
+            "geometry": make_geometry(rng, geometry_type, vertices),
+        }
+
+
+def feature_collection_bytes(features) -> bytes:
+    """UTF-8 FeatureCollection, serialized one feature at a time."""
+    parts = [b'{"type": "FeatureCollection", "features": [']
+    for k, feature in enumerate(features):
+        if k:
+            parts.append(b", ")
+        parts.append(json.dumps(feature, ensure_ascii=False).encode("utf-8"))
+    parts.append(b"]}")
+    return b"".join(parts)
+
+
+def feature_sequence_bytes(features) -> bytes:
+    """UTF-8 newline-delimited GeoJSON (GeoJSONSeq without RS), one feature per line."""
+    return b"".join(json.dumps(feature, ensure_ascii=False).encode("utf-8") + b"\n" for feature in features)
+
+
+def split_feature_collection(features: List[Dict[str, Any]], parts: int) -> List[bytes]:
+    """Serialize ``features`` as ``parts`` separate FeatureCollections (inputs for Step 0)."""
+    size = math.ceil(len(features) / parts) if features else 0
+    return [feature_collection_bytes(features[k * size:(k + 1) * size]) for k in range(parts)]
+
+
+def make_attribute_table(n: int, match_rate: float = 0.9, key_duplicate_rate: float = 0.0,
+                         seed: int = 0) -> pd.DataFrame:
+    """Additional table for Step C, joined on ``kode``.
+
+    ``match_rate`` of the features get a row; ``key_duplicate_rate`` of the
+    rows repeat a key (the many-to-one case).
+    """
+    rng = random.Random(seed + 1)
+    keys = [f"K{i:07d}" for i in range(n) if rng.random() < match_rate]
+    keys += [keys[rng.randrange(len(keys))] for _ in range(int(len(keys) * key_duplicate_rate))] if keys else []
+    return pd.DataFrame({
+        "kode": keys,
+        "status": [rng.choice(["Siap", "Perlu perbaikan", "Tidak aktif", ""]) for _ in keys],
+        "penanggung_jawab": [f"Petugas {rng.randrange(300)}" for _ in keys],
+        "catatan": [rng.choice(KONDISI) for _ in keys],
+    }, dtype=str)
+
+
+def make_point_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """Point layer over the same area as make_geometry, in the Step A CSV shape (for the spatial join)."""
+    rng = random.Random(seed + 2)
+    geometries = [json.dumps(make_geometry(rng, "Point")) for _ in range(n)]
+    return pd.DataFrame({"nama_titik": [f"Titik {i}" for i in range(n)], "geometry_json": geometries}, dtype=str)
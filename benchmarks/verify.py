@@ -0,0 +1,247 @@
+"""
+Check the columnar styling path against the per-cell reference code.
+
+    python -m benchmarks.verify
+    python -m benchmarks.verify --cells 100000 --seed 7
+
+Runs hand-written edge cases plus a seeded random corpus of pipe-separated
+cells through:
+
+- standardize_indonesian / standardize_indonesian_series (RewriteEngine)
+  against the original sequence of re.sub calls over the same rules;
+- _unique_fields, explode_pipe_fields and pipe_field_columns against
+  extract_fields_from_pipe;
+- style_pipe_values and process_pipe_values, normal and compact, against
+  process_pipe_separated_data.
+
+It also reports how much smaller the compact HTML is on the benchmark
+sample (benchmarks.synthetic.make_pipe_text). Prints the first mismatches
+of every check; exits with status 1 when any check fails or the compact
+ratio drops below COMPACT_MIN_RATIO.
+"""
+
+import argparse
+import random
+import re
+import sys
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_pipe_text
+from styling import (
+    STANDARDIZE_ENGINE, standardize_indonesian, standardize_indonesian_series, extract_fields_from_pipe,
+    process_pipe_separated_data, explode_pipe_fields, pipe_field_columns, style_pipe_values,
+    process_pipe_values, _unique_fields,
+)
+
+SHOWN_MISMATCHES = 3
+# Compact popup HTML must stay at least this many times smaller than the normal card.
+COMPACT_MIN_RATIO = 3.0
+COMPACT_SAMPLE_CELLS = 2_000
+# Whitespace str.strip() removes but Arrow's ASCII trim keeps, plus a few it does not remove at all.
+SPACES = ["\xa0", "\u3000", "\u2009", "\u202f", "\x1e", "\x85", "\u2028", "\t", "\r\n", "\u200b", "\ufeff"]
+
+EDGE_CASES = [
+    # Repeated fields: the last value wins, free text is appended.
+    "Desa: A | Desa: B",
+    "Desa: A | Desa: | Desa: C",
+    "Desa:A|Kecamatan:K|Desa:B|Kecamatan:",
+    # Renames that collide with a field already in the cell.
+    "Nama PO: a | Nama Fasilitas: b",
+    "Nama Fasilitas: b | Nama PO: a",
+    "Kontak person: 1 | Kontak Person: 2",
+    "Nama POO: x | Nama PO: y",
+    "Nama PO Kontak person: z",
+    # Free text next to a named Informasi field.
+    "Informasi: x | free | more",
+    "free | Informasi: x | more",
+    "free | Informasi: | more",
+    "Informasi | Informasi: x",
+    "jalur | jalur di lalu motor | Informasi: bisa di lalu mobil",
+    # Whitespace variants around names, values and separators.
+    "Desa:\xa0A\xa0|\xa0Kecamatan\xa0: B",
+    "\u3000Desa\u3000:\u3000A\u3000",
+    "Desa: A |\x1e| free\x1e",
+    "\tDesa\t:\tA\t|\t\t|\tfree",
+    "Desa: A\u200b | \u200b",
+    "\ufeffDesa: A",
+    "\xa0|\xa0|\xa0",
+    "Desa: 3\xa0m | +-\u20092m",
+    # Separators only, stray colons, empty names.
+    "", " ", "|", "|||", " | | ", ":", "::", ": x", "Desa:", "Desa :  ", "a:b:c", "x|", "|x",
+    # Spelling rules inside fields.
+    "Akses: bisa di lalu mobil | Lebar: +- 2m | Luas: 3are | help pad",
+    "JALUR di lalu | Di Pakai warga | HELP",
+    # Non-text cells.
+    None, np.nan, float("nan"), 0, 5, 2.5, True, [], ["a", "b"], {"Desa": "A"},
+]
+
+_NAMES = ["Nama PO", "Nama Fasilitas", "Kontak person", "Kontak Person", "Kecamatan", "Informasi", "Desa", "",
+          " Jenis Fasum ", "a:b", "Nama POO", "INFORMASI"]
+_VALUES = ["bisa di lalu mobil", "jalur", "  ", "", "di pakai warga", "3m", "+- 2m", "help pad", "Abang",
+           "toilet, listrik", "x|", ":", "jalur di lalu motor", "Di Rencanakan", "2 are"]
+_JUNK = [" ", "", "::", "Desa :  ", "Informasi: x", "Informasi:"]
+_NON_TEXT = [None, np.nan, "", "   ", 0, 5, 2.5, "|||", "Informasi"]
+
+
+def random_cells(n: int, seed: int) -> list:
+    """``n`` pipe-separated cells built from the names, values and whitespace above."""
+    rng = random.Random(seed)
+
+    def spaced(text: str) -> str:
+        if rng.random() < 0.1:
+            return rng.choice(SPACES) + text + rng.choice(SPACES)
+        return text
+
+    def cell():
+        if rng.random() < 0.05:
+            return rng.choice(_NON_TEXT)
+        parts = []
+        for _ in range(rng.randint(0, 7)):
+            r = rng.random()
+            if r < 0.5:
+                parts.append(f"{spaced(rng.choice(_NAMES))}:{spaced(rng.choice(_VALUES))}")
+            elif r < 0.8:
+                parts.append(spaced(rng.choice(_VALUES)))
+            else:
+                parts.append(rng.choice(_JUNK))
+        return "|".join(parts)
+
+    return [cell() for _ in range(n)]
+
+
+def reference_standardize(text):
+    """standardize_indonesian as one re.sub per rule, in rule order."""
+    if not text or pd.isna(text):
+        return ""
+    text = str(text)
+    for pattern, replacement in STANDARDIZE_ENGINE.rules:
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+def _is_missing(value) -> bool:
+    return isinstance(value, float) and value != value
+
+
+def reference_cell(value):
+    """The cell as the per-cell code gets it: lists and dicts as their str(), NaN as None."""
+    if isinstance(value, (list, dict)):
+        return str(value)
+    return None if _is_missing(value) else value
+
+
+def reference_fields(value) -> dict:
+    return extract_fields_from_pipe(reference_cell(value))
+
+
+def check_standardize(cells: list) -> List[str]:
+    texts = [part for cell in cells if isinstance(cell, str) for part in [cell] + cell.split("|") + cell.split(":")]
+    texts += [None, np.nan, "", 0] + SPACES
+    errors = []
+    for text in texts:
+        expected = reference_standardize(text)
+        if standardize_indonesian(text) != expected:
+            errors.append(f"standardize_indonesian({text!r}) = {standardize_indonesian(text)!r}, expected {expected!r}")
+    series = standardize_indonesian_series(pd.Series(texts, dtype=object))
+    for text, got in zip(texts, series.tolist()):
+        expected = reference_standardize(text)
+        if got != expected:
+            errors.append(f"standardize_indonesian_series: {text!r} -> {got!r}, expected {expected!r}")
+    return errors
+
+
+def check_unique_fields(cells: list) -> List[str]:
+    texts = list(dict.fromkeys(cell for cell in cells if isinstance(cell, str) and cell))
+    table = _unique_fields(texts)
+    got = [[] for _ in texts]
+    for uid, field, value in zip(table["uid"], table["field"], table["value"]):
+        got[uid].append((field, value))
+    return [f"_unique_fields({text!r}) = {fields}, expected {list(extract_fields_from_pipe(text).items())}"
+            for text, fields in zip(texts, got) if fields != list(extract_fields_from_pipe(text).items())]
+
+
+def check_explode(cells: list) -> List[str]:
+    table = explode_pipe_fields(pd.Series(cells, dtype=object))
+    got = [[] for _ in cells]
+    for row, field, value in zip(table["row"], table["field"], table["value"]):
+        got[row].append((field, value))
+    return [f"explode_pipe_fields({cell!r}) = {fields}, expected {list(reference_fields(cell).items())}"
+            for cell, fields in zip(cells, got) if fields != list(reference_fields(cell).items())]
+
+
+def check_field_columns(cells: list) -> List[str]:
+    prefix = "k."
+    wide = pipe_field_columns(pd.Series(cells, dtype=object), prefix)
+    errors = []
+    expected_columns = {}
+    for cell in cells:
+        expected_columns.update(dict.fromkeys(prefix + k for k, v in reference_fields(cell).items() if v != ""))
+    if list(wide.columns) != list(expected_columns):
+        errors.append(f"pipe_field_columns columns {list(wide.columns)}, expected {list(expected_columns)}")
+    for cell, row in zip(cells, wide.to_dict("records")):
+        got = {k: v for k, v in row.items() if not _is_missing(v)}
+        expected = {prefix + k: v for k, v in reference_fields(cell).items() if v != ""}
+        if got != expected:
+            errors.append(f"pipe_field_columns({cell!r}) = {got}, expected {expected}")
+    return errors
+
+
+def check_html(style: Callable[[list, bool], List[str]], name: str) -> Callable[[list], List[str]]:
+    def check(cells: list) -> List[str]:
+        errors = []
+        for compact in (False, True):
+            got = style(cells, compact)
+            for cell, html in zip(cells, got):
+                expected = process_pipe_separated_data(reference_cell(cell), compact)
+                if html != expected:
+                    errors.append(f"{name}({cell!r}, compact={compact}) differs from process_pipe_separated_data")
+        return errors
+    return check
+
+
+CHECKS = [
+    ("standardize", check_standardize),
+    ("_unique_fields", check_unique_fields),
+    ("explode_pipe_fields", check_explode),
+    ("pipe_field_columns", check_field_columns),
+    ("style_pipe_values", check_html(style_pipe_values, "style_pipe_values")),
+    ("process_pipe_values", check_html(process_pipe_values, "process_pipe_values")),
+]
+
+
+def compact_ratio(n: int, seed: int) -> float:
+    """Bytes of normal over compact HTML for ``n`` benchmark texts."""
+    rng = random.Random(seed)
+    texts = [make_pipe_text(rng, i) for i in range(n)]
+    normal = sum(len(html.encode("utf-8")) for html in style_pipe_values(texts))
+    compact = sum(len(html.encode("utf-8")) for html in style_pipe_values(texts, compact=True))
+    return normal / compact
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the columnar styling path against the per-cell code.")
+    parser.add_argument("--cells", type=int, default=20_000, help="random cells on top of the edge cases")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Edge cases alone, then mixed into the random corpus so they also go through the Arrow path.
+    corpora = [("edge cases", list(EDGE_CASES)), ("random", random_cells(args.cells, args.seed) + list(EDGE_CASES))]
+    failed = False
+    for corpus, cells in corpora:
+        for name, check in CHECKS:
+            errors = check(cells)
+            print(f"{'❌' if errors else '✅'} {name} ({corpus}, {len(cells)} cells): {len(errors)} mismatches")
+            for error in errors[:SHOWN_MISMATCHES]:
+                print(f"    {error}")
+            failed = failed or bool(errors)
+    ratio = compact_ratio(COMPACT_SAMPLE_CELLS, args.seed)
+    print(f"{'❌' if ratio < COMPACT_MIN_RATIO else '✅'} compact HTML ({COMPACT_SAMPLE_CELLS} benchmark cells): "
+          f"x{ratio:.2f} smaller (minimum x{COMPACT_MIN_RATIO:.1f})")
+    return 1 if failed or ratio < COMPACT_MIN_RATIO else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Run the A→C→D→B pipeline headless over files or directories.
+
+    python cli.py data/*.geojson --out out/ --join attributes.csv --join-key kode \\
+        --style keterangan --format geojson --jobs 4
+    python cli.py big.geojsonl --out out/ --style keterangan --format geojsonseq --stream
+    python cli.py data/ --out out/ --config pipeline.json
+
+Step A reads each input (GeoJSON, GeoJSONSeq, CSV, XLSX or Parquet; the
+supported files under a directory), Step C joins an attribute table on a
+key or by location, Step D adds ``<col>_styled`` HTML columns (and/or
+``<col>.<field>`` columns with ``--field-columns``) and Step B
+writes the result to ``--out`` in ``--format``. Steps without options are
+skipped. ``--config`` takes a JSON object with the same option names
+(underscores for dashes); command-line options override it.
+
+``--stream`` processes GeoJSON/GeoJSONSeq inputs record by record when no
+join is requested and the output is GeoJSON(Seq): memory stays bounded by
+one feature and the styling cache, and properties pass through as they
+are (no Step B blanking of "NaN"/"None" strings).
+
+Files run ``--jobs`` at a time in separate processes; a timing summary
+(per file, then per stage) is printed to stderr at the end.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from typing import List, Optional
+
+import perf
+from engine import ARCHIVE_MODES
+from pipeline import OUTPUT_EXTENSIONS, configure_logging, expand_inputs, run_batch, timing_summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("inputs", nargs="*", help="input files or directories")
+    parser.add_argument("--out", help="output directory")
+    parser.add_argument("--config", help="JSON file with default options")
+    parser.add_argument("--format", choices=list(OUTPUT_EXTENSIONS), default="geojson",
+                        help="Step B output (geojsonseq: newline-delimited, geojsons: RS-prefixed, zip: tiles/chunks)")
+    parser.add_argument("--join", help="Step C: attribute table (CSV/XLSX/Parquet/GeoJSON) joined onto every input")
+    parser.add_argument("--join-key", help="column present in both files (attribute join)")
+    parser.add_argument("--join-mode", choices=["attribute", "spatial"], default="attribute",
+                        help="spatial: points of the input inside polygons of --join")
+    parser.add_argument("--style", nargs="+", help="Step D: pipe-separated columns to style")
+    parser.add_argument("--compact", action="store_true", help="compact HTML")
+    parser.add_argument("--field-columns", action="store_true",
+                        help="Step D: also one <col>.<field> column per pipe field (filterable in uMap)")
+    parser.add_argument("--no-html", action="store_true", help="Step D: skip the <col>_styled HTML columns")
+    parser.add_argument("--workers", type=int, default=1, help="styling worker processes per file")
+    parser.add_argument("--simplify", type=float, help="simplification tolerance in metres")
+    parser.add_argument("--precision", type=int, help="coordinate decimals")
+    parser.add_argument("--archive-mode", choices=list(ARCHIVE_MODES), default="chunks", help="layout of --format zip")
+    parser.add_argument("--sidecar", help="geometry sidecar (.json.gz) for CSV inputs without geometry_json")
+    parser.add_argument("--stream", action="store_true", help="record-by-record GeoJSON(Seq) processing")
+    parser.add_argument("--jobs", type=int, default=1, help="files processed in parallel")
+    parser.add_argument("--memory", action="store_true", help="also record tracemalloc peaks (slower)")
+    parser.add_argument("--quiet", action="store_true", help="only warnings, errors and the summary")
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            defaults = json.load(f)
+        unknown = sorted(set(defaults) - set(vars(args)))
+        if unknown:
+            parser.error(f"unknown option(s) in {args.config}: {', '.join(unknown)}")
+        parser.set_defaults(**defaults)
+        args = parser.parse_args(argv)
+    if not args.inputs or not args.out:
+        parser.error("inputs and --out are required")
+    if args.no_html and not args.field_columns:
+        parser.error("--no-html needs --field-columns")
+    if args.join and args.join_mode == "attribute" and not args.join_key:
+        parser.error("--join needs --join-key (or --join-mode spatial)")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    configure_logging(logging.WARNING if args.quiet else logging.INFO)
+    perf.set_level(perf.MEMORY if args.memory else perf.TIME)
+
+    try:
+        inputs = expand_inputs(args.inputs)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    if not inputs:
+        print("❌ Tidak ada file input yang didukung", file=sys.stderr)
+        return 1
+    config = {k: v for k, v in vars(args).items() if k not in ("inputs", "out", "config", "jobs", "memory", "quiet")}
+    if args.jobs > 1 and args.workers > 1:
+        # Parallel files already use the cores; styling pools inside them would oversubscribe.
+        print(f"⚠️ --workers {args.workers} diabaikan: dengan --jobs {args.jobs} tiap file distyling dengan 1 worker",
+              file=sys.stderr)
+        config["workers"] = 1
+    results = run_batch(inputs, args.out, config, args.jobs)
+    print("\n".join(timing_summary(results)), file=sys.stderr)
+    return 1 if any("error" in result for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2040 @@
+"""
+UI-free data helpers behind the Streamlit app: streaming GeoJSON reading and
+writing, CSV/XLSX/Parquet conversion, combine, join and Step D styling.
+
+Nothing here imports Streamlit, so the functions can be timed and reused
+outside the app (see benchmarks/).
+"""
+
+import numpy as np
+import pandas as pd
+import json
+import io
+import itertools
+import re
+import codecs
+import contextlib
+import gc
+import gzip
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Callable
+
+from styling import process_pipe_separated_data, process_pipe_values, extract_fields_from_pipe, _cell_text, _factorize_cells
+from perf import instrument, stage
+
+try:
+    import orjson  # optional: several times faster than json on whole documents
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping that counts hits and misses.
+
+    Entries are limited by count (``maxsize``) and, when ``max_bytes`` is
+    set, by the total of ``sizeof(value)`` (plus ``key_sizeof(key)`` when
+    given, for caches whose keys are as large as their values) over all
+    entries.
+    """
+
+    def __init__(self, maxsize: int, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None,
+                 key_sizeof: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.key_sizeof = key_sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizeof(value) + (self.key_sizeof(key) if self.key_sizeof is not None else 0)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._sizes.pop(key, 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if size:
+                self._sizes[key] = size
+                self.nbytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                old_key, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        # No LRU reordering and no hit/miss accounting.
+        return key in self._data
+
+def estimate_nbytes(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.index.memory_usage(deep=True)) + sum(_column_nbytes(value[col]) for col in value.columns)
+    if isinstance(value, pd.Series):
+        return int(value.index.memory_usage(deep=True)) + _column_nbytes(value)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value)
+    if isinstance(getattr(value, "nbytes", None), int):
+        return value.nbytes
+    if isinstance(value, dict) and isinstance(value.get("features"), list):
+        # FeatureCollections: extrapolate from the JSON size of a sample of features.
+        features = value["features"]
+        sample = features[::max(len(features) // 100, 1)][:100]
+        per_item = sum(len(json.dumps(f, default=str)) for f in sample) / len(sample) if sample else 0
+        return sys.getsizeof(value) + int(2 * per_item * len(features))
+    if isinstance(value, dict) and value:
+        # Geometry sidecars: extrapolate from the JSON size of a small sample.
+        sample = list(itertools.islice(value.values(), 100))
+        per_item = sum(len(json.dumps(v)) for v in sample) / len(sample)
+        return sys.getsizeof(value) + int(2 * per_item * len(value))
+    return sys.getsizeof(value)
+
+def _column_nbytes(series: pd.Series) -> int:
+    if isinstance(series.dtype, pd.SparseDtype):
+        # memory_usage(deep=True) fails on sparse object columns: count the stored values and positions.
+        array = series.array
+        return int(pd.Series(array.sp_values).memory_usage(index=False, deep=True)) + array.sp_index.indices.nbytes
+    return int(series.memory_usage(index=False, deep=True))
+
+@instrument()
+def upload_digest(file_buffer) -> str:
+    """Content hash of an uploaded file (or pasted text)."""
+    if isinstance(file_buffer, (bytes, str)):
+        data = file_buffer
+    elif hasattr(file_buffer, "getvalue"):
+        data = file_buffer.getvalue()
+    else:
+        file_buffer.seek(0)
+        data = file_buffer.read()
+        file_buffer.seek(0)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+@instrument()
+def dataframe_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    csv_buffer = io.StringIO()
+    df.to_csv(csv_buffer, index=False, encoding='utf-8')
+    return csv_buffer.getvalue().encode("utf-8")
+
+def _to_text(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+def arrow_compatible(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn object columns Arrow cannot type as one flat column (numbers mixed
+    with text, nested GeoJSON properties) into text; nested values become JSON."""
+    import pyarrow as pa
+
+    fixed = {}
+    for col in df.columns:
+        if df[col].dtype == object:
+            try:
+                flat = not pa.types.is_nested(pa.array(df[col], from_pandas=True).type)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                flat = False
+            if not flat:
+                fixed[col] = df[col].map(_to_text, na_action="ignore")
+    return df.assign(**fixed) if fixed else df
+
+@instrument()
+def dataframe_to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    """Parquet with the same column layout as the CSV export; repeated strings are dictionary-encoded."""
+    out = io.BytesIO()
+    arrow_compatible(expand_dataframe(df)).to_parquet(out, engine="pyarrow", index=False, use_dictionary=True, compression="zstd")
+    return out.getvalue()
+
+@instrument()
+def read_parquet_upload(file_buffer) -> pd.DataFrame:
+    file_buffer.seek(0)
+    return pd.read_parquet(file_buffer, engine="pyarrow")
+
+# Encoding is decided once from a byte sample; the rest of the file is then
+# validated with an incremental decoder (no parsing) before the single parse.
+ENCODING_SAMPLE_BYTES = 1 << 16
+ENCODING_VALIDATE_BLOCK = 1 << 20
+XLSX_STREAMING_MIN_BYTES = 5 * 1024 * 1024
+
+@instrument()
+def detect_csv_encoding(file_buffer) -> str:
+    """'utf-8' if the whole file decodes as UTF-8, otherwise 'latin-1'.
+
+    Latin-1 decodes any byte sequence, so it was always where the old
+    UTF-8 → Latin-1 → CP1252 retry chain ended for non-UTF-8 files.
+    """
+    file_buffer.seek(0)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        decoder.decode(file_buffer.read(ENCODING_SAMPLE_BYTES))
+        while True:
+            block = file_buffer.read(ENCODING_VALIDATE_BLOCK)
+            if not block:
+                break
+            decoder.decode(block)
+        decoder.decode(b"", final=True)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+    finally:
+        file_buffer.seek(0)
+
+def _excel_cell_text(value) -> str:
+    # Same text pd.read_excel(dtype=str, keep_default_na=False) gives a cell.
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _excel_header(values) -> List:
+    header = []
+    seen = set()
+    for i, value in enumerate(values):
+        if value is None or value == "":
+            name = f"Unnamed: {i}"
+        elif isinstance(value, float) and value.is_integer():
+            name = int(value)
+        else:
+            name = value
+        if name in seen:
+            base, k = name, 1
+            while f"{base}.{k}" in seen:
+                k += 1
+            name = f"{base}.{k}"
+        seen.add(name)
+        header.append(name)
+    return header
+
+@instrument()
+def read_xlsx_streaming(file_buffer) -> pd.DataFrame:
+    """First sheet of a workbook via openpyxl's read-only row iterator, filled column-wise."""
+    import openpyxl
+
+    file_buffer.seek(0)
+    workbook = openpyxl.load_workbook(file_buffer, read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return pd.DataFrame()
+        header_row = list(header_row)
+        while header_row and header_row[-1] is None:
+            header_row.pop()
+        columns = [[] for _ in header_row]
+        n_rows = 0
+        last_non_empty = 0
+        for row in rows:
+            for j, value in enumerate(row):
+                if j >= len(columns):
+                    if value is None:
+                        continue
+                    header_row.append(None)
+                    columns.append([""] * n_rows)
+                columns[j].append(_excel_cell_text(value))
+                if value is not None:
+                    last_non_empty = n_rows + 1
+            n_rows += 1
+            for col in columns:
+                if len(col) < n_rows:
+                    col.append("")
+    finally:
+        workbook.close()
+    # Like pandas, drop trailing rows that are completely empty.
+    header = _excel_header(header_row)
+    return pd.DataFrame({name: col[:last_non_empty] for name, col in zip(header, columns)})
+
+# Streaming GeoJSON reader: walks the top-level object and the "features" array
+# one value at a time, so a FeatureCollection never has to be fully in memory.
+GEOJSON_READ_BLOCK_SIZE = 1 << 20
+
+_JSON_DECODER = json.JSONDecoder()
+def json_loads(data):
+    """json.loads through orjson when it is installed.
+
+    Documents orjson refuses but json accepts (NaN literals, integers over
+    64 bits, lone surrogates) fall back to json, which also supplies the
+    error message for invalid input.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+@contextlib.contextmanager
+def gc_paused():
+    """Suspend the cyclic GC while building large acyclic structures such as
+    parsed JSON; its repeated passes over the growing heap otherwise take
+    longer than the parse itself."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool with spawned workers.
+
+    The app starts pools from inside the multithreaded Streamlit server,
+    where a forked child can inherit locks held by other threads (logging,
+    the import lock, malloc) and hang. Workers only need Streamlit-free
+    modules, so spawning them is safe.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_MISSING = float("nan")  # value for properties a feature does not have
+
+class _JsonTextReader:
+    """Incremental text buffer over a (binary or text) file for raw_decode."""
+
+    def __init__(self, file_buffer, block_size=GEOJSON_READ_BLOCK_SIZE):
+        if hasattr(file_buffer, "seek"):
+            file_buffer.seek(0)
+        self.file_buffer = file_buffer
+        self.block_size = block_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, grow=False):
+        if self.eof:
+            return False
+        if grow:
+            # A single value spans the whole buffer: read bigger blocks so
+            # re-decoding stays linear in the value size.
+            self.block_size *= 2
+        data = self.file_buffer.read(self.block_size)
+        if isinstance(data, bytes):
+            chunk = self.decoder.decode(data, final=not data)
+        else:
+            chunk = data
+        if not data:
+            self.eof = True
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _JSON_WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def next_char(self):
+        char = self.peek()
+        if char:
+            self.pos += 1
+        return char
+
+    def expect(self, expected):
+        char = self.next_char()
+        if char != expected:
+            raise ValueError(f"JSON tidak valid: diharapkan '{expected}', ditemukan '{char or 'EOF'}'")
+
+    def decode_value(self):
+        self.peek()
+        grow = False
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.text, self.pos)
+                # A number touching the end of the buffer may be truncated.
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill(grow)
+            grow = True
+
+def iter_geojson_features(file_buffer, require_type: Optional[str] = None,
+                          block_size: int = GEOJSON_READ_BLOCK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the features of a GeoJSON document one at a time.
+
+    Only one feature (plus a bounded read buffer) is held in memory. If
+    ``require_type`` is given, a ValueError is raised as soon as the top-level
+    "type" member turns out to be different (or missing at the end). A
+    Feature or geometry document yields itself as one feature. Further
+    top-level values after the document make it a text sequence, read as
+    GeoJSONSeq records; anything else after it is an error.
+    """
+    reader = _JsonTextReader(file_buffer, block_size)
+    reader.expect("{")
+    doc_type = None
+    members = {}
+    if reader.peek() == "}":
+        reader.next_char()
+    else:
+        while True:
+            key = reader.decode_value()
+            if not isinstance(key, str):
+                raise ValueError("JSON tidak valid: key object harus string")
+            reader.expect(":")
+            if key == "features" and reader.peek() == "[":
+                reader.next_char()
+                if reader.peek() == "]":
+                    reader.next_char()
+                else:
+                    while True:
+                        yield reader.decode_value()
+                        char = reader.next_char()
+                        if char == "]":
+                            break
+                        if char != ",":
+                            raise ValueError(f"JSON tidak valid di dalam 'features': '{char or 'EOF'}'")
+            else:
+                value = reader.decode_value()
+                members[key] = value
+                if key == "type":
+                    doc_type = value
+                    if require_type and doc_type != require_type:
+                        raise ValueError(f"bukan {require_type} (type: {doc_type})")
+            char = reader.next_char()
+            if char == "}":
+                break
+            if char != ",":
+                raise ValueError(f"JSON tidak valid: '{char or 'EOF'}'")
+    if require_type and doc_type != require_type:
+        raise ValueError(f"bukan {require_type}")
+    if doc_type in ("Feature",) + _GEOMETRY_TYPES:
+        yield from _record_features(members, 1)
+    number = 1
+    while reader.peek():
+        number += 1
+        try:
+            value = reader.decode_value()
+        except ValueError as e:
+            raise ValueError(f"JSON tidak valid setelah akhir dokumen (record ke-{number}): {e}") from None
+        yield from _record_features(value, number)
+
+# GeoJSON text sequences (RFC 8142): one Feature per record, records
+# prefixed by RS (0x1E) or simply one per line (newline-delimited GeoJSON).
+GEOJSONSEQ_EXTENSIONS = (".geojsonl", ".geojsons", ".geojsonseq", ".ndjson", ".jsonl")
+_RS = b"\x1e"
+_GEOMETRY_TYPES = ("Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon",
+                   "GeometryCollection")
+
+def _record_features(value, number: int) -> Iterator[Dict[str, Any]]:
+    """Features of one GeoJSONSeq record: a Feature, a FeatureCollection or a bare geometry."""
+    kind = value.get("type") if isinstance(value, dict) else None
+    if kind == "Feature":
+        yield value
+    elif kind == "FeatureCollection":
+        yield from value.get("features") or []
+    elif kind in _GEOMETRY_TYPES:
+        yield {"type": "Feature", "properties": {}, "geometry": value}
+    else:
+        raise ValueError(f"GeoJSONSeq record ke-{number} bukan Feature (type: {kind})")
+
+def _iter_records(file_buffer, block_size: int = GEOJSON_READ_BLOCK_SIZE) -> Iterator[bytes]:
+    """Raw records of a text sequence: split on RS when the stream starts with one, else on newlines."""
+    if hasattr(file_buffer, "seek"):
+        file_buffer.seek(0)
+    separator = None
+    pending = b""
+    while True:
+        data = file_buffer.read(block_size)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            break
+        pending += data
+        if separator is None:
+            head = pending.lstrip(b"\xef\xbb\xbf \t\r\n")
+            if not head:
+                continue
+            separator = _RS if head.startswith(_RS) else b"\n"
+        records = pending.split(separator)
+        pending = records.pop()
+        yield from records
+    yield pending
+
+def iter_geojsonseq_features(file_buffer, block_size: int = GEOJSON_READ_BLOCK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the features of a GeoJSONSeq / newline-delimited GeoJSON file record by record.
+
+    Memory is bounded by one record plus a read block. FeatureCollection
+    records yield their features; bare geometries become features without
+    properties.
+    """
+    for number, record in enumerate(_iter_records(file_buffer, block_size), 1):
+        text = record.strip()
+        if number == 1:
+            text = text.lstrip(b"\xef\xbb\xbf \t\r\n")
+        if not text:
+            continue
+        try:
+            value = json_loads(text)
+        except ValueError as e:
+            raise ValueError(f"GeoJSONSeq tidak valid di record ke-{number}: {e}") from None
+        yield from _record_features(value, number)
+
+def _first_object_kind(file_buffer) -> Optional[str]:
+    """GeoJSON type of the first top-level object, decided from its leading keys without reading the rest."""
+    reader = _JsonTextReader(file_buffer, 1 << 16)
+    if reader.next_char() != "{":
+        return None
+    while reader.peek() not in ("}", ""):
+        key = reader.decode_value()
+        reader.expect(":")
+        if key == "features":
+            return "FeatureCollection"
+        if key in ("properties", "geometry"):
+            return "Feature"
+        value = reader.decode_value()
+        if key == "type":
+            return value if isinstance(value, str) else None
+        if reader.peek() == ",":
+            reader.next_char()
+    return None
+
+def _is_sequence_file(file_buffer, name: Optional[str] = None) -> bool:
+    """A GeoJSONSeq file by its extension or a leading RS, read with the record splitter."""
+    if name and name.lower().endswith(GEOJSONSEQ_EXTENSIONS):
+        return True
+    if hasattr(file_buffer, "seek"):
+        file_buffer.seek(0)
+    head = file_buffer.read(64)
+    if hasattr(file_buffer, "seek"):
+        file_buffer.seek(0)
+    if isinstance(head, str):
+        head = head.encode("utf-8")
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(_RS)
+
+def peek_geojson_type(file_buffer, name: Optional[str] = None) -> Optional[str]:
+    """Header peek: "GeoJSONSeq" for a text sequence, else the top-level type of the document (None if unreadable).
+
+    A sequence is recognized by its extension, a leading RS, or a Feature or
+    geometry followed by another top-level value. Of a FeatureCollection
+    only the leading keys are read; one followed by more records is still
+    read as a sequence by iter_geojson_features.
+    """
+    if _is_sequence_file(file_buffer, name):
+        return "GeoJSONSeq"
+    try:
+        kind = _first_object_kind(file_buffer)
+        if kind in ("Feature",) + _GEOMETRY_TYPES:
+            # A single feature or geometry is small: decode it whole and look past it.
+            reader = _JsonTextReader(file_buffer, 1 << 16)
+            reader.decode_value()
+            if reader.peek():
+                kind = "GeoJSONSeq"
+    except ValueError:
+        kind = None
+    finally:
+        if hasattr(file_buffer, "seek"):
+            file_buffer.seek(0)
+    return kind
+
+def is_geojsonseq(file_buffer, name: Optional[str] = None) -> bool:
+    return peek_geojson_type(file_buffer, name) == "GeoJSONSeq"
+
+def iter_uploaded_features(file_buffer, name: Optional[str] = None,
+                           require_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Features of a GeoJSON document or a GeoJSONSeq file (``require_type`` only applies to the former)."""
+    if _is_sequence_file(file_buffer, name):
+        return iter_geojsonseq_features(file_buffer)
+    if require_type and is_geojsonseq(file_buffer, name):
+        # Features one after another without RS: the document reader takes them as records.
+        require_type = None
+    return iter_geojson_features(file_buffer, require_type)
+
+# Below this total size, starting worker processes costs more than parsing inline.
+PARSE_PARALLEL_MIN_BYTES = 8 << 20
+
+def parse_geojson_upload(name: str, data: bytes, require_type: Optional[str] = "FeatureCollection") -> tuple:
+    """Parse one whole GeoJSON/GeoJSONSeq upload into its feature list; returns (features, seconds).
+
+    The unit of work of parse_geojson_uploads. Unlike the streaming reader
+    it parses the document in one call (orjson when available), which is
+    the fastest way when the features all end up in memory anyway.
+    """
+    start = time.perf_counter()
+    try:
+        with gc_paused():
+            buffer = io.BytesIO(data)
+            if _is_sequence_file(buffer, name):
+                features = list(iter_geojsonseq_features(buffer))
+            else:
+                try:
+                    doc = json_loads(data)
+                except ValueError:
+                    # Several top-level values (or invalid JSON): the streaming
+                    # reader takes them as records or reports where it breaks.
+                    features = list(iter_uploaded_features(buffer, name, require_type))
+                else:
+                    doc_type = doc.get("type") if isinstance(doc, dict) else None
+                    if require_type and doc_type != require_type:
+                        raise ValueError(f"bukan {require_type} (type: {doc_type})")
+                    if doc_type in ("Feature",) + _GEOMETRY_TYPES:
+                        features = list(_record_features(doc, 1))
+                    else:
+                        features = (doc.get("features") if isinstance(doc, dict) else None) or []
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from None
+    return features, time.perf_counter() - start
+
+def parse_workers(sizes: List[int]) -> int:
+    """Worker processes for reading files of these sizes: one per file and core, 1 for small batches."""
+    if len(sizes) < 2 or sum(sizes) < PARSE_PARALLEL_MIN_BYTES:
+        return 1
+    return min(len(sizes), os.cpu_count() or 1)
+
+def check_geojson_uploads(uploads: List[tuple], require_type: Optional[str] = "FeatureCollection"):
+    """Header-peek every ``(name, file buffer)`` upload before any is parsed.
+
+    Raises ValueError naming the first upload that is not a ``require_type``
+    document. A GeoJSONSeq passes; a lone Feature or geometry document does not.
+    """
+    with stage("parse.peek", rows=len(uploads)):
+        for name, buffer in uploads:
+            kind = peek_geojson_type(buffer, name)
+            single = kind in ("Feature",) + _GEOMETRY_TYPES
+            if require_type and (single or kind not in (require_type, "GeoJSONSeq")):
+                raise ValueError(f"{name}: bukan {require_type} (type: {kind})")
+
+def _counted_features(name: str, features: Iterator[Dict[str, Any]],
+                      progress: Optional[Callable[[str, int, float], None]]) -> Iterator[Dict[str, Any]]:
+    start = time.perf_counter()
+    n = 0
+    for feat in features:
+        n += 1
+        yield feat
+    if progress:
+        progress(name, n, time.perf_counter() - start)
+
+def iter_upload_sources(uploads: List[tuple], require_type: Optional[str] = "FeatureCollection",
+                        progress: Optional[Callable[[str, int, float], None]] = None) -> Iterator[tuple]:
+    """Streaming counterpart of parse_geojson_uploads: ``(name, feature iterator)`` per ``(name, file buffer)``.
+
+    Meant for iter_combined_features: every upload is header-peeked (see
+    check_geojson_uploads) before the first feature is read, then each file
+    is decoded one feature at a time, so only the combined features are
+    held. ``progress(name, features, seconds)`` is called as each file is
+    exhausted.
+    """
+    check_geojson_uploads(uploads, require_type)
+    for name, buffer in uploads:
+        yield name, _counted_features(name, iter_uploaded_features(buffer, name, require_type), progress)
+
+@instrument(rows=lambda parsed: sum(len(features) for features in parsed))
+def parse_geojson_uploads(uploads: List[tuple], workers: Optional[int] = None,
+                          require_type: Optional[str] = "FeatureCollection",
+                          progress: Optional[Callable[[str, int, float], None]] = None) -> List[List[Dict[str, Any]]]:
+    """Parse ``(name, bytes)`` uploads concurrently; feature lists come back in upload order.
+
+    Every upload is header-peeked first (see check_geojson_uploads), so a
+    wrong file is rejected before any parsing starts. ``progress(name,
+    features, seconds)`` is called as each file finishes. ``workers``
+    defaults to parse_workers(), whichever JSON backend is installed.
+
+    Unlike iter_upload_sources this holds every upload's bytes and feature
+    list until the caller is done with them; it pays off when several cores
+    parse a big batch at once.
+    """
+    check_geojson_uploads([(name, io.BytesIO(data)) for name, data in uploads], require_type)
+    if workers is None:
+        workers = parse_workers([len(data) for _, data in uploads])
+    parsed: List[Optional[List[Dict[str, Any]]]] = [None] * len(uploads)
+    if workers > 1:
+        with process_pool(workers) as pool, gc_paused():
+            futures = {pool.submit(parse_geojson_upload, name, data, require_type): i
+                       for i, (name, data) in enumerate(uploads)}
+            for future in as_completed(futures):
+                i = futures[future]
+                parsed[i], seconds = future.result()
+                if progress:
+                    progress(uploads[i][0], len(parsed[i]), seconds)
+    else:
+        with gc_paused():
+            for i, (name, data) in enumerate(uploads):
+                parsed[i], seconds = parse_geojson_upload(name, data, require_type)
+                if progress:
+                    progress(name, len(parsed[i]), seconds)
+    return parsed
+
+def geometry_key(fid) -> str:
+    """Key of a feature in a geometry sidecar; stable across the CSV round trip."""
+    if fid is None or (isinstance(fid, float) and fid != fid):
+        return ""
+    return str(fid)
+
+def feature_ids_digest(ids: Iterable) -> str:
+    """Order-independent digest of the distinct geometry keys of ``ids``.
+
+    Tells whether an edited CSV still holds the features a geometry sidecar
+    was built from: generic ids such as feature_N alone do not.
+    """
+    keys = pd.Series([geometry_key(fid) for fid in ids], dtype=object).drop_duplicates()
+    return f"{len(keys)}:{int(pd.util.hash_pandas_object(keys, index=False).sum())}"
+
+# Properties present on at most this share of the features (typical for
+# layers with different schemas combined in Step 0) are stored as sparse
+# columns: memory and export time follow the number of values, not rows.
+SPARSE_MAX_DENSITY = 0.2
+GEOJSON_CHUNK_ROWS = 50_000
+
+def sparse_column(length: int, positions, values, fill_value=_MISSING, dtype=object) -> pd.arrays.SparseArray:
+    """SparseArray of ``length`` rows holding ``values`` at the sorted ``positions``, ``fill_value`` elsewhere."""
+    from pandas._libs.sparse import IntIndex
+
+    sp_values = pd.Series(values, dtype=dtype).to_numpy()
+    index = IntIndex(length, np.asarray(positions, dtype=np.int32))
+    return pd.arrays.SparseArray(sp_values, sparse_index=index, dtype=pd.SparseDtype(dtype, fill_value))
+
+def _property_column(n: int, positions: np.ndarray, values: np.ndarray, max_density: float):
+    if len(positions) == n:
+        return pd.Series(values.tolist())
+    if len(positions) <= max_density * n:
+        # Same numeric upcast as a dense column with gaps (ints -> float64); everything else stays object.
+        inferred = pd.Series(values.tolist() + [_MISSING]).dtype
+        return pd.Series(sparse_column(n, positions, values, dtype=inferred if inferred.kind == "f" else object))
+    dense = np.full(n, _MISSING, dtype=object)
+    dense[positions] = values
+    return pd.Series(dense.tolist())
+
+def _flush_properties(pending: Dict[str, tuple], flushed: Dict[str, list]):
+    """Move the (rows, values) lists of a chunk into int32 / object arrays."""
+    for k, (positions, values) in pending.items():
+        flushed.setdefault(k, []).append(
+            (np.array(positions, dtype=np.int32), pd.Series(values, dtype=object).to_numpy()))
+    pending.clear()
+
+@instrument()
+def features_to_dataframe(features: Iterable[Dict[str, Any]],
+                          geometry_store: Optional[Dict[str, Any]] = None,
+                          max_density: float = SPARSE_MAX_DENSITY,
+                          chunk_rows: int = GEOJSON_CHUNK_ROWS) -> pd.DataFrame:
+    """Convert features to a DataFrame: _feature_id, geometry_json, then one column per property key.
+
+    Each property is collected as (row, value) pairs, so a feature only
+    costs the keys it has; every ``chunk_rows`` features the pairs are
+    packed into int32 / object arrays, which keeps the per-value overhead
+    bounded however many features there are. Keys present on at most
+    ``max_density`` of the features become sparse columns; the others are
+    dense, with dtypes inferred per column the way pd.DataFrame(rows)
+    would. With ``geometry_store`` the geometries go into that dict (keyed
+    by geometry_key of the feature id) and no geometry_json column is
+    produced; features whose id is empty or shared by another feature are
+    left out of the store.
+    """
+    ids = []
+    geometries = []
+    pending = {}
+    flushed = {}
+    ambiguous_keys = set()
+    n = 0
+    for feat in features:
+        props = feat.get("properties", {}) or {}
+        geom = feat.get("geometry", None)
+        fid = feat.get("id", f"feature_{n}")
+        ids.append(fid)
+        if geometry_store is None:
+            geometries.append(json.dumps(geom) if geom else "")
+        elif geom:
+            key = geometry_key(fid)
+            if key in geometry_store or key in ambiguous_keys:
+                # Several features share this id: none of them can be matched back safely.
+                geometry_store.pop(key, None)
+                ambiguous_keys.add(key)
+            elif key:
+                geometry_store[key] = geom
+        for k, v in props.items():
+            column = pending.get(k)
+            if column is None:
+                column = pending[k] = ([], [])
+            column[0].append(n)
+            column[1].append(v)
+        n += 1
+        if n % chunk_rows == 0:
+            _flush_properties(pending, flushed)
+    if not n:
+        return pd.DataFrame()
+    _flush_properties(pending, flushed)
+
+    # In sidecar mode ids stay as-is (no int -> float upcast) so the CSV text
+    # of every id matches its geometry_key.
+    columns = {"_feature_id": pd.Series(ids, dtype=object if geometry_store is not None else None)}
+    if geometry_store is None:
+        columns["geometry_json"] = pd.Series(geometries)
+    for k, parts in flushed.items():
+        positions = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        if k in columns:
+            # A property named like a reserved column overrides its value.
+            merged = columns[k].tolist()
+            for position, value in zip(positions.tolist(), values.tolist()):
+                merged[position] = value
+            columns[k] = pd.Series(merged, dtype=columns[k].dtype if k == "_feature_id" else None)
+        else:
+            columns[k] = _property_column(n, positions, values, max_density)
+    return pd.DataFrame(columns)
+
+@instrument()
+def geojson_to_dataframe(geojson: Dict[str, Any],
+                         geometry_store: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    return features_to_dataframe(geojson.get("features", []), geometry_store=geometry_store)
+
+@instrument()
+def read_geojson_dataframe(file_buffer, require_type: Optional[str] = None,
+                           geometry_store: Optional[Dict[str, Any]] = None,
+                           chunk_rows: int = GEOJSON_CHUNK_ROWS) -> pd.DataFrame:
+    """Stream a GeoJSON or GeoJSONSeq upload straight into a DataFrame without json.load."""
+    features = iter_uploaded_features(file_buffer, getattr(file_buffer, "name", None), require_type)
+    return features_to_dataframe(features, geometry_store, chunk_rows=chunk_rows)
+
+@instrument()
+def geometry_sidecar_bytes(geometry_store: Dict[str, Any]) -> bytes:
+    """Gzipped JSON object {feature id: geometry} to keep next to a sidecar-mode CSV."""
+    return gzip.compress(json.dumps(geometry_store, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+@instrument()
+def read_geometry_sidecar(file_buffer) -> Dict[str, Any]:
+    file_buffer.seek(0)
+    return json_loads(gzip.decompress(file_buffer.read()))
+
+GEOJSON_WRITE_CHUNK_ROWS = 10_000
+
+def _parse_geometry_json(value):
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+def _present(values: np.ndarray) -> np.ndarray:
+    """Mask of cells that are neither missing nor ''."""
+    keep = pd.notna(values)
+    if values.dtype == object:
+        keep &= values != ""
+    return keep
+
+def iter_dataframe_features(df: pd.DataFrame,
+                            chunk_rows: int = GEOJSON_WRITE_CHUNK_ROWS,
+                            geometry_store: Optional[Dict[str, Any]] = None,
+                            simplifier: Optional["GeometrySimplifier"] = None) -> Iterator[Dict[str, Any]]:
+    """Yield GeoJSON features for ``df`` rows, building properties column-wise.
+
+    Empty cells (NaN/None and "") are skipped with one vectorized mask per
+    column and chunk instead of per-cell checks; sparse columns only look
+    at their stored values. Without a geometry_json column, geometries are
+    looked up by feature id in ``geometry_store`` and attached as-is (no
+    copy, no JSON parsing). With ``simplifier`` each chunk's geometries are
+    rounded/simplified as one batch.
+    """
+    prop_positions = [j for j, col in enumerate(df.columns) if col not in ("geometry_json", "_feature_id")]
+    # Sparse columns with an empty fill only visit their stored values.
+    sparse = {}
+    for j in prop_positions:
+        array = df.iloc[:, j].array
+        if isinstance(array, pd.arrays.SparseArray) and not _present(np.array([array.fill_value], dtype=object))[0]:
+            sparse[j] = (array.sp_index.indices, array.sp_values)
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        n = len(part)
+        props = [{} for _ in range(n)]
+        for j in prop_positions:
+            col = df.columns[j]
+            if j in sparse:
+                indices, sp_values = sparse[j]
+                lo, hi = np.searchsorted(indices, [start, start + n])
+                positions = indices[lo:hi] - start
+                values = sp_values[lo:hi]
+                keep = _present(values)
+                for i, value in zip(positions[keep].tolist(), values[keep].tolist()):
+                    props[i][col] = value
+                continue
+            values = part.iloc[:, j]
+            keep = (values.notna() & (values != "")).to_numpy()
+            for i, value in zip(keep.nonzero()[0].tolist(), values[keep].tolist()):
+                props[i][col] = value
+
+        ids = part["_feature_id"].astype(object).tolist() if "_feature_id" in part.columns else [None] * n
+        if "geometry_json" in part.columns:
+            geoms = [_parse_geometry_json(v) for v in part["geometry_json"].tolist()]
+        elif geometry_store is not None:
+            geoms = [geometry_store.get(geometry_key(fid)) for fid in ids]
+        else:
+            geoms = [None] * n
+        if simplifier is not None:
+            geoms = simplifier.simplify_batch(geoms)
+
+        for p, geom, fid in zip(props, geoms, ids):
+            yield {"type": "Feature", "properties": p, "geometry": geom, "id": fid}
+
+@instrument()
+def dataframe_to_geojson(df: pd.DataFrame, geometry_store: Optional[Dict[str, Any]] = None,
+                         simplifier: Optional["GeometrySimplifier"] = None) -> Dict[str, Any]:
+    features = iter_dataframe_features(df, geometry_store=geometry_store, simplifier=simplifier)
+    return {"type": "FeatureCollection", "features": list(features)}
+
+_GEOJSON_HEADER = b'{\n  "type": "FeatureCollection",\n  "features": ['
+_GEOJSON_FOOTER = b"\n  ]\n}"
+_GEOJSON_EMPTY_FOOTER = b"]\n}"
+
+def _feature_text(feat: Dict[str, Any]) -> str:
+    return "    " + json.dumps(feat, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+
+def write_geojson(features: Iterable[Dict[str, Any]], out, chunk_features: int = 1000) -> None:
+    """Write a FeatureCollection to a binary stream, feature by feature.
+
+    The bytes are identical to ``json.dumps(collection, indent=2,
+    ensure_ascii=False).encode("utf-8")``.
+    """
+    out.write(_GEOJSON_HEADER)
+    pending = []
+    first = True
+    for feat in features:
+        pending.append(_feature_text(feat))
+        if len(pending) == chunk_features:
+            out.write(("\n" if first else ",\n").encode("utf-8") + ",\n".join(pending).encode("utf-8"))
+            pending = []
+            first = False
+    if pending:
+        out.write(("\n" if first else ",\n").encode("utf-8") + ",\n".join(pending).encode("utf-8"))
+        first = False
+    out.write(_GEOJSON_EMPTY_FOOTER if first else _GEOJSON_FOOTER)
+
+def write_geojsonseq(features: Iterable[Dict[str, Any]], out, rs: bool = False, chunk_features: int = 1000) -> None:
+    """Write features as GeoJSONSeq: one compact JSON record per line, RS-prefixed (RFC 8142) when ``rs``."""
+    prefix = "\x1e" if rs else ""
+    pending = []
+    for feat in features:
+        pending.append(prefix + json.dumps(feat, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if len(pending) == chunk_features:
+            out.write("".join(pending).encode("utf-8"))
+            pending = []
+    if pending:
+        out.write("".join(pending).encode("utf-8"))
+
+@instrument()
+def dataframe_to_geojsonseq_bytes(df: pd.DataFrame, geometry_store: Optional[Dict[str, Any]] = None,
+                                  simplifier: Optional["GeometrySimplifier"] = None, rs: bool = False) -> bytes:
+    out = io.BytesIO()
+    write_geojsonseq(iter_dataframe_features(df, geometry_store=geometry_store, simplifier=simplifier), out, rs)
+    return out.getvalue()
+
+@instrument()
+def dataframe_to_geojson_bytes(df: pd.DataFrame, geometry_store: Optional[Dict[str, Any]] = None,
+                               simplifier: Optional["GeometrySimplifier"] = None) -> bytes:
+    out = io.BytesIO()
+    write_geojson(iter_dataframe_features(df, geometry_store=geometry_store, simplifier=simplifier), out)
+    return out.getvalue()
+
+# Rough size of a degree, to let users give the simplification tolerance in metres.
+METERS_PER_DEGREE = 111_320.0
+
+def douglas_peucker_mask(xy: np.ndarray, starts: np.ndarray, ends: np.ndarray, tolerance: float,
+                         keep: Optional[np.ndarray] = None) -> np.ndarray:
+    """Douglas-Peucker over many parts at once; returns the mask of vertices to keep.
+
+    ``xy`` holds the parts back to back, part k spanning ``starts[k]..ends[k]``
+    (inclusive). Each round splits every span whose farthest vertex is beyond
+    ``tolerance`` at that vertex (the first one on ties), all spans of all
+    parts in one NumPy pass, so the number of rounds is the recursion depth
+    and the result is the same as the recursive algorithm. Vertices already
+    set in ``keep`` are kept as they are.
+    """
+    keep = np.zeros(len(xy), dtype=bool) if keep is None else keep
+    keep[starts] = True
+    keep[ends] = True
+    kept = np.flatnonzero(keep)
+    # Vertices of spans not yet settled; a settled span is never looked at again.
+    active = np.flatnonzero(~keep)
+    while len(active):
+        span = np.searchsorted(kept, active, side="right") - 1
+        a = xy[kept[span]]
+        d = xy[kept[span + 1]] - a
+        p = xy[active] - a
+        norm = np.hypot(d[:, 0], d[:, 1])
+        cross = np.abs(d[:, 0] * p[:, 1] - d[:, 1] * p[:, 0])
+        # Closed rings: a span from a vertex to itself measures plain distance.
+        dist = np.where(norm > 0, cross / np.where(norm > 0, norm, 1.0), np.hypot(p[:, 0], p[:, 1]))
+        bounds = np.flatnonzero(np.r_[True, span[1:] != span[:-1]])
+        sizes = np.diff(np.r_[bounds, len(active)])
+        span_max = np.repeat(np.maximum.reduceat(dist, bounds), sizes)
+        split = span_max > tolerance
+        if not split.any():
+            break
+        hits = np.flatnonzero(split & (dist == span_max))
+        first = hits[np.unique(span[hits], return_index=True)[1]]
+        keep[active[first]] = True
+        kept = np.sort(np.concatenate([kept, active[first]]))
+        split[first] = False
+        active = active[split]
+    return keep
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker on a single (n, 2+) array of positions."""
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    return points[douglas_peucker_mask(points[:, :2], np.array([0]), np.array([len(points) - 1]), tolerance)]
+
+class GeometrySimplifier:
+    """Coordinate rounding plus Douglas-Peucker simplification for GeoJSON geometries.
+
+    ``precision`` is the number of decimals kept (None: no rounding) and
+    ``tolerance`` the simplification distance in coordinate units (0: none).
+    A batch of geometries is flattened into one coordinate array, rounded
+    and simplified with a few NumPy passes, then split back. Lines keep at
+    least 2 vertices and rings at least 4 (otherwise the part is only
+    rounded); topology between parts is not checked. Input geometries are
+    never modified (they may be shared with a cached sidecar). ``stats``
+    accumulates geometry and vertex counts, plus compact-JSON byte counts
+    extrapolated from a sample of each batch.
+    """
+
+    BYTES_SAMPLE = 100
+
+    def __init__(self, tolerance: float = 0.0, precision: Optional[int] = None):
+        self.tolerance = tolerance
+        self.precision = precision
+        self.stats = {"geometries": 0, "vertices_before": 0, "vertices_after": 0, "bytes_before": 0, "bytes_after": 0}
+
+    def _collect(self, geom: Dict[str, Any], parts: list):
+        """Append (positions, min_points) for every part of ``geom``, in rebuild order."""
+        geom_type = geom.get("type")
+        if geom_type == "GeometryCollection":
+            for member in geom.get("geometries") or []:
+                if isinstance(member, dict):
+                    self._collect(member, parts)
+            return
+        coords = geom.get("coordinates")
+        if not isinstance(coords, list):
+            return
+        if geom_type == "Point":
+            parts.append(([coords], 1))
+        elif geom_type == "MultiPoint":
+            parts.append((coords, len(coords)))
+        elif geom_type == "LineString":
+            parts.append((coords, 2))
+        elif geom_type in ("MultiLineString", "Polygon"):
+            min_points = 2 if geom_type == "MultiLineString" else 4
+            parts.extend((part, min_points) for part in coords)
+        elif geom_type == "MultiPolygon":
+            parts.extend((ring, 4) for polygon in coords for ring in polygon)
+
+    def _rebuild(self, geom: Dict[str, Any], results: Iterator[list]) -> Dict[str, Any]:
+        geom_type = geom.get("type")
+        if geom_type == "GeometryCollection":
+            members = [self._rebuild(m, results) if isinstance(m, dict) else m for m in geom.get("geometries") or []]
+            return {**geom, "geometries": members}
+        coords = geom.get("coordinates")
+        if not isinstance(coords, list) or geom_type not in (
+                "Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon"):
+            return geom
+        if geom_type == "Point":
+            coords = next(results)[0]
+        elif geom_type in ("MultiPoint", "LineString"):
+            coords = next(results)
+        elif geom_type in ("MultiLineString", "Polygon"):
+            coords = [next(results) for _ in coords]
+        else:
+            coords = [[next(results) for _ in polygon] for polygon in coords]
+        return {**geom, "coordinates": coords}
+
+    def _simplify_parts(self, parts: List[tuple]) -> List[list]:
+        lengths = [len(positions) for positions, _ in parts]
+        originals = list(itertools.chain.from_iterable(positions for positions, _ in parts))
+        try:
+            flat = np.array(originals, dtype=float)
+        except (TypeError, ValueError):
+            flat = None
+        if flat is None or flat.ndim != 2 or len(flat) != sum(lengths) or not len(flat):
+            if len(parts) == 1:
+                # Ragged or invalid positions: leave the part as it is.
+                return [parts[0][0]]
+            return [result for part in parts for result in self._simplify_parts([part])]
+
+        # Positions rounding leaves alone are written as they came in (ints
+        # stay ints), so an untouched part never grows in the output.
+        unchanged = None
+        if self.precision is not None:
+            rounded = np.round(flat, self.precision)
+            unchanged = (rounded == flat).all(axis=1)
+            flat = rounded
+        lengths = np.array(lengths)
+        keep = None
+        if self.tolerance > 0:
+            nonempty = lengths > 0
+            ends = np.cumsum(lengths)
+            starts = ends - lengths
+            min_points = np.array([m for _, m in parts])
+            # Parts that cannot lose a vertex are kept whole from the start.
+            keep = douglas_peucker_mask(
+                flat[:, :2], starts[nonempty], ends[nonempty] - 1, self.tolerance,
+                keep=np.repeat(lengths <= min_points, lengths)
+            )
+            counts = np.add.reduceat(keep, starts[nonempty]) if nonempty.any() else np.array([], dtype=int)
+            new_lengths = np.zeros(len(parts), dtype=int)
+            new_lengths[nonempty] = counts
+            for k in np.flatnonzero(nonempty & (new_lengths < min_points)):
+                keep[starts[k]:ends[k]] = True
+                new_lengths[k] = lengths[k]
+            lengths = new_lengths
+        kept = np.flatnonzero(keep) if keep is not None else np.arange(len(flat))
+        if unchanged is None:
+            positions = [originals[i] for i in kept.tolist()]
+        else:
+            positions = [originals[i] if same else rounded_position for i, same, rounded_position
+                         in zip(kept.tolist(), unchanged[kept].tolist(), flat[kept].tolist())]
+        results = []
+        offset = 0
+        for length in lengths.tolist():
+            results.append(positions[offset:offset + length])
+            offset += length
+        return results
+
+    def simplify_batch(self, geoms: List[Any]) -> List[Any]:
+        with stage("simplify_geometries", rows=len(geoms)):
+            parts = []
+            for geom in geoms:
+                if isinstance(geom, dict):
+                    self._collect(geom, parts)
+            results = self._simplify_parts(parts) if parts else []
+            simplified = []
+            remaining = iter(results)
+            for geom in geoms:
+                simplified.append(self._rebuild(geom, remaining) if isinstance(geom, dict) else geom)
+
+            stats = self.stats
+            stats["geometries"] += sum(isinstance(geom, dict) for geom in geoms)
+            stats["vertices_before"] += sum(len(positions) for positions, _ in parts)
+            stats["vertices_after"] += sum(len(positions) for positions in results)
+            step = max(1, len(geoms) // self.BYTES_SAMPLE)
+            scale = len(geoms) / len(geoms[::step]) if geoms else 0
+            stats["bytes_before"] += int(len(json.dumps(geoms[::step])) * scale)
+            stats["bytes_after"] += int(len(json.dumps(simplified[::step])) * scale)
+            return simplified
+
+    def simplify(self, geom):
+        return self.simplify_batch([geom])[0]
+
+def iter_combined_features(sources: Iterable[tuple], renames: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+    """Chain the features of several sources, renaming duplicate ids.
+
+    ``sources`` yields ``(name, features)`` pairs; features are pulled one at
+    a time, so a source can be a streaming reader. A duplicate id gets the
+    first free ``<id>_<n>`` suffix; the next suffix to try is remembered per
+    rendered ``<id>`` (1, 1.0 and True render differently), so renaming
+    stays O(1) amortized. Each rename is appended to
+    ``renames`` when given.
+    """
+    feature_ids = set()
+    next_suffix = {}
+    for source_name, features in sources:
+        try:
+            for feature in features:
+                original_id = feature.get("id")
+                if original_id and original_id in feature_ids:
+                    prefix = str(original_id)
+                    counter = next_suffix.get(prefix, 1)
+                    new_id = f"{prefix}_{counter}"
+                    while new_id in feature_ids:
+                        counter += 1
+                        new_id = f"{prefix}_{counter}"
+                    next_suffix[prefix] = counter + 1
+                    feature["id"] = new_id
+                    if renames is not None:
+                        renames.append({"File": source_name, "ID asli": original_id, "ID baru": new_id})
+                if feature.get("id"):
+                    feature_ids.add(feature["id"])
+                yield feature
+        except ValueError as e:
+            raise ValueError(f"File {source_name} {e}") from e
+
+@instrument()
+def combine_geojson_files(geojson_files: List[Dict[str, Any]],
+                          renames: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    sources = ((f"#{i + 1}", geojson_obj.get("features", [])) for i, geojson_obj in enumerate(geojson_files))
+    return {"type": "FeatureCollection", "features": list(iter_combined_features(sources, renames))}
+
+EMPTY_TOKENS = ['', 'NaN', 'NaT', 'None', 'nan', 'N/A']
+
+def clean_column(series: pd.Series) -> pd.Series:
+    """Column version of clean_dataframe: EMPTY_TOKENS and missing values become '', the rest str.
+
+    Columns that are already clean strings are returned without a copy;
+    categorical columns stay categorical (only the categories are cleaned).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return _clean_categorical(series)
+    if isinstance(series.dtype, pd.SparseDtype):
+        return _clean_sparse(series)
+    empty = series.isna() | series.isin(EMPTY_TOKENS)
+    if not empty.any() and pd.api.types.infer_dtype(series, skipna=False) == "string":
+        return series
+    cleaned = series.astype(str)
+    cleaned[empty.to_numpy()] = ''
+    return cleaned
+
+def _clean_categorical(series: pd.Series) -> pd.Series:
+    categories = pd.Series(series.cat.categories.astype(object))
+    cleaned = clean_column(categories)
+    if not series.hasnans and cleaned.equals(categories):
+        return series
+    labels = list(dict.fromkeys(cleaned.tolist() + [""]))
+    positions = {label: i for i, label in enumerate(labels)}
+    # Missing values have code -1, which picks the trailing "" position.
+    remap = np.array([positions[label] for label in cleaned.tolist()] + [positions[""]], dtype=np.int64)
+    codes = remap[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=series.index, name=series.name)
+
+def _clean_sparse(series: pd.Series) -> pd.Series:
+    array = series.array
+    if array.fill_value == "" and not len(array.sp_values):
+        return series
+    values = clean_column(pd.Series(array.sp_values, dtype=object))
+    kept = (values != "").to_numpy()
+    column = sparse_column(len(series), array.sp_index.indices[kept], values[kept].tolist(), fill_value="")
+    return pd.Series(column, index=series.index, name=series.name)
+
+@instrument()
+def clean_dataframe(df):
+    if df is None:
+        return None
+        
+    return pd.DataFrame({col: clean_column(df[col]) for col in df.columns}, index=df.index)
+
+# Text columns with at most this share of distinct values are stored as
+# category; other text columns as Arrow-backed strings (the pandas 3 default).
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MIN_ROWS = 1_000
+
+def _arrow_string_dtype():
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except (TypeError, ImportError):
+        return None
+
+def is_text_column(series: pd.Series) -> bool:
+    """Object, string or categorical column whose non-missing values are all str."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.api.types.infer_dtype(dtype.categories, skipna=True) in ("string", "empty")
+    if dtype != object and not pd.api.types.is_string_dtype(dtype):
+        return False
+    return pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty")
+
+def compact_column(series: pd.Series, max_ratio: float = CATEGORY_MAX_RATIO,
+                   min_rows: int = CATEGORY_MIN_ROWS, max_density: float = SPARSE_MAX_DENSITY) -> pd.Series:
+    """Text column as category when few values repeat a lot, as sparse when mostly empty, else as
+    Arrow strings; other columns unchanged."""
+    if isinstance(series.dtype, (pd.CategoricalDtype, pd.SparseDtype)) or not is_text_column(series):
+        return series
+    if len(series) >= min_rows:
+        codes, uniques = pd.factorize(series, sort=True)
+        blank = (series == "").to_numpy(dtype=bool, na_value=False)
+        missing = codes < 0
+        stored = len(series) - int(blank.sum()) - int(missing.sum())
+        # Mostly empty: sparse (~12 bytes per value) unless int8 category codes (1 byte per row) are smaller.
+        if stored <= max_density * len(series) and len(uniques) > 127:
+            fill_value, kept = ("", ~blank) if blank.sum() >= missing.sum() else (_MISSING, ~missing)
+            positions = np.flatnonzero(kept)
+            column = sparse_column(len(series), positions, series.to_numpy(dtype=object)[positions].tolist(), fill_value)
+            return pd.Series(column, index=series.index, name=series.name)
+        if len(uniques) <= max_ratio * len(series):
+            return pd.Series(pd.Categorical.from_codes(codes, uniques), index=series.index, name=series.name)
+    arrow_string = _arrow_string_dtype()
+    if series.dtype == object and arrow_string is not None:
+        return series.astype(arrow_string)
+    return series
+
+@instrument()
+def compact_dataframe(df: Optional[pd.DataFrame], max_ratio: float = CATEGORY_MAX_RATIO) -> Optional[pd.DataFrame]:
+    """Memory-compact copy of ``df`` for frames kept between reruns; values and exports are unchanged.
+
+    Columns that are not all text (numbers, nested GeoJSON properties) are
+    left as they are.
+    """
+    if df is None:
+        return None
+    return pd.DataFrame({col: compact_column(df[col], max_ratio) for col in df.columns}, index=df.index)
+
+def blank_tokens(df: pd.DataFrame, tokens: List[str]) -> pd.DataFrame:
+    """``df.replace(tokens, None)`` that keeps categorical and sparse columns in their layout."""
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.cat.remove_categories([t for t in tokens if t in series.cat.categories])
+        elif isinstance(series.dtype, pd.SparseDtype):
+            array = series.array
+            values = pd.Series(array.sp_values, dtype=object).replace(tokens, None)
+            kept = values.notna().to_numpy()
+            column = sparse_column(len(series), array.sp_index.indices[kept], values[kept].tolist())
+            series = pd.Series(column, index=series.index, name=col)
+        else:
+            series = series.replace(tokens, None)
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+def expand_column(series: pd.Series) -> pd.Series:
+    """Categorical or sparse column back to plain values; other columns unchanged."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    if isinstance(series.dtype, pd.SparseDtype):
+        return series.sparse.to_dense()
+    return series
+
+def expand_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical and sparse columns back to plain values, for writers (Arrow/Parquet, previews) that do not take them."""
+    expanded = {col: expand_column(df[col]) for col in df.columns
+                if isinstance(df[col].dtype, (pd.CategoricalDtype, pd.SparseDtype))}
+    return df.assign(**expanded) if expanded else df
+
+class JoinIndex:
+    """Hash index over the normalized join key of the additional table.
+
+    Built once per (upload, key) and cached; the other columns are cleaned
+    lazily, only when a join actually needs them.
+    """
+
+    def __init__(self, add_df: pd.DataFrame, join_key: str):
+        self.add_df = add_df
+        self.join_key = join_key
+        with stage("join.index", rows=len(add_df)):
+            self.keys = clean_column(add_df[join_key]).str.strip()
+            self.index = pd.Index(self.keys)
+            self.is_unique = self.index.is_unique
+            self.unique_index = self.index if self.is_unique else self.index.unique()
+            self.duplicate_keys = len(self.index) - len(self.unique_index)
+        self._columns = {}
+
+    def column(self, col: str) -> pd.Series:
+        if col not in self._columns:
+            self._columns[col] = clean_column(self.add_df[col])
+        return self._columns[col]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.keys.memory_usage(deep=True)) * 2 + sum(
+            int(c.memory_usage(deep=True)) for c in self._columns.values()
+        )
+
+@instrument()
+def join_with_index(main_df: pd.DataFrame, join_index: JoinIndex) -> tuple:
+    """Left-join ``main_df`` to the indexed table; returns (joined, stats).
+
+    Only the main columns and the additional columns that main does not
+    already have are cleaned and copied into the output. A unique key is
+    joined with one get_indexer lookup; duplicated keys fall back to
+    pd.merge on the projected columns (main rows repeat, like before).
+    """
+    join_key = join_index.join_key
+    with stage("join.clean", rows=len(main_df)):
+        main_key = clean_column(main_df[join_key]).str.strip()
+        columns = {col: main_key if col == join_key else clean_column(main_df[col]) for col in main_df.columns}
+        add_columns = [col for col in join_index.add_df.columns if col != join_key and col not in columns]
+        for col in add_columns:
+            join_index.column(col)
+    with stage("join.merge", rows=len(main_df)):
+        indexer = join_index.unique_index.get_indexer(main_key)
+        matched = indexer >= 0
+
+        if join_index.is_unique:
+            for col in add_columns:
+                columns[col] = join_index.column(col).array.take(indexer, allow_fill=True)
+            joined = pd.DataFrame(columns)
+        else:
+            right = pd.DataFrame({join_key: join_index.keys, **{col: join_index.column(col) for col in add_columns}})
+            joined = pd.merge(pd.DataFrame(columns), right, on=join_key, how="left")
+
+    stats = {
+        "rows": len(joined),
+        "matched": int(matched.sum()),
+        "unmatched": int(len(matched) - matched.sum()),
+        "duplicate_keys": join_index.duplicate_keys,
+        "added_columns": len(add_columns),
+    }
+    return joined, stats
+
+# Spatial join (Step C): points of the main layer get the attributes of the
+# polygon they fall in.
+SPATIAL_EDGE_BATCH = 4_000_000
+SPATIAL_MAX_CELLS = 1 << 22
+SPATIAL_MAX_BANDS = 64
+
+def _polygon_rings(geom) -> List[list]:
+    if not isinstance(geom, dict):
+        return []
+    if geom.get("type") == "Polygon":
+        return [ring for ring in geom.get("coordinates") or [] if ring]
+    if geom.get("type") == "MultiPolygon":
+        return [ring for polygon in geom.get("coordinates") or [] for ring in polygon if ring]
+    if geom.get("type") == "GeometryCollection":
+        return [ring for member in geom.get("geometries") or [] for ring in _polygon_rings(member)]
+    return []
+
+def _ring_array(ring) -> np.ndarray:
+    try:
+        points = np.asarray(ring, dtype=float)
+        if points.ndim == 2 and points.shape[1] >= 2:
+            return points[:, :2]
+    except (TypeError, ValueError):
+        pass
+    return np.asarray([position[:2] for position in ring], dtype=float).reshape(-1, 2)
+
+class PolygonIndex:
+    """Grid + edge-slab index over a polygon layer for point-in-polygon lookups.
+
+    Polygon bounding boxes are registered in a uniform grid (cell size about
+    the median polygon size). Each polygon's edges are also bucketed into
+    horizontal bands, so a point is ray-cast only against the edges of its
+    band. Rings of a (Multi)Polygon share one even-odd test, which handles
+    holes. Geometries that are not polygons never match.
+    """
+
+    def __init__(self, geometries: List[Any], cell_size: Optional[float] = None):
+        with stage("spatial.index", rows=len(geometries)):
+            self.size = len(geometries)
+            self._build_edges(geometries)
+            self._build_grid(cell_size)
+            self._build_bands()
+
+    def _build_edges(self, geometries):
+        starts, ends, owners, arrays = [], [], [], []
+        offset = 0
+        for i, geom in enumerate(geometries):
+            for ring in _polygon_rings(geom):
+                points = _ring_array(ring)
+                if len(points) < 3:
+                    continue
+                arrays.append(points)
+                starts.append(offset)
+                offset += len(points)
+                ends.append(offset)
+                owners.append(i)
+        points = np.concatenate(arrays) if arrays else np.zeros((0, 2))
+        a = np.arange(len(points))
+        b = a + 1
+        # Every ring is closed explicitly; a repeated last vertex only adds a zero-length edge.
+        ring_ends = np.array(ends, dtype=np.int64)
+        if len(ring_ends):
+            b[ring_ends - 1] = np.array(starts, dtype=np.int64)
+        owner = np.repeat(np.array(owners, dtype=np.int64), ring_ends - np.array(starts, dtype=np.int64)) \
+            if len(ring_ends) else np.zeros(0, dtype=np.int64)
+        self.ex1, self.ey1 = points[a, 0], points[a, 1]
+        self.ex2, self.ey2 = points[b, 0], points[b, 1]
+        self.edge_owner = owner
+
+        n = self.size
+        self.has_edges = np.bincount(owner, minlength=n) > 0
+        inf = np.inf
+        self.xmin = np.full(n, inf)
+        self.ymin = np.full(n, inf)
+        self.xmax = np.full(n, -inf)
+        self.ymax = np.full(n, -inf)
+        np.minimum.at(self.xmin, owner, np.minimum(self.ex1, self.ex2))
+        np.minimum.at(self.ymin, owner, np.minimum(self.ey1, self.ey2))
+        np.maximum.at(self.xmax, owner, np.maximum(self.ex1, self.ex2))
+        np.maximum.at(self.ymax, owner, np.maximum(self.ey1, self.ey2))
+
+    def _build_grid(self, cell_size):
+        polys = np.flatnonzero(self.has_edges)
+        self.polygons = len(polys)
+        if not len(polys):
+            self.nx = self.ny = 0
+            self.cell_start = np.zeros(1, dtype=np.int64)
+            self.cell_polys = np.zeros(0, dtype=np.int64)
+            self.x0 = self.y0 = 0.0
+            self.cell = 1.0
+            return
+        self.x0, self.y0 = self.xmin[polys].min(), self.ymin[polys].min()
+        width = max(self.xmax[polys].max() - self.x0, 1e-12)
+        height = max(self.ymax[polys].max() - self.y0, 1e-12)
+        if cell_size is None:
+            sizes = np.maximum(self.xmax[polys] - self.xmin[polys], self.ymax[polys] - self.ymin[polys])
+            cell_size = float(np.median(sizes)) or max(width, height) / max(np.sqrt(len(polys)), 1)
+        # Keep the grid bounded for a few huge or degenerate layers.
+        cell_size = max(cell_size, np.sqrt(width * height / SPATIAL_MAX_CELLS))
+        self.cell = cell_size
+        self.nx = int(width // cell_size) + 1
+        self.ny = int(height // cell_size) + 1
+
+        cx0 = ((self.xmin[polys] - self.x0) // cell_size).astype(np.int64)
+        cx1 = np.minimum(((self.xmax[polys] - self.x0) // cell_size).astype(np.int64), self.nx - 1)
+        cy0 = ((self.ymin[polys] - self.y0) // cell_size).astype(np.int64)
+        cy1 = np.minimum(((self.ymax[polys] - self.y0) // cell_size).astype(np.int64), self.ny - 1)
+        span_x = cx1 - cx0 + 1
+        counts = span_x * (cy1 - cy0 + 1)
+        owner = np.repeat(polys, counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (np.repeat(cy0, counts) + k // np.repeat(span_x, counts)) * self.nx + np.repeat(cx0, counts) + k % np.repeat(span_x, counts)
+        order = np.lexsort((owner, cells))
+        self.cell_polys = owner[order]
+        self.cell_start = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.nx * self.ny))])
+
+    def _build_bands(self):
+        owner = self.edge_owner
+        edge_counts = np.bincount(owner, minlength=self.size)
+        bands = np.clip(np.ceil(np.sqrt(edge_counts)), 1, SPATIAL_MAX_BANDS).astype(np.int64)
+        height = np.where(self.has_edges, self.ymax - self.ymin, 0.0)
+        bands[height <= 0] = 1
+        self.bands = bands
+        self.band_height = np.where(height > 0, height / bands, 1.0)
+        self.band_offset = np.concatenate([[0], np.cumsum(bands)])[:-1]
+
+        lo = np.minimum(self.ey1, self.ey2)
+        hi = np.maximum(self.ey1, self.ey2)
+        b0 = self._band(owner, lo)
+        b1 = self._band(owner, hi)
+        counts = b1 - b0 + 1
+        edge = np.repeat(np.arange(len(owner)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        keys = self.band_offset[owner[edge]] + b0[edge] + k
+        order = np.argsort(keys, kind="stable")
+        edge = edge[order]
+        self.band_start = np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=int(bands.sum())))])
+        self.bx1, self.by1 = self.ex1[edge], self.ey1[edge]
+        self.bx2, self.by2 = self.ex2[edge], self.ey2[edge]
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray)))
+
+    def _band(self, poly: np.ndarray, y: np.ndarray) -> np.ndarray:
+        band = np.floor((y - self.ymin[poly]) / self.band_height[poly])
+        return np.clip(np.nan_to_num(band), 0, self.bands[poly] - 1).astype(np.int64)
+
+    def locate(self, x: np.ndarray, y: np.ndarray) -> tuple:
+        """Return (index of the containing polygon or -1, number of containing polygons) per point.
+
+        With overlapping polygons the lowest index wins.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n = len(x)
+        found = np.full(n, -1, dtype=np.int64)
+        hits = np.zeros(n, dtype=np.int64)
+        if not n or not self.polygons:
+            return found, hits
+        with stage("spatial.locate", rows=n):
+            cx = np.floor((x - self.x0) / self.cell)
+            cy = np.floor((y - self.y0) / self.cell)
+            inside_grid = (cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+            points = np.flatnonzero(inside_grid)
+            cells = (cy[points] * self.nx + cx[points]).astype(np.int64)
+            first = self.cell_start[cells]
+            counts = self.cell_start[cells + 1] - first
+            pair_point = np.repeat(points, counts)
+            k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_poly = self.cell_polys[np.repeat(first, counts) + k]
+            px, py = x[pair_point], y[pair_point]
+            in_box = (px >= self.xmin[pair_poly]) & (px <= self.xmax[pair_poly]) & \
+                     (py >= self.ymin[pair_poly]) & (py <= self.ymax[pair_poly])
+            pair_point, pair_poly, px, py = pair_point[in_box], pair_poly[in_box], px[in_box], py[in_box]
+
+            keys = self.band_offset[pair_poly] + self._band(pair_poly, py)
+            edge_first = self.band_start[keys]
+            edge_counts = self.band_start[keys + 1] - edge_first
+            bounds = np.searchsorted(np.cumsum(edge_counts), np.arange(SPATIAL_EDGE_BATCH, edge_counts.sum(), SPATIAL_EDGE_BATCH))
+            inside = np.zeros(len(pair_point), dtype=bool)
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(pair_point)]):
+                inside[lo:hi] = self._crossings_odd(px[lo:hi], py[lo:hi], edge_first[lo:hi], edge_counts[lo:hi])
+
+            pair_point, pair_poly = pair_point[inside], pair_poly[inside]
+            hits = np.bincount(pair_point, minlength=n)
+            best = np.full(n, self.size, dtype=np.int64)
+            np.minimum.at(best, pair_point, pair_poly)
+            found = np.where(best < self.size, best, -1)
+        return found, hits
+
+    def _crossings_odd(self, px, py, edge_first, edge_counts) -> np.ndarray:
+        # Even-odd ray casting to +x against the edges of each pair's band.
+        total = int(edge_counts.sum())
+        if not total:
+            return np.zeros(len(px), dtype=bool)
+        pair = np.repeat(np.arange(len(px)), edge_counts)
+        edges = np.repeat(edge_first - (np.cumsum(edge_counts) - edge_counts), edge_counts) + np.arange(total)
+        x1, y1, x2, y2 = self.bx1[edges], self.by1[edges], self.bx2[edges], self.by2[edges]
+        ex, ey = px[pair], py[pair]
+        straddles = (y1 > ey) != (y2 > ey)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x1 + (ey - y1) * (x2 - x1) / (y2 - y1)
+        crossing = straddles & (ex < x_cross)
+        return np.bincount(pair, weights=crossing, minlength=len(px)).astype(np.int64) % 2 == 1
+
+def frame_geometries(df: pd.DataFrame) -> List[Any]:
+    """Parsed geometry_json column (None for empty or invalid cells)."""
+    return [_parse_geometry_json(v) for v in df["geometry_json"].tolist()]
+
+def point_coordinates(geometries: List[Any]) -> tuple:
+    """x, y arrays of Point geometries; NaN for anything else."""
+    xs = []
+    ys = []
+    for geom in geometries:
+        coords = geom.get("coordinates") if isinstance(geom, dict) and geom.get("type") == "Point" else None
+        if isinstance(coords, list) and len(coords) >= 2:
+            xs.append(coords[0])
+            ys.append(coords[1])
+        else:
+            xs.append(np.nan)
+            ys.append(np.nan)
+    return np.array(xs, dtype=float), np.array(ys, dtype=float)
+
+# geometry_json of a Point as written by json.dumps in Step A.
+_NUMBER = r"-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?"
+_POINT_JSON = rf'^\{{"type": "Point", "coordinates": \[(?P<x>{_NUMBER}), (?P<y>{_NUMBER})[\],]'
+
+# First [x, y] position in any geometry_json (anchors a feature to a tile).
+_FIRST_POSITION = rf'\[\s*(?P<x>{_NUMBER})\s*,\s*(?P<y>{_NUMBER})'
+
+def _extract_points(texts: List[Any], pattern: str = _POINT_JSON) -> tuple:
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        pattern = re.compile(pattern)
+        xs = []
+        ys = []
+        for text in texts:
+            match = pattern.search(text) if isinstance(text, str) else None
+            xs.append(float(match.group(1)) if match else np.nan)
+            ys.append(float(match.group(2)) if match else np.nan)
+        return np.array(xs, dtype=float), np.array(ys, dtype=float)
+    parts = pc.extract_regex(pa.array(texts, type=pa.string(), from_pandas=True), pattern)
+    # struct_field (unlike .field) carries the nulls of unmatched rows.
+    xs = pc.cast(pc.struct_field(parts, "x"), pa.float64()).to_numpy(zero_copy_only=False)
+    ys = pc.cast(pc.struct_field(parts, "y"), pa.float64()).to_numpy(zero_copy_only=False)
+    return np.array(xs, dtype=float), np.array(ys, dtype=float)
+
+def frame_point_coordinates(df: pd.DataFrame) -> tuple:
+    """x, y of the Point geometries in geometry_json, matched in one vectorized pass; other layouts are json-parsed."""
+    texts = [v if isinstance(v, str) else None for v in df["geometry_json"].tolist()]
+    xs, ys = _extract_points(texts)
+    rest = np.flatnonzero(np.isnan(xs) | np.isnan(ys))
+    if len(rest):
+        xs[rest], ys[rest] = point_coordinates([_parse_geometry_json(texts[i]) for i in rest.tolist()])
+    return xs, ys
+
+@instrument()
+def spatial_join(main_df: pd.DataFrame, add_df: pd.DataFrame,
+                 polygon_index: Optional[PolygonIndex] = None) -> tuple:
+    """Left-join the polygon attributes of ``add_df`` onto the points of ``main_df``; returns (joined, stats).
+
+    Both frames need a geometry_json column (GeoJSON uploads or Step A CSVs).
+    Output columns follow join_with_index: main columns plus the additional
+    columns main does not have, cleaned the same way.
+    """
+    if polygon_index is None:
+        with stage("spatial.geometries", rows=len(add_df)):
+            geometries = frame_geometries(add_df)
+        polygon_index = PolygonIndex(geometries)
+    with stage("spatial.points", rows=len(main_df)):
+        xs, ys = frame_point_coordinates(main_df)
+    found, hits = polygon_index.locate(xs, ys)
+
+    with stage("join.clean", rows=len(main_df)):
+        columns = {col: clean_column(main_df[col]) for col in main_df.columns}
+        add_columns = [col for col in add_df.columns if col != "geometry_json" and col not in columns]
+        for col in add_columns:
+            columns[col] = clean_column(add_df[col]).array.take(found, allow_fill=True)
+    joined = pd.DataFrame(columns)
+
+    matched = found >= 0
+    stats = {
+        "rows": len(joined),
+        "matched": int(matched.sum()),
+        "unmatched": int(len(matched) - matched.sum()),
+        "not_points": int(np.isnan(xs).sum()),
+        "multiple": int((hits > 1).sum()),
+        "polygons": polygon_index.polygons,
+        "added_columns": len(add_columns),
+    }
+    return joined, stats
+
+ARCHIVE_MODES = ("grid", "quadtree", "chunks")
+ARCHIVE_MAX_FEATURES = 10_000
+ARCHIVE_MAX_ZOOM = 18
+ARCHIVE_MANIFEST = "index.json"
+MERCATOR_MAX_LAT = 85.0511287798
+
+def _first_position(geom) -> Optional[tuple]:
+    if not isinstance(geom, dict):
+        return None
+    if geom.get("type") == "GeometryCollection":
+        for part in geom.get("geometries") or []:
+            position = _first_position(part)
+            if position is not None:
+                return position
+        return None
+    coords = geom.get("coordinates")
+    while isinstance(coords, list) and coords and isinstance(coords[0], list):
+        coords = coords[0]
+    if isinstance(coords, list) and len(coords) >= 2:
+        return coords[0], coords[1]
+    return None
+
+def feature_anchors(df: pd.DataFrame, geometry_store: Optional[Dict[str, Any]] = None) -> tuple:
+    """x, y of the first position of every row's geometry (NaN without geometry), used to place features in tiles."""
+    if "geometry_json" in df.columns:
+        texts = [v if isinstance(v, str) else None for v in df["geometry_json"].tolist()]
+        xs, ys = _extract_points(texts, _FIRST_POSITION)
+        rest = np.flatnonzero(np.isnan(xs) | np.isnan(ys)).tolist()
+        geoms = [_parse_geometry_json(texts[i]) for i in rest]
+    else:
+        xs = np.full(len(df), np.nan)
+        ys = np.full(len(df), np.nan)
+        if geometry_store is None or "_feature_id" not in df.columns:
+            return xs, ys
+        rest = list(range(len(df)))
+        geoms = [geometry_store.get(geometry_key(fid)) for fid in df["_feature_id"].astype(object).tolist()]
+    for i, geom in zip(rest, geoms):
+        position = _first_position(geom)
+        if position is not None:
+            xs[i], ys[i] = position
+    return xs, ys
+
+def lonlat_to_tile(lon: np.ndarray, lat: np.ndarray, zoom: int) -> tuple:
+    """Web Mercator (XYZ) tile columns and rows of lon/lat arrays at ``zoom``."""
+    n = 1 << zoom
+    rad = np.radians(np.clip(lat, -MERCATOR_MAX_LAT, MERCATOR_MAX_LAT))
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(rad)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+def tile_bbox(z: int, x: int, y: int) -> List[float]:
+    """[west, south, east, north] of an XYZ tile."""
+    n = 1 << z
+    lat = lambda row: float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * row / n)))))
+    return [x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)]
+
+def _anchor_bbox(xs: np.ndarray, ys: np.ndarray) -> Optional[List[float]]:
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    if not valid.any():
+        return None
+    return [float(xs[valid].min()), float(ys[valid].min()), float(xs[valid].max()), float(ys[valid].max())]
+
+def _tile_group(z: int, x: int, y: int, rows: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> tuple:
+    meta = {"z": z, "x": x, "y": y, "tile_bbox": tile_bbox(z, x, y), "bbox": _anchor_bbox(xs[rows], ys[rows])}
+    return f"tiles/{z}/{x}/{y}.geojson", meta, rows
+
+def grid_partition(xs: np.ndarray, ys: np.ndarray, zoom: int) -> List[tuple]:
+    """(path, meta, rows) per non-empty XYZ tile at a fixed zoom; rows keep their original order."""
+    rows = np.flatnonzero(~(np.isnan(xs) | np.isnan(ys)))
+    tx, ty = lonlat_to_tile(xs[rows], ys[rows], zoom)
+    key = (tx << zoom) | ty
+    order = np.argsort(key, kind="stable")
+    key, rows = key[order], rows[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(key)]
+    return [_tile_group(zoom, int(key[a] >> zoom), int(key[a] & ((1 << zoom) - 1)), rows[a:b], xs, ys)
+            for a, b in zip(starts.tolist(), ends.tolist())]
+
+def quadtree_partition(xs: np.ndarray, ys: np.ndarray, max_features: int = ARCHIVE_MAX_FEATURES,
+                       max_zoom: int = ARCHIVE_MAX_ZOOM) -> List[tuple]:
+    """(path, meta, rows) per quadtree leaf: tiles are split until they hold at most ``max_features``.
+
+    Tiles at ``max_zoom`` are not split further, so many features sharing
+    one spot can still exceed the cap.
+    """
+    rows = np.flatnonzero(~(np.isnan(xs) | np.isnan(ys)))
+    tx, ty = lonlat_to_tile(xs[rows], ys[rows], max_zoom)
+    groups = []
+    stack = [(0, 0, 0, np.arange(len(rows)))]
+    while stack:
+        z, x, y, members = stack.pop()
+        if not len(members):
+            continue
+        if len(members) <= max_features or z == max_zoom:
+            groups.append(_tile_group(z, x, y, rows[members], xs, ys))
+            continue
+        shift = max_zoom - z - 1
+        child = ((tx[members] >> shift) & 1) * 2 + ((ty[members] >> shift) & 1)
+        # Pushed in reverse so children are written in x, y order.
+        for k in (3, 2, 1, 0):
+            stack.append((z + 1, 2 * x + k // 2, 2 * y + k % 2, members[child == k]))
+    return groups
+
+class GeoJSONArchiveWriter:
+    """Zip of GeoJSON files written feature by feature, closed with an index.json manifest.
+
+    Each entry is streamed through the zip compressor as features arrive,
+    so with ``out`` a real file only the features waiting to be flushed
+    are held in memory. Every entry has the bytes write_geojson would
+    produce for the same features.
+    """
+
+    def __init__(self, out, compression: int = zipfile.ZIP_DEFLATED, chunk_features: int = 1000):
+        self.zip = zipfile.ZipFile(out, "w", compression=compression)
+        self.chunk_features = chunk_features
+        self.files = []
+        self._entry = None
+
+    def open(self, path: str, **meta):
+        self.close_entry()
+        self._entry = self.zip.open(path, "w", force_zip64=True)
+        self._entry.write(_GEOJSON_HEADER)
+        self._pending = []
+        self._record = {"path": path, "features": 0, "bytes": len(_GEOJSON_HEADER), **meta}
+
+    @property
+    def is_open(self) -> bool:
+        return self._entry is not None
+
+    @property
+    def entry_bytes(self) -> int:
+        """Uncompressed size of the open entry so far (footer excluded)."""
+        return self._record["bytes"] if self._entry else 0
+
+    @property
+    def entry_features(self) -> int:
+        return self._record["features"] if self._entry else 0
+
+    def write(self, feature: Dict[str, Any]):
+        self.write_encoded(_feature_text(feature).encode("utf-8"))
+
+    def write_encoded(self, data: bytes):
+        """Append one feature already serialized with _feature_text and encoded as UTF-8."""
+        self._pending.append(b",\n" if self._record["features"] else b"\n")
+        self._pending.append(data)
+        self._record["features"] += 1
+        self._record["bytes"] += len(data) + (2 if self._record["features"] > 1 else 1)
+        if len(self._pending) >= 2 * self.chunk_features:
+            self._flush()
+
+    def _flush(self):
+        self._entry.write(b"".join(self._pending))
+        self._pending = []
+
+    def close_entry(self, **meta):
+        if self._entry is None:
+            return
+        self._flush()
+        footer = _GEOJSON_FOOTER if self._record["features"] else _GEOJSON_EMPTY_FOOTER
+        self._entry.write(footer)
+        self._entry.close()
+        self._entry = None
+        self._record["bytes"] += len(footer)
+        self._record.update(meta)
+        self.files.append(self._record)
+
+    def close(self, **manifest) -> Dict[str, Any]:
+        """Finish the last entry, write index.json and return the manifest."""
+        self.close_entry()
+        manifest = {
+            "type": "GeoJSONArchive", "version": 1, **manifest,
+            "features": sum(f["features"] for f in self.files),
+            "bytes": sum(f["bytes"] for f in self.files),
+            "files": self.files,
+        }
+        self.zip.writestr(ARCHIVE_MANIFEST, json.dumps(manifest, indent=2, ensure_ascii=False))
+        self.zip.close()
+        return manifest
+
+def _iter_rows_features(df: pd.DataFrame, rows: np.ndarray, geometry_store, simplifier,
+                        chunk_rows: int = GEOJSON_WRITE_CHUNK_ROWS) -> Iterator[Dict[str, Any]]:
+    for start in range(0, len(rows), chunk_rows):
+        part = df.iloc[rows[start:start + chunk_rows]]
+        yield from iter_dataframe_features(part, chunk_rows, geometry_store, simplifier)
+
+@instrument(rows=lambda manifest: manifest["features"])
+def write_geojson_archive(df: pd.DataFrame, out, mode: str = "chunks",
+                          geometry_store: Optional[Dict[str, Any]] = None,
+                          simplifier: Optional[GeometrySimplifier] = None, zoom: int = 12,
+                          max_features: Optional[int] = ARCHIVE_MAX_FEATURES, max_bytes: Optional[int] = None,
+                          max_zoom: int = ARCHIVE_MAX_ZOOM) -> Dict[str, Any]:
+    """Write ``df`` to ``out`` as a zip of GeoJSON files plus index.json, for layers loaded piece by piece.
+
+    mode="grid": one file per XYZ tile at ``zoom``; "quadtree": tiles split
+    until they hold at most ``max_features``; "chunks": consecutive rows,
+    a new file once ``max_features`` or ``max_bytes`` (uncompressed) is
+    reached. Features are placed by their first position; in the tile modes
+    features without geometry go to tiles/no_geometry.geojson. Returns the
+    manifest written to index.json.
+    """
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"mode archive tidak dikenal: {mode} (pilih {', '.join(ARCHIVE_MODES)})")
+    with stage("archive.anchors", rows=len(df)):
+        xs, ys = feature_anchors(df, geometry_store)
+    writer = GeoJSONArchiveWriter(out)
+    settings = {"mode": mode, "scheme": "xyz", "anchor": "first position"}
+
+    if mode == "chunks":
+        settings.update(max_features=max_features, max_bytes=max_bytes)
+        with stage("archive.write", rows=len(df)):
+            start = 0
+            features = iter_dataframe_features(df, geometry_store=geometry_store, simplifier=simplifier)
+            for i, feature in enumerate(features):
+                data = _feature_text(feature).encode("utf-8")
+                if writer.is_open and (
+                    (max_features and writer.entry_features >= max_features)
+                    or (max_bytes and writer.entry_bytes + 2 + len(data) + len(_GEOJSON_FOOTER) > max_bytes)
+                ):
+                    writer.close_entry(bbox=_anchor_bbox(xs[start:i], ys[start:i]))
+                if not writer.is_open:
+                    writer.open(f"chunks/part-{len(writer.files) + 1:05d}.geojson")
+                    start = i
+                writer.write_encoded(data)
+            writer.close_entry(bbox=_anchor_bbox(xs[start:], ys[start:]))
+        return writer.close(**settings)
+
+    with stage("archive.partition", rows=len(df)):
+        if mode == "grid":
+            settings["zoom"] = zoom
+            groups = grid_partition(xs, ys, zoom)
+        else:
+            settings.update(max_features=max_features, max_zoom=max_zoom)
+            groups = quadtree_partition(xs, ys, max_features or ARCHIVE_MAX_FEATURES, max_zoom)
+        missing = np.flatnonzero(np.isnan(xs) | np.isnan(ys))
+        if len(missing):
+            groups.append(("tiles/no_geometry.geojson", {"bbox": None}, missing))
+    with stage("archive.write", rows=len(df)):
+        rows = np.concatenate([g[2] for g in groups]) if groups else np.array([], dtype=np.int64)
+        features = _iter_rows_features(df, rows, geometry_store, simplifier)
+        for path, meta, members in groups:
+            writer.open(path, **meta)
+            for feature in itertools.islice(features, len(members)):
+                writer.write(feature)
+    return writer.close(**settings)
+
+STYLING_CHUNK_SIZE = 2_000
+
+def iter_styled_features(features: Iterable[Dict[str, Any]], columns: List[str],
+                         cache: Optional[LRUCache] = None, compact: bool = False,
+                         html: bool = True, field_columns: bool = False) -> Iterator[Dict[str, Any]]:
+    """Step D on a feature stream: add ``<col>_styled`` HTML properties one feature at a time.
+
+    Repeated texts are served from ``cache``, so memory stays bounded by
+    the cache size whatever the stream length. Empty results are left out,
+    as in the GeoJSON export of a styled frame. ``field_columns`` also adds
+    one ``<col>.<field>`` property per field (see pipe_field_columns);
+    ``html=False`` leaves out the HTML.
+    """
+    for feat in features:
+        props = feat.get("properties")
+        if not props:
+            yield feat
+            continue
+        for col in columns:
+            value = _cell_text(props.get(col))
+            if html:
+                if value is not None and cache is not None:
+                    styled = cache.get((compact, value))
+                    if styled is None:
+                        styled = process_pipe_separated_data(value, compact)
+                        cache.put((compact, value), styled)
+                else:
+                    styled = process_pipe_separated_data(value, compact)
+                if styled:
+                    props[f"{col}_styled"] = styled
+            if field_columns and value:
+                for name, field_value in extract_fields_from_pipe(value).items():
+                    if field_value:
+                        props[f"{col}.{name}"] = field_value
+        yield feat
+
+
+def _style_missing(values: List[str], workers: int = 1, chunk_size: int = STYLING_CHUNK_SIZE,
+                   progress: Optional[Callable[[int, int], None]] = None, compact: bool = False) -> Dict[str, str]:
+    """Style ``values`` serially or in a process pool, one chunk at a time."""
+    chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+    styled = {}
+    if workers > 1 and len(chunks) > 1:
+        with process_pool(workers) as pool:
+            futures = {pool.submit(process_pipe_values, chunk, compact): chunk for chunk in chunks}
+            for done, future in enumerate(as_completed(futures), 1):
+                styled.update(zip(futures[future], future.result()))
+                if progress:
+                    progress(done, len(chunks))
+    else:
+        for done, chunk in enumerate(chunks, 1):
+            styled.update(zip(chunk, process_pipe_values(chunk, compact)))
+            if progress:
+                progress(done, len(chunks))
+    return styled
+
+@instrument()
+def style_columns(df: pd.DataFrame, columns: List[str], cache: Optional[LRUCache] = None,
+                  workers: int = 1, chunk_size: int = STYLING_CHUNK_SIZE,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  compact: bool = False) -> Dict[str, pd.Series]:
+    """Return ``{column: styled Series}`` for the given columns.
+
+    Every column is factorized; each distinct string not found in ``cache``
+    is styled once (across all columns), optionally in a process pool, and
+    the HTML is mapped back through the factor codes so row order is kept.
+    ``compact`` selects the compact HTML of create_universal_html; the cache
+    keeps both renderings apart.
+    """
+    with stage("style.factorize", rows=len(df) * len(columns)):
+        factorized = {}
+        pending = {}
+        for col in columns:
+            try:
+                codes, uniques = pd.factorize(df[col])
+                uniques = uniques.tolist()
+            except TypeError:
+                # Unhashable cells (lists/dicts from GeoJSON properties) are styled as their str(),
+                # the way the columnar styling reads them.
+                codes, uniques = _factorize_cells(df[col])
+            factorized[col] = (codes, uniques)
+            for value in uniques:
+                if isinstance(value, str) and value not in pending:
+                    html = cache.get((compact, value)) if cache is not None else None
+                    pending[value] = html
+
+    missing = [value for value, html in pending.items() if html is None]
+    with stage("style.render", rows=len(missing), workers=workers):
+        computed = _style_missing(missing, workers, chunk_size, progress, compact)
+        if cache is not None:
+            for value, html in computed.items():
+                cache.put((compact, value), html)
+        pending.update(computed)
+
+    with stage("style.map", rows=len(df) * len(columns)):
+        styled = {}
+        for col, (codes, uniques) in factorized.items():
+            html = [pending[v] if isinstance(v, str) else process_pipe_separated_data(v, compact) for v in uniques]
+            # Missing values get code -1, which picks the trailing "" (same as process_pipe_separated_data).
+            lookup = pd.Series(html + [""], dtype=object).to_numpy()
+            styled[col] = pd.Series(lookup[codes], index=df.index, dtype=object)
+    return styled
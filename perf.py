@@ -0,0 +1,219 @@
+"""
+Lightweight per-stage instrumentation: wall time, rows processed and peak memory.
+
+Off by default. ``PERF_INSTRUMENTATION=time`` records wall time and rows,
+``PERF_INSTRUMENTATION=memory`` also the tracemalloc peak of every stage;
+set_level() changes it at runtime. tracemalloc's peak is process-wide, so
+the memory level is meant for one pipeline at a time (benchmarks, the
+CLI): a stage that overlaps a memory stage on another thread gets
+``peak_shared`` instead of a ``peak_mb`` it cannot measure. Finished stages are appended to the
+current thread's record list (see use_records) and, when the "perf" logger
+is enabled for INFO, logged as one JSON object per line. ``PERF_LOG=<path>``
+attaches such a handler at import.
+
+When off, an instrumented call costs one global lookup and one extra call.
+"""
+
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+OFF, TIME, MEMORY = 0, 1, 2
+LEVEL_NAMES = {OFF: "off", TIME: "time", MEMORY: "memory"}
+MAX_RECORDS = 1000
+
+logger = logging.getLogger("perf")
+
+_level = OFF
+_local = threading.local()
+_sequence = itertools.count()
+# Stages measuring memory right now, on any thread.
+_memory_lock = threading.Lock()
+_memory_stages: set = set()
+
+def set_level(level) -> None:
+    """Switch instrumentation for the whole process: OFF, TIME or MEMORY (or their names)."""
+    global _level
+    if isinstance(level, str):
+        level = {name: value for value, name in LEVEL_NAMES.items()}.get(level.strip().lower(), OFF)
+    if level >= MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif level < MEMORY and _level >= MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _level = level
+
+def get_level() -> int:
+    return _level
+
+def use_records(records: List[Dict[str, Any]]) -> None:
+    """Send this thread's records to ``records`` (e.g. a list in session state)."""
+    _local.records = records
+
+def _records() -> List[Dict[str, Any]]:
+    records = getattr(_local, "records", None)
+    if records is None:
+        records = _local.records = []
+    return records
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def _emit(record: Dict[str, Any]) -> None:
+    records = _records()
+    records.append(record)
+    if len(records) > MAX_RECORDS:
+        del records[:len(records) - MAX_RECORDS]
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+def count_rows(result) -> Optional[int]:
+    """Rows in a helper's result: frames, lists, FeatureCollections, {column: Series}."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, dict):
+        features = result.get("features")
+        if isinstance(features, list):
+            return len(features)
+        values = list(result.values())
+        if values and all(hasattr(v, "index") and hasattr(v, "dtype") for v in values):
+            return sum(len(v) for v in values)
+        return len(result)
+    if isinstance(result, (str, bytes, bytearray)) or not hasattr(result, "__len__"):
+        return None
+    return len(result)
+
+class Stage:
+    """Context manager timing one stage; set ``.rows`` inside the block if known."""
+
+    __slots__ = ("name", "rows", "fields", "seq", "depth", "start", "mem_start", "child_peak", "thread", "shared")
+
+    def __init__(self, name: str, rows: Optional[int] = None, **fields):
+        self.name = name
+        self.rows = rows
+        self.fields = fields
+        self.mem_start = None
+        self.child_peak = 0
+        self.shared = False
+
+    def __enter__(self):
+        stack = _stack()
+        self.seq = next(_sequence)
+        self.depth = len(stack)
+        if _level >= MEMORY and tracemalloc.is_tracing():
+            self.thread = threading.get_ident()
+            with _memory_lock:
+                others = [other for other in _memory_stages if other.thread != self.thread]
+                if others:
+                    # reset_peak() below and the other thread's allocations mix both peaks.
+                    self.shared = True
+                    for other in others:
+                        other.shared = True
+                _memory_stages.add(self)
+                current, peak = tracemalloc.get_traced_memory()
+                if stack:
+                    # The parent's peak so far would be lost by reset_peak().
+                    stack[-1].child_peak = max(stack[-1].child_peak, peak)
+                tracemalloc.reset_peak()
+            self.mem_start = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        record = {
+            "stage": self.name,
+            "seconds": round(seconds, 6),
+            "rows": self.rows,
+            "depth": self.depth,
+            "seq": self.seq,
+            "ok": exc_type is None,
+            "time": round(time.time(), 3),
+            "thread": threading.current_thread().name,
+        }
+        if self.mem_start is not None:
+            with _memory_lock:
+                _memory_stages.discard(self)
+            if self.shared:
+                record["peak_shared"] = True
+            elif tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+                record["peak_mb"] = round((peak - self.mem_start) / 2**20, 3)
+                if stack:
+                    stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        record.update(self.fields)
+        _emit(record)
+        return False
+
+class _NullStage:
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+def stage(name: str, rows: Optional[int] = None, **fields):
+    """``with stage("join.merge") as s: ...`` — a no-op when instrumentation is off."""
+    if not _level:
+        return _NullStage()
+    return Stage(name, rows, **fields)
+
+def event(name: str, **fields) -> None:
+    """Record a zero-duration stage (e.g. a cache hit)."""
+    if _level:
+        with Stage(name, **fields):
+            pass
+
+def instrument(name: Optional[str] = None, rows: Optional[Callable[[Any], Optional[int]]] = count_rows):
+    """Decorator recording a stage per call; ``rows`` maps the result to a row count."""
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _level:
+                return func(*args, **kwargs)
+            with Stage(stage_name) as current:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    current.rows = rows(result)
+                if isinstance(result, (bytes, bytearray)):
+                    current.fields["output_bytes"] = len(result)
+            return result
+        return wrapper
+    return decorate
+
+def summarize(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-stage totals (calls, seconds, rows, max peak) over ``records``."""
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record["stage"], {"stage": record["stage"], "calls": 0, "seconds": 0.0, "rows": 0, "peak_mb": None})
+        total["calls"] += 1
+        total["seconds"] += record["seconds"]
+        total["rows"] += record.get("rows") or 0
+        if record.get("peak_mb") is not None:
+            total["peak_mb"] = max(total["peak_mb"] or 0.0, record["peak_mb"])
+    return sorted(totals.values(), key=lambda t: t["seconds"], reverse=True)
+
+if os.environ.get("PERF_LOG"):
+    _handler = logging.FileHandler(os.environ["PERF_LOG"], encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+set_level(os.environ.get("PERF_INSTRUMENTATION", "off"))
@@ -0,0 +1,535 @@
+"""
+Headless A→C→D→B pipeline: the step helpers of the app with pluggable
+reporting, and a batch runner over files (see cli.py).
+
+User-facing messages go to a *reporter*: any object with info, success,
+warning, error and write methods. The app passes the ``streamlit`` module
+itself; batch jobs use LoggingReporter, and a plain Reporter() drops
+everything. Nothing here imports Streamlit.
+"""
+
+import io
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import perf
+from perf import instrument, stage
+from engine import (
+    LRUCache, JoinIndex, join_with_index, PolygonIndex, spatial_join, style_columns, STYLING_CHUNK_SIZE,
+    detect_csv_encoding, read_xlsx_streaming, XLSX_STREAMING_MIN_BYTES, read_parquet_upload,
+    read_geojson_dataframe, iter_uploaded_features, iter_styled_features, read_geometry_sidecar,
+    iter_dataframe_features, write_geojson, write_geojsonseq, dataframe_to_parquet_bytes,
+    write_geojson_archive, GeometrySimplifier, METERS_PER_DEGREE, blank_tokens, compact_dataframe,
+    frame_geometries, GEOJSONSEQ_EXTENSIONS, parse_workers, process_pool,
+)
+from styling import pipe_field_columns, _factorize_cells
+
+logger = logging.getLogger("pipeline")
+
+class Reporter:
+    """Silent reporter; subclasses override the message levels they show."""
+
+    def info(self, message: str) -> None:
+        pass
+
+    def success(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def write(self, message: str) -> None:
+        pass
+
+class LoggingReporter(Reporter):
+    """Messages as log records: warning and error at their levels, the rest at INFO."""
+
+    def __init__(self, log: logging.Logger = logger, prefix: str = ""):
+        self.log = log
+        self.prefix = prefix
+
+    def info(self, message: str) -> None:
+        self.log.info("%s%s", self.prefix, message)
+
+    success = write = info
+
+    def warning(self, message: str) -> None:
+        self.log.warning("%s%s", self.prefix, message)
+
+    def error(self, message: str) -> None:
+        self.log.error("%s%s", self.prefix, message)
+
+class CollectingReporter(Reporter):
+    """Keeps (level, message) pairs, e.g. from a worker process, to replay on another reporter later."""
+
+    def __init__(self):
+        self.messages: List[Tuple[str, str]] = []
+
+    def info(self, message: str) -> None:
+        self.messages.append(("info", message))
+
+    def success(self, message: str) -> None:
+        self.messages.append(("success", message))
+
+    def warning(self, message: str) -> None:
+        self.messages.append(("warning", message))
+
+    def error(self, message: str) -> None:
+        self.messages.append(("error", message))
+
+    def write(self, message: str) -> None:
+        self.messages.append(("write", message))
+
+    def replay(self, reporter) -> None:
+        for level, message in self.messages:
+            getattr(reporter, level)(message)
+
+SILENT = Reporter()
+
+# --------------------------
+# --- Steps A-D
+# --------------------------
+
+@instrument()
+def read_csv_with_fallback(file_buffer, reporter: Reporter = SILENT):
+    """Read a CSV as all-string columns (keep_default_na=False) in a single parse."""
+    encoding = detect_csv_encoding(file_buffer)
+    label = {"utf-8": "UTF-8", "latin-1": "Latin-1"}[encoding]
+    if encoding != "utf-8":
+        reporter.warning(f"❌ UTF-8 gagal, memakai {label}...")
+    try:
+        df = pd.read_csv(file_buffer, encoding=encoding, dtype=str, keep_default_na=False)
+        reporter.success(f"✅ CSV dibaca dengan encoding: {label}")
+        return df
+    except Exception as e:
+        reporter.error(f"❌ Gagal membaca CSV ({label}): {e}")
+        return None
+
+@instrument()
+def read_xlsx_with_fallback(file_buffer, streaming: Optional[bool] = None, reporter: Reporter = SILENT):
+    if streaming is None:
+        file_buffer.seek(0, os.SEEK_END)
+        streaming = file_buffer.tell() >= XLSX_STREAMING_MIN_BYTES
+    try:
+        if streaming:
+            df = read_xlsx_streaming(file_buffer)
+        else:
+            file_buffer.seek(0)
+            df = pd.read_excel(file_buffer, dtype=str, keep_default_na=False)
+        reporter.success("✅ XLSX berhasil dibaca")
+        return df
+    except Exception as e:
+        reporter.error(f"❌ Gagal membaca XLSX: {e}")
+        return None
+
+def table_kind(name: str) -> str:
+    """'csv', 'xlsx', 'parquet' or 'geojson' (GeoJSON and GeoJSONSeq) from a file name."""
+    name = name.lower()
+    for kind in ("csv", "xlsx", "parquet"):
+        if name.endswith("." + kind):
+            return kind
+    return "geojson"
+
+def read_table(file_buffer, name: Optional[str] = None, reporter: Reporter = SILENT) -> Optional[pd.DataFrame]:
+    """Read a CSV/XLSX/Parquet/GeoJSON/GeoJSONSeq file (chosen by name) into a compacted frame."""
+    kind = table_kind(name or getattr(file_buffer, "name", ""))
+    if kind == "csv":
+        df = read_csv_with_fallback(file_buffer, reporter=reporter)
+    elif kind == "xlsx":
+        df = read_xlsx_with_fallback(file_buffer, reporter=reporter)
+    elif kind == "parquet":
+        df = read_parquet_upload(file_buffer)
+    else:
+        df = read_geojson_dataframe(file_buffer)
+    return compact_dataframe(df)
+
+def _read_table_bytes(name: str, data: bytes) -> tuple:
+    reporter = CollectingReporter()
+    start = time.perf_counter()
+    df = read_table(io.BytesIO(data), name, reporter)
+    return df, reporter, time.perf_counter() - start
+
+@instrument(rows=lambda results: sum(len(df) for df, _, _ in results if df is not None))
+def read_tables(uploads: List[Tuple[str, bytes]], workers: Optional[int] = None,
+                progress: Optional[Callable[[str, float], None]] = None) -> List[tuple]:
+    """read_table for several ``(name, bytes)`` files at once, in worker processes when they are big enough.
+
+    Returns ``(frame or None, CollectingReporter, seconds)`` per file in
+    input order; replay the reporters to show each file's messages.
+    ``workers`` defaults to parse_workers(); ``progress(name, seconds)``
+    is called as each file finishes.
+    """
+    if workers is None:
+        workers = parse_workers([len(data) for _, data in uploads])
+    results: List[Optional[tuple]] = [None] * len(uploads)
+    if workers > 1:
+        with process_pool(workers) as pool:
+            futures = {pool.submit(_read_table_bytes, name, data): i for i, (name, data) in enumerate(uploads)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                if progress:
+                    progress(uploads[i][0], results[i][2])
+    else:
+        for i, (name, data) in enumerate(uploads):
+            results[i] = _read_table_bytes(name, data)
+            if progress:
+                progress(name, results[i][2])
+    return results
+
+@instrument()
+def join_attributes(main_df, add_df, join_key, join_index: Optional[JoinIndex] = None,
+                    mode: str = "attribute", polygon_index: Optional[PolygonIndex] = None,
+                    reporter: Reporter = SILENT):
+    """Join on ``join_key`` (mode="attribute") or by location (mode="spatial": points of main in polygons of add)."""
+    if main_df is None or add_df is None:
+        return None
+
+    if mode == "spatial":
+        return spatial_join_attributes(main_df, add_df, polygon_index, reporter)
+
+    if join_key not in main_df.columns:
+        reporter.error(f"❌ Key '{join_key}' tidak ditemukan di file utama. Kolom yang tersedia: {list(main_df.columns)}")
+        return None
+
+    if join_key not in add_df.columns:
+        reporter.error(f"❌ Key '{join_key}' tidak ditemukan di file tambahan. Kolom yang tersedia: {list(add_df.columns)}")
+        return None
+
+    if join_index is None or join_index.join_key != join_key:
+        join_index = JoinIndex(add_df, join_key)
+    joined, stats = join_with_index(main_df, join_index)
+
+    if stats["duplicate_keys"]:
+        reporter.warning(
+            f"⚠️ {stats['duplicate_keys']} key duplikat di file tambahan (many-to-one): "
+            f"baris file utama yang cocok ikut berlipat ({stats['rows']} baris hasil)"
+        )
+    reporter.info(f"🔎 {stats['matched']} baris cocok, {stats['unmatched']} baris tanpa pasangan, {stats['added_columns']} kolom ditambahkan")
+    reporter.success(f"✅ Join berhasil! {len(main_df)} records digabung dengan {len(add_df)} records")
+    return joined
+
+def spatial_join_attributes(main_df, add_df, polygon_index: Optional[PolygonIndex] = None,
+                            reporter: Reporter = SILENT):
+    for label, df in (("utama", main_df), ("tambahan", add_df)):
+        if "geometry_json" not in df.columns:
+            reporter.error(f"❌ File {label} tidak punya kolom geometry_json: join spasial butuh GeoJSON atau CSV dari Step A")
+            return None
+
+    joined, stats = spatial_join(main_df, add_df, polygon_index)
+
+    if not stats["polygons"]:
+        reporter.warning("⚠️ File tambahan tidak berisi Polygon/MultiPolygon: tidak ada yang bisa dicocokkan")
+    if stats["not_points"]:
+        reporter.warning(f"⚠️ {stats['not_points']} feature file utama bukan Point (atau tanpa geometri) dan tidak dicocokkan")
+    if stats["multiple"]:
+        reporter.warning(f"⚠️ {stats['multiple']} titik berada di lebih dari satu poligon: dipakai poligon pertama")
+    reporter.info(f"📍 {stats['matched']} titik di dalam poligon, {stats['unmatched']} di luar, {stats['added_columns']} kolom ditambahkan")
+    reporter.success(f"✅ Join spasial berhasil! {len(main_df)} titik terhadap {stats['polygons']} poligon")
+    return joined
+
+@instrument()
+def bulk_apply_html_styling(df, columns_to_style, cache: Optional[LRUCache] = None,
+                            workers: int = 1, chunk_size: int = STYLING_CHUNK_SIZE,
+                            progress: Optional[Callable[[int, int], None]] = None,
+                            compact: bool = False, reporter: Reporter = SILENT,
+                            html: bool = True, field_columns: bool = False):
+    """Add ``<col>_styled`` HTML columns and, with ``field_columns``, one ``<col>.<field>`` column per field."""
+    if df is None or df.empty:
+        return df
+
+    df_styled = df.copy()
+    columns = [col for col in columns_to_style if col in df_styled.columns]
+    styled = style_columns(df_styled, columns, cache, workers, chunk_size, progress, compact) if html else {}
+
+    for col in columns:
+        if html:
+            new_col_name = f"{col}_styled"
+            df_styled[new_col_name] = styled[col]
+            n_unique = len(_factorize_cells(df_styled[col])[1])
+            html_kb = df_styled[new_col_name].str.len().sum() / 1024
+            reporter.write(f"✅ Styled column: {col} → {new_col_name} ({len(df_styled)} cells processed, {n_unique} unique, {html_kb:,.0f} KB HTML)")
+        if field_columns:
+            with stage("style.fields", rows=len(df_styled)):
+                fields = pipe_field_columns(df_styled[col], prefix=f"{col}.")
+            for name in fields.columns:
+                df_styled[name] = fields[name]
+            reporter.write(f"✅ Field columns: {col} → {len(fields.columns)} kolom ({', '.join(fields.columns)})")
+
+    return df_styled
+
+# --------------------------
+# --- Batch runner
+# --------------------------
+
+INPUT_EXTENSIONS = (".geojson", ".json", ".csv", ".xlsx", ".parquet") + GEOJSONSEQ_EXTENSIONS
+OUTPUT_EXTENSIONS = {
+    "geojson": ".geojson", "geojsonseq": ".geojsonl", "geojsons": ".geojsons",
+    "csv": ".csv", "parquet": ".parquet", "zip": ".zip",
+}
+# Step B turns these edited-CSV spellings of "no value" into missing properties.
+BLANK_TOKENS = ['', 'NaN', 'NaT', 'None']
+STYLING_CACHE_SIZE = 200_000
+# Styled HTML is ~2 KB per distinct text, so the byte budget is what bounds
+# the cache in practice (it lives as long as the process).
+STYLING_CACHE_MAX_BYTES = int(os.environ.get("STYLING_CACHE_MB", "128")) * 1024 * 1024
+
+# Join tables, indexes, sidecars and the styling cache, built once per process
+# and reused for every file that process handles.
+_shared: Dict[tuple, Any] = {}
+
+def _styling_nbytes(item) -> int:
+    """Memory of a styling cache key, (compact, text), or of its HTML value."""
+    if isinstance(item, tuple):
+        return sys.getsizeof(item) + sum(sys.getsizeof(part) for part in item)
+    return sys.getsizeof(item)
+
+def make_styling_cache() -> LRUCache:
+    """The Step D styling cache: LRU over STYLING_CACHE_SIZE entries and STYLING_CACHE_MAX_BYTES."""
+    return LRUCache(STYLING_CACHE_SIZE, max_bytes=STYLING_CACHE_MAX_BYTES, sizeof=_styling_nbytes,
+                    key_sizeof=_styling_nbytes)
+
+def _shared_resource(key: tuple, build: Callable[[], Any]):
+    if key not in _shared:
+        _shared[key] = build()
+    return _shared[key]
+
+def _read_sidecar(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        return read_geometry_sidecar(f)
+
+def _read_path(path: str, reporter: Reporter = SILENT) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        df = read_table(f, path, reporter)
+    if df is None:
+        raise ValueError(f"gagal membaca {path}")
+    return df
+
+def expand_inputs(paths: Iterable[str]) -> List[Tuple[str, str]]:
+    """(input path, output name without extension) for files and the supported files under directories.
+
+    A file reached twice is listed once. Inputs that would write the same
+    output (``x.geojson`` and ``x.csv``) raise a ValueError rather than
+    overwrite each other.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(INPUT_EXTENSIONS):
+                        full = os.path.join(root, name)
+                        found.append((full, os.path.splitext(os.path.relpath(full, path))[0]))
+        else:
+            found.append((path, os.path.splitext(os.path.basename(path))[0]))
+
+    unique = {}
+    by_output: Dict[str, List[str]] = {}
+    for path, out_name in found:
+        real = os.path.realpath(path)
+        if real not in unique:
+            unique[real] = (path, out_name)
+            # Case-folded: the outputs would also collide on case-insensitive file systems.
+            by_output.setdefault(os.path.normcase(out_name).casefold(), []).append(path)
+    collisions = [paths for paths in by_output.values() if len(paths) > 1]
+    if collisions:
+        raise ValueError("input dengan nama output yang sama: "
+                         + "; ".join(" & ".join(paths) for paths in collisions))
+    return list(unique.values())
+
+def make_simplifier(config: Dict[str, Any]) -> Optional[GeometrySimplifier]:
+    if config.get("simplify") is None and config.get("precision") is None:
+        return None
+    return GeometrySimplifier((config.get("simplify") or 0.0) / METERS_PER_DEGREE, config.get("precision"))
+
+def _simplify_chunk(features: List[Dict[str, Any]], simplifier: GeometrySimplifier) -> List[Dict[str, Any]]:
+    geoms = simplifier.simplify_batch([feat.get("geometry") for feat in features])
+    for feat, geom in zip(features, geoms):
+        feat["geometry"] = geom
+    return features
+
+def _simplified(features: Iterable[Dict[str, Any]], simplifier: GeometrySimplifier,
+                chunk_features: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Simplify streamed geometries in batches (simplify_batch vectorizes over many geometries)."""
+    pending = []
+    for feat in features:
+        pending.append(feat)
+        if len(pending) == chunk_features:
+            yield from _simplify_chunk(pending, simplifier)
+            pending = []
+    if pending:
+        yield from _simplify_chunk(pending, simplifier)
+
+def can_stream(path: str, config: Dict[str, Any]) -> bool:
+    """Record-by-record processing: GeoJSON(Seq) in, GeoJSON(Seq) out and no join."""
+    return (bool(config.get("stream")) and not config.get("join") and table_kind(path) == "geojson"
+            and config.get("format", "geojson") in ("geojson", "geojsonseq", "geojsons"))
+
+def _stream_file(path: str, out_path: str, config: Dict[str, Any]) -> int:
+    """Steps A→D→B feature by feature; memory stays bounded by one record and the styling cache."""
+    count = 0
+    with stage("stream_file") as current, open(path, "rb") as src, open(out_path, "wb") as out:
+        features = iter_uploaded_features(src, path)
+        if config.get("style"):
+            cache = _shared_resource(("styling_cache",), make_styling_cache)
+            features = iter_styled_features(features, config["style"], cache, bool(config.get("compact")),
+                                            html=not config.get("no_html"),
+                                            field_columns=bool(config.get("field_columns")))
+        simplifier = make_simplifier(config)
+        if simplifier is not None:
+            features = _simplified(features, simplifier)
+
+        def counted(items):
+            nonlocal count
+            for item in items:
+                count += 1
+                yield item
+
+        fmt = config.get("format", "geojson")
+        if fmt == "geojson":
+            write_geojson(counted(features), out)
+        else:
+            write_geojsonseq(counted(features), out, rs=fmt == "geojsons")
+        current.rows = count
+    return count
+
+def _join_resources(config: Dict[str, Any]) -> tuple:
+    join_path = config["join"]
+    add_df = _shared_resource(("join_table", join_path), lambda: _read_path(join_path))
+    if config.get("join_mode") == "spatial":
+        polygons = _shared_resource(("polygon_index", join_path), lambda: PolygonIndex(frame_geometries(add_df)))
+        return add_df, None, polygons
+    key = config.get("join_key")
+    join_index = _shared_resource(("join_index", join_path, key), lambda: JoinIndex(add_df, key)) if key in add_df.columns else None
+    return add_df, join_index, None
+
+@instrument(rows=None)
+def write_output(df: pd.DataFrame, out_path: str, config: Dict[str, Any],
+                 geometry_store: Optional[Dict[str, Any]] = None) -> None:
+    """Step B: write the frame to ``out_path`` in ``config["format"]``, streaming to the file where possible."""
+    fmt = config.get("format", "geojson")
+    if fmt == "csv":
+        df.to_csv(out_path, index=False, encoding="utf-8")
+        return
+    if fmt == "parquet":
+        with open(out_path, "wb") as out:
+            out.write(dataframe_to_parquet_bytes(df))
+        return
+    df = blank_tokens(df, BLANK_TOKENS)
+    simplifier = make_simplifier(config)
+    with open(out_path, "wb") as out:
+        if fmt == "zip":
+            write_geojson_archive(df, out, mode=config.get("archive_mode", "chunks"),
+                                  geometry_store=geometry_store, simplifier=simplifier)
+            return
+        features = iter_dataframe_features(df, geometry_store=geometry_store, simplifier=simplifier)
+        if fmt == "geojson":
+            write_geojson(features, out)
+        else:
+            write_geojsonseq(features, out, rs=fmt == "geojsons")
+
+def run_file(path: str, out_path: str, config: Dict[str, Any],
+             reporter: Optional[Reporter] = None) -> Dict[str, Any]:
+    """Run the configured A→C→D→B steps on one file; returns rows, output size, seconds and stage records.
+
+    ``config`` keys: format, join, join_key, join_mode ("attribute" or
+    "spatial"), style (columns), compact, field_columns, no_html, workers, simplify (metres),
+    precision, archive_mode, sidecar, stream.
+    """
+    if reporter is None:
+        reporter = LoggingReporter(prefix=f"[{os.path.basename(path)}] ")
+    records: List[Dict[str, Any]] = []
+    perf.use_records(records)
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    if can_stream(path, config):
+        rows = _stream_file(path, out_path, config)
+    else:
+        df = _read_path(path, reporter)
+        if config.get("join"):
+            add_df, join_index, polygon_index = _join_resources(config)
+            df = join_attributes(df, add_df, config.get("join_key"), join_index, config.get("join_mode", "attribute"),
+                                 polygon_index, reporter)
+            if df is None:
+                raise ValueError("join gagal")
+        if config.get("style"):
+            cache = _shared_resource(("styling_cache",), make_styling_cache)
+            df = bulk_apply_html_styling(df, config["style"], cache, workers=config.get("workers", 1),
+                                         compact=bool(config.get("compact")), reporter=reporter,
+                                         html=not config.get("no_html"),
+                                         field_columns=bool(config.get("field_columns")))
+        geometry_store = None
+        if config.get("sidecar") and "geometry_json" not in df.columns:
+            sidecar = config["sidecar"]
+            geometry_store = _shared_resource(("sidecar", sidecar), lambda: _read_sidecar(sidecar))
+        write_output(df, out_path, config, geometry_store)
+        rows = len(df)
+    seconds = time.perf_counter() - start
+    reporter.success(f"✅ {rows} records → {out_path} ({seconds:.2f} s)")
+    return {"input": path, "output": out_path, "rows": rows, "bytes": os.path.getsize(out_path),
+            "seconds": round(seconds, 6), "records": records}
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Pipeline messages at ``level`` on stderr; other loggers (perf records included) stay at WARNING."""
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger.setLevel(level)
+
+def _init_worker(perf_level: int, log_level: int) -> None:
+    configure_logging(log_level)
+    perf.set_level(perf_level)
+
+def _run_file_safely(path: str, out_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return run_file(path, out_path, config)
+    except Exception as e:
+        logger.error("[%s] ❌ %s", os.path.basename(path), e)
+        return {"input": path, "output": out_path, "error": str(e), "records": []}
+
+def run_batch(inputs: List[Tuple[str, str]], out_dir: str, config: Dict[str, Any],
+              jobs: int = 1) -> List[Dict[str, Any]]:
+    """Run every (input, output name) pair, ``jobs`` files at a time in separate processes.
+
+    Results come back in input order; a failing file is reported with an
+    "error" entry instead of stopping the batch. Join tables, indexes and
+    the styling cache are built once per worker process and reused for
+    the files it runs; processes do not share them.
+    """
+    extension = OUTPUT_EXTENSIONS[config.get("format", "geojson")]
+    targets = [(path, os.path.join(out_dir, name + extension)) for path, name in inputs]
+    if jobs <= 1 or len(targets) <= 1:
+        return [_run_file_safely(path, out_path, config) for path, out_path in targets]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(targets)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=(perf.get_level(), logger.getEffectiveLevel())) as pool:
+        futures = {pool.submit(_run_file_safely, path, out_path, config): i for i, (path, out_path) in enumerate(targets)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+def timing_summary(results: List[Dict[str, Any]]) -> List[str]:
+    """Text lines: one per file, then per-stage totals (perf.summarize) over the whole batch."""
+    lines = [f"{'file':40s} {'rows':>10} {'seconds':>9} {'MB out':>8}"]
+    for result in results:
+        name = os.path.basename(result["input"])[:40]
+        if "error" in result:
+            lines.append(f"{name:40s} ❌ {result['error']}")
+        else:
+            lines.append(f"{name:40s} {result['rows']:10d} {result['seconds']:9.2f} {result['bytes'] / 2**20:8.1f}")
+    records = [record for result in results for record in result["records"]]
+    if records:
+        lines.append("")
+        lines.append(f"{'stage':40s} {'calls':>6} {'seconds':>9} {'rows':>10} {'peak MB':>8}")
+        for total in perf.summarize(records):
+            peak = f"{total['peak_mb']:8.1f}" if total["peak_mb"] is not None else f"{'':8s}"
+            lines.append(f"{total['stage'][:40]:40s} {total['calls']:6d} {total['seconds']:9.2f} {total['rows']:10d} {peak}")
+    return lines
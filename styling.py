@@ -0,0 +1,498 @@
+"""
+Pipe-separated data → HTML styling helpers (Step D)
+Kept free of Streamlit so process-pool workers can import them
+"""
+
+import json
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+UNIVERSAL_STYLES = {
+    "road": {"background": "#e8f4fd", "border": "2px solid #b8daff"},
+    "poi": {"background": "#e8f4fd", "border": "2px solid #b8daff"},
+    "default": {"background": "#e8f4fd", "border": "2px solid #b8daff"}
+}
+
+_FIELD_ROW = '''
+  <div style="display: flex; align-items: start; margin-bottom: 8px;">
+  <div style="min-width: 160px; font-weight: bold; color: #2c3e50;">{}</div>
+  <div style="flex: 1;">: {}</div>
+  </div>
+'''
+
+_CARD = '''<div style="font-family: Arial, sans-serif; background: {background}; border: {border}; border-radius: 8px; padding: 15px; margin-bottom: 20px;">
+<div style="display: grid; gap: 8px;">
+{fields}
+</div>
+</div>'''
+
+# Compact mode: the same card with minified inline styles only (popup
+# sanitizers keep style attributes but drop <style> elements and classes).
+# The card is a two-column grid, so each field is a bare name/value pair
+# with no wrapper or per-row style; the grid gap spaces the rows.
+_COMPACT_CARD = (
+    '<div style="font-family:Arial,sans-serif;background:{background};border:{border};'
+    'border-radius:8px;padding:15px;margin-bottom:20px;display:grid;grid-template-columns:160px 1fr;gap:8px">'
+)
+
+_COMPACT_ROW = '<b>{}</b><span>: {}</span>'
+
+_compact_cards = {}
+
+def create_universal_html(fields, style_type="default", compact=False):
+    """Field card for uMap popups.
+
+    ``compact=True`` renders the card as one two-column grid with short
+    inline styles, no per-row wrappers and no indentation.
+    """
+    style = UNIVERSAL_STYLES.get(style_type, UNIVERSAL_STYLES["default"])
+    rows = [(field_name, field_value) for field_name, field_value in fields.items()
+            if field_value and field_value.strip()]
+
+    if compact:
+        card = _compact_cards.get(style_type)
+        if card is None:
+            card = _compact_cards[style_type] = _COMPACT_CARD.format(**style)
+        return card + "".join([_COMPACT_ROW.format(name, value) for name, value in rows]) + "</div>"
+
+    fields_html = "".join([_FIELD_ROW.format(name, value) for name, value in rows])
+    return _CARD.format(fields=fields_html, **style)
+
+# Spelling rules for standardize_indonesian, in priority order. Extra
+# regional rules can be appended from a JSON file named by the
+# STANDARDIZE_RULES_FILE environment variable.
+STANDARDIZE_RULES = [
+    (r'\bbisa di lalu\b', 'Dapat dilalui'),
+    (r'\bdi lalu\b', 'dilalui'),
+    (r'\bdi pakai\b', 'dipakai'),
+    (r'\bdi jadikan\b', 'dijadikan'),
+    (r'\bdi rencanakan\b', 'direncanakan'),
+    (r'\bdi pake\b', 'dipakai'),
+    (r'\bhelp\b', 'helip'),
+    (r'\b(\d)\s*m\b', r'\1 m'),
+    (r'\b(\d)\s*are\b', r'\1 are'),
+    (r'\+\-\s*', '±'),
+    (r'^\s*jalur\s*', ''),
+]
+
+_GROUP_REFERENCE = re.compile(r'\\(?:(\d+)|g<(\d+)>)')
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+
+_SRE_CATEGORIES = {
+    _sre_parse.CATEGORY_DIGIT: r'\d',
+    _sre_parse.CATEGORY_SPACE: r'\s',
+    _sre_parse.CATEGORY_WORD: r'\w',
+}
+
+def _first_chars(items):
+    """Return (class parts, nullable) for the chars a parsed pattern can start with.
+
+    Raises ValueError when the set cannot be expressed as a plain character class.
+    """
+    parts = []
+    for op, arg in items:
+        if op is _sre_parse.LITERAL:
+            parts.append(re.escape(chr(arg)))
+            return parts, False
+        if op is _sre_parse.IN:
+            for in_op, in_arg in arg:
+                if in_op is _sre_parse.LITERAL:
+                    parts.append(re.escape(chr(in_arg)))
+                elif in_op is _sre_parse.RANGE:
+                    parts.append(f"{re.escape(chr(in_arg[0]))}-{re.escape(chr(in_arg[1]))}")
+                elif in_op is _sre_parse.CATEGORY and in_arg in _SRE_CATEGORIES:
+                    parts.append(_SRE_CATEGORIES[in_arg])
+                else:
+                    raise ValueError(in_op)
+            return parts, False
+        if op in (_sre_parse.AT, _sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+            continue  # zero-width: the first consumed char comes later
+        if op is _sre_parse.SUBPATTERN:
+            sub_parts, nullable = _first_chars(arg[-1])
+        elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT):
+            sub_parts, nullable = _first_chars(arg[2])
+            nullable = nullable or arg[0] == 0
+        elif op is _sre_parse.BRANCH:
+            sub_parts, nullable = [], False
+            for branch in arg[1]:
+                branch_parts, branch_nullable = _first_chars(branch)
+                sub_parts += branch_parts
+                nullable = nullable or branch_nullable
+        else:
+            raise ValueError(op)
+        parts += sub_parts
+        if not nullable:
+            return parts, False
+    return parts, True
+
+def _first_char_guard(patterns, flags) -> str:
+    """Lookahead that lets the scan skip positions where no rule can start."""
+    parts = []
+    for pattern in patterns:
+        try:
+            pattern_parts, nullable = _first_chars(_sre_parse.parse(pattern, flags))
+        except ValueError:
+            return ""
+        if nullable:
+            return ""
+        parts += pattern_parts
+    return f"(?=[{''.join(dict.fromkeys(parts))}])" if parts else ""
+
+class RewriteEngine:
+    """Apply a table of (pattern, replacement) rules in a single regex scan.
+
+    All patterns are compiled once into one alternation, guarded by the set
+    of characters a rule can start with; each match is dispatched to its
+    rule's replacement. Backreferences in replacements refer to the rule's
+    own groups. When two rules match at the same position, the earlier rule
+    wins.
+    """
+
+    def __init__(self, rules, flags=re.IGNORECASE):
+        self.rules = list(rules)
+        alternatives = []
+        self._actions = {}
+        group = 1
+        for pattern, replacement in self.rules:
+            n_groups = re.compile(pattern, flags).groups
+            alternatives.append(f"({pattern})")
+            self._actions[group] = self._compile_replacement(replacement, group)
+            group += 1 + n_groups
+        if alternatives:
+            guard = _first_char_guard([pattern for pattern, _ in self.rules], flags)
+            self.pattern = re.compile(f"{guard}(?:{'|'.join(alternatives)})", flags)
+        else:
+            self.pattern = re.compile("(?!)")
+
+    @staticmethod
+    def _compile_replacement(replacement, offset):
+        if "\\" not in replacement:
+            return replacement
+        parts = []
+        pos = 0
+        for m in _GROUP_REFERENCE.finditer(replacement):
+            parts += [replacement[pos:m.start()], offset + int(m.group(1) or m.group(2))]
+            pos = m.end()
+        parts.append(replacement[pos:])
+        if any("\\" in part for part in parts if isinstance(part, str)):
+            # Other escapes (\n, \\, ...): let re expand the shifted template.
+            template = _GROUP_REFERENCE.sub(
+                lambda m: f"\\g<{offset + int(m.group(1) or m.group(2))}>", replacement
+            )
+            return lambda match: match.expand(template)
+        return tuple(part for part in parts if part != "")
+
+    def _replace(self, match):
+        action = self._actions[match.lastindex]
+        if action.__class__ is str:
+            return action
+        if action.__class__ is tuple:
+            return "".join(part if part.__class__ is str else (match.group(part) or "") for part in action)
+        return action(match)
+
+    def sub(self, text: str) -> str:
+        return self.pattern.sub(self._replace, text)
+
+    def sub_series(self, series: pd.Series) -> pd.Series:
+        return series.str.replace(self.pattern, self._replace, regex=True)
+
+def load_rewrite_rules(path) -> List[tuple]:
+    """Read rules from JSON: a list of [pattern, replacement] pairs or
+    {"pattern": ..., "replacement": ...} objects."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rules = []
+    for item in data:
+        if isinstance(item, dict):
+            rules.append((item["pattern"], item.get("replacement", "")))
+        else:
+            pattern, replacement = item
+            rules.append((pattern, replacement))
+    return rules
+
+def build_standardize_engine() -> RewriteEngine:
+    rules = list(STANDARDIZE_RULES)
+    rules_file = os.environ.get("STANDARDIZE_RULES_FILE")
+    if rules_file:
+        rules += load_rewrite_rules(rules_file)
+    return RewriteEngine(rules)
+
+STANDARDIZE_ENGINE = build_standardize_engine()
+
+def standardize_indonesian(text):
+    if not text or pd.isna(text):
+        return ""
+        
+    return STANDARDIZE_ENGINE.sub(str(text)).strip()
+
+def standardize_indonesian_series(series: pd.Series) -> pd.Series:
+    """Column version of standardize_indonesian: one regex scan per cell."""
+    valid = series.notna() & series.astype(bool)
+    result = pd.Series("", index=series.index, dtype=object)
+    if valid.any():
+        texts = series[valid].astype(str)
+        result[valid] = STANDARDIZE_ENGINE.sub_series(texts).str.strip()
+    return result
+
+# Field name fixes, applied in order as substring replacements.
+FIELD_RENAMES = [
+    ('Nama PO', 'Nama Fasilitas'),
+    ('Kontak person', 'Kontak Person'),
+]
+# Field that collects the parts without "name:".
+FREE_TEXT_FIELD = 'Informasi'
+
+NO_DATA_HTML = "<div style='padding: 10px; background: #f8f9fa; border: 1px solid #dee2e6; border-radius: 4px;'>No data to display</div>"
+
+def rename_field(field_name):
+    for old, new in FIELD_RENAMES:
+        field_name = field_name.replace(old, new)
+    return field_name
+
+def extract_fields_from_pipe(text):
+    fields = {}
+    
+    if not text or pd.isna(text):
+        return fields
+        
+    text = str(text)
+    parts = [part.strip() for part in text.split('|') if part.strip()]
+    
+    for part in parts:
+        if ':' in part:
+            field_parts = part.split(':', 1)
+            field_name = field_parts[0].strip()
+            field_value = field_parts[1].strip() if len(field_parts) > 1 else ""
+            
+            field_name = rename_field(field_name)
+            
+            if field_value:
+                fields[field_name] = standardize_indonesian(field_value)
+        else:
+            if FREE_TEXT_FIELD not in fields:
+                fields[FREE_TEXT_FIELD] = standardize_indonesian(part)
+            else:
+                fields[FREE_TEXT_FIELD] += f", {standardize_indonesian(part)}"
+    
+    return fields
+
+def process_pipe_separated_data(text, compact=False):
+    if not text or pd.isna(text):
+        return ""
+        
+    fields = extract_fields_from_pipe(text)
+    
+    if not fields:
+        return NO_DATA_HTML
+    
+    return create_universal_html(fields, "poi", compact)
+
+# --------------------------
+# Columnar versions: a whole column at once. Every distinct cell is split
+# once, renames run once per distinct field name and standardization once
+# per distinct value; results go back to the rows through factor codes.
+# --------------------------
+
+def _cell_text(value) -> Optional[str]:
+    """The text extract_fields_from_pipe would parse, or None for cells it skips."""
+    if isinstance(value, str):
+        return value or None
+    if isinstance(value, (list, dict)):
+        # Unhashable GeoJSON property values are taken as their str(), even when empty.
+        return str(value)
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value) if value else None
+
+def _factorize_cells(values) -> tuple:
+    """(codes per row, texts per distinct cell); -1 codes and None texts are cells without text."""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    try:
+        codes, uniques = pd.factorize(series)
+    except TypeError:
+        # Unhashable cells (lists/dicts from GeoJSON properties) are taken as their str().
+        codes, uniques = pd.factorize(series.map(lambda value: str(value) if isinstance(value, (list, dict)) else value))
+    return np.asarray(codes), [_cell_text(value) for value in uniques]
+
+def _map_distinct(values, func) -> np.ndarray:
+    """``func`` (Series -> Series) applied once per distinct string of the Arrow array ``values``."""
+    import pyarrow.compute as pc
+
+    encoded = pc.dictionary_encode(values)
+    mapped = np.asarray(func(pd.Series(encoded.dictionary.to_pylist(), dtype=object)), dtype=object)
+    return mapped[encoded.indices.to_numpy()]
+
+# Whitespace str.strip() removes but Arrow's ASCII trim keeps; texts with it are parsed per cell.
+_NON_ASCII_SPACE = "[\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]"
+
+def _empty_fields() -> pd.DataFrame:
+    return pd.DataFrame({"uid": np.empty(0, dtype=np.int64), "field": np.empty(0, dtype=object),
+                         "value": np.empty(0, dtype=object)})
+
+def _unique_fields(texts: List[Optional[str]]) -> pd.DataFrame:
+    """Fields of every distinct text: columns uid, field, value in extract_fields_from_pipe order.
+
+    Splitting, trimming and the name/value split run as Arrow string kernels
+    over all texts at once.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    uids = np.array([uid for uid, text in enumerate(texts) if text is not None], dtype=np.int64)
+    if not len(uids):
+        return _empty_fields()
+    array = pa.array([texts[uid] for uid in uids], pa.large_string())
+    exotic = pc.match_substring_regex(array, _NON_ASCII_SPACE).to_numpy(zero_copy_only=False)
+    frames = []
+    if exotic.any():
+        rows = [(uid, field, value) for uid in uids[exotic]
+                for field, value in extract_fields_from_pipe(texts[uid]).items()]
+        if rows:
+            frames.append(pd.DataFrame(rows, columns=["uid", "field", "value"]).astype({"field": object, "value": object}))
+        array, uids = array.filter(pa.array(~exotic)), uids[~exotic]
+
+    lists = pc.split_pattern(array, "|")
+    parent = uids[pc.list_parent_indices(lists).to_numpy()]
+    parts = pc.ascii_trim_whitespace(pc.list_flatten(lists))
+    nonempty = pc.greater(pc.binary_length(parts), 0)
+    parts, parent = parts.filter(nonempty), parent[nonempty.to_numpy(zero_copy_only=False)]
+    pair = pc.extract_regex(parts, r"(?s)^(?P<name>[^:]*):(?P<value>.*)$")
+    named = pc.is_valid(pair)
+    names = pc.fill_null(pc.ascii_trim_whitespace(pc.struct_field(pair, "name")), "")
+    raw_values = pc.if_else(named, pc.ascii_trim_whitespace(pc.fill_null(pc.struct_field(pair, "value"), "")), parts)
+    keep = pc.or_(pc.invert(named), pc.greater(pc.binary_length(raw_values), 0))
+    named_np = named.filter(keep).to_numpy(zero_copy_only=False)
+    if len(named_np):
+        names = np.where(named_np, _map_distinct(names.filter(keep), lambda uniques: uniques.map(rename_field)),
+                         FREE_TEXT_FIELD)
+        events = pd.DataFrame({
+            "uid": parent[keep.to_numpy(zero_copy_only=False)], "field": names,
+            "value": _map_distinct(raw_values.filter(keep), standardize_indonesian_series), "append": ~named_np,
+        })
+        repeated = events.duplicated(["uid", "field"], keep=False).to_numpy()
+        if repeated.any():
+            events = pd.concat([events[~repeated], _merge_repeated(events[repeated])]).sort_index(kind="stable")
+        frames.append(events[["uid", "field", "value"]])
+    if not frames:
+        return _empty_fields()
+    table = pd.concat(frames) if len(frames) > 1 else frames[0]
+    return table.sort_values("uid", kind="stable").reset_index(drop=True)
+
+def _merge_repeated(events: pd.DataFrame) -> pd.DataFrame:
+    """One row per (uid, field) for fields given more than once in a cell, as the dict in extract_fields_from_pipe ends up.
+
+    A named field overwrites the value but keeps its first position; a free
+    text part is appended with ", " (or starts the value). The result keeps
+    the index label of the first occurrence.
+    """
+    group = events.groupby(["uid", "field"], sort=False).ngroup().to_numpy()
+    by_group = np.argsort(group, kind="stable")
+    group = group[by_group]
+    appended = events["append"].to_numpy()[by_group]
+    values = events["value"].to_numpy()[by_group]
+    order = np.arange(len(group))
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    # Each group keeps its events from the last named (overwriting) one on.
+    last_set = np.maximum(np.maximum.reduceat(np.where(appended, -1, order), starts), starts)
+    kept = order >= np.repeat(last_set, np.diff(np.r_[starts, len(group)]))
+    group, values = group[kept], values[kept]
+    leader = np.r_[True, group[1:] != group[:-1]]
+    pieces = np.where(leader, values, ", " + values)
+    merged = events.iloc[by_group[starts]].copy()
+    merged["value"] = np.add.reduceat(pieces, np.flatnonzero(leader))
+    return merged
+
+def explode_pipe_fields(values) -> pd.DataFrame:
+    """Columnar extract_fields_from_pipe: one (row, field, value) row per field of every cell.
+
+    ``row`` is the position of the cell in ``values``; rows and, within a
+    row, fields are in extract_fields_from_pipe order. Cells without fields
+    have no rows.
+    """
+    codes, texts = _factorize_cells(values)
+    table = _unique_fields(texts)
+    uid = table["uid"].to_numpy()
+    counts = np.bincount(uid, minlength=len(texts))
+    starts = np.r_[0, np.cumsum(counts)[:-1]] if len(texts) else np.empty(0, dtype=np.int64)
+    rows = np.flatnonzero(codes >= 0)
+    rows = rows[counts[codes[rows]] > 0]
+    lengths = counts[codes[rows]]
+    # For each row: positions starts[code] .. starts[code] + count - 1 of the unique table.
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    take = np.repeat(starts[codes[rows]], lengths) + offsets
+    return pd.DataFrame({
+        "row": np.repeat(rows, lengths), "field": table["field"].to_numpy()[take],
+        "value": table["value"].to_numpy()[take],
+    })
+
+def pipe_field_columns(values, prefix: str = "") -> pd.DataFrame:
+    """One column per field name (``prefix + name``, in order of first appearance); cells without the field are NaN."""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    table = explode_pipe_fields(series)
+    rows, fields, values = (table[name].to_numpy() for name in ("row", "field", "value"))
+    shown = values != ""
+    codes, names = pd.factorize(fields[shown])
+    rows, values = rows[shown], values[shown]
+    columns = {}
+    for code, name in enumerate(names):
+        column = np.full(len(series), np.nan, dtype=object)
+        hits = codes == code
+        column[rows[hits]] = values[hits]
+        columns[prefix + name] = column
+    return pd.DataFrame(columns, index=series.index)
+
+def _render_cards(texts: List[Optional[str]], table: pd.DataFrame, compact: bool) -> np.ndarray:
+    """HTML per distinct text, as process_pipe_separated_data renders it."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    html = np.array(["" if text is None else NO_DATA_HTML for text in texts], dtype=object)
+    if table.empty:
+        return html
+    style = UNIVERSAL_STYLES["poi"]
+    if compact:
+        head, tail = _COMPACT_CARD.format(**style), "</div>"
+        row_template = _COMPACT_ROW
+    else:
+        head, tail = _CARD.format(fields="\x00", **style).split("\x00")
+        row_template = _FIELD_ROW
+    before, middle, after, head, tail, empty = (pa.scalar(text, pa.large_string()) for text in
+                                                (*row_template.split("{}"), head, tail, ""))
+    uid = table["uid"].to_numpy()
+    values = pa.array(table["value"].to_numpy(), pa.large_string())
+    # Values come out of standardization stripped, so "shown" is just non-empty.
+    rows = pc.binary_join_element_wise(before, pa.array(table["field"].to_numpy(), pa.large_string()),
+                                       middle, values, after, empty)
+    rows = pc.if_else(pc.greater(pc.binary_length(values), 0), rows, empty)
+    starts = np.flatnonzero(np.r_[True, uid[1:] != uid[:-1]])
+    cards = pc.binary_join(pa.LargeListArray.from_arrays(np.r_[starts, len(uid)], rows), empty)
+    html[uid[starts]] = pc.binary_join_element_wise(head, cards, tail, empty).to_numpy(zero_copy_only=False)
+    return html
+
+def style_pipe_values(values, compact: bool = False) -> List[str]:
+    """Columnar process_pipe_separated_data over ``values``: the same HTML, one cell per value."""
+    codes, texts = _factorize_cells(values)
+    html = _render_cards(texts, _unique_fields(texts), compact)
+    return [html[code] if code >= 0 else "" for code in codes]
+
+# Below this many values the per-cell path is faster (Arrow call overhead dominates).
+COLUMNAR_MIN_VALUES = 300
+
+def process_pipe_values(values: List, compact: bool = False) -> List[str]:
+    """Style a chunk of values; the unit of work for parallel Step D styling."""
+    if len(values) < COLUMNAR_MIN_VALUES:
+        return [process_pipe_separated_data(_cell_text(value), compact) for value in values]
+    return style_pipe_values(values, compact)
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import cli
+import perf
+from pipeline import expand_inputs
+from styling import process_pipe_separated_data
+
+COLLECTION = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "id": "a", "properties": {"nama": "A", "n": 1, "keterangan": "Desa: X | Informasi: jalur"},
+     "geometry": {"type": "Point", "coordinates": [110.5, -7.25]}},
+    {"type": "Feature", "id": "b", "properties": {"nama": "B", "n": 2, "keterangan": "bisa di lalu mobil"},
+     "geometry": {"type": "LineString", "coordinates": [[110, -7], [111.125, -8]]}},
+]}
+
+
+@pytest.fixture(autouse=True)
+def perf_level():
+    # cli.main switches timing on for the whole process.
+    level = perf.get_level()
+    yield
+    perf.set_level(level)
+
+
+@pytest.fixture
+def geojson_input(tmp_path):
+    path = tmp_path / "in" / "desa.geojson"
+    path.parent.mkdir()
+    path.write_text(json.dumps(COLLECTION), encoding="utf-8")
+    return path
+
+
+def test_geojson_to_csv_and_back(tmp_path, geojson_input):
+    assert cli.main([str(geojson_input), "--out", str(tmp_path / "csv"), "--format", "csv", "--quiet"]) == 0
+    csv_path = tmp_path / "csv" / "desa.csv"
+    assert cli.main([str(csv_path), "--out", str(tmp_path / "geo"), "--format", "geojson", "--quiet"]) == 0
+    out = json.loads((tmp_path / "geo" / "desa.geojson").read_text(encoding="utf-8"))
+    # CSV cells come back as text; ids, geometries and everything else survive unchanged.
+    expected = json.loads(json.dumps(COLLECTION))
+    for feat in expected["features"]:
+        feat["properties"]["n"] = str(feat["properties"]["n"])
+    assert out == expected
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_styled_geojson_round_trip(tmp_path, geojson_input, stream):
+    args = [str(geojson_input), "--out", str(tmp_path / "out"), "--style", "keterangan", "--quiet"]
+    assert cli.main(args + (["--stream"] if stream else [])) == 0
+    out = json.loads((tmp_path / "out" / "desa.geojson").read_text(encoding="utf-8"))
+    assert [f["geometry"] for f in out["features"]] == [f["geometry"] for f in COLLECTION["features"]]
+    for feat, original in zip(out["features"], COLLECTION["features"]):
+        styled = feat["properties"].pop("keterangan_styled")
+        assert styled == process_pipe_separated_data(original["properties"]["keterangan"])
+        assert feat["id"] == original["id"] and feat["properties"] == original["properties"]
+
+
+def test_expand_inputs_rejects_colliding_outputs(tmp_path, geojson_input):
+    (geojson_input.parent / "desa.csv").write_text("nama\nA\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="input dengan nama output yang sama"):
+        expand_inputs([str(geojson_input.parent)])
+    with pytest.raises(ValueError, match="input dengan nama output yang sama"):
+        expand_inputs([str(geojson_input), str(geojson_input.parent / "desa.csv")])
+
+
+def test_expand_inputs_lists_a_file_reached_twice_once(geojson_input):
+    assert expand_inputs([str(geojson_input), str(geojson_input.parent)]) == [(str(geojson_input), "desa")]
+
+
+def test_cli_reports_colliding_outputs(tmp_path, geojson_input, capsys):
+    (geojson_input.parent / "DESA.json").write_text(json.dumps(COLLECTION), encoding="utf-8")
+    assert cli.main([str(geojson_input.parent), "--out", str(tmp_path / "out"), "--quiet"]) == 1
+    assert "input dengan nama output yang sama" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+
+from engine import iter_upload_sources, parse_geojson_uploads, iter_combined_features
+
+
+def collection(*ids):
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "id": fid, "properties": {"n": i}, "geometry": {"type": "Point", "coordinates": [i, 0]}}
+        for i, fid in enumerate(ids)]}
+
+
+UPLOADS = [
+    ("a.geojson", json.dumps(collection("x", "y")).encode()),
+    ("b.geojson", json.dumps(collection("y", "z")).encode()),
+    ("c.geojsonl", b"".join(b"\x1e" + json.dumps(f).encode() + b"\n" for f in collection("x", "w")["features"])),
+]
+
+
+def test_streaming_sources_match_parsed_uploads():
+    streamed_progress, parsed_progress = [], []
+    streamed_renames, parsed_renames = [], []
+    sources = iter_upload_sources([(name, io.BytesIO(data)) for name, data in UPLOADS],
+                                  progress=lambda name, n, s: streamed_progress.append((name, n)))
+    streamed = list(iter_combined_features(sources, streamed_renames))
+    parsed = parse_geojson_uploads(UPLOADS, workers=1, progress=lambda name, n, s: parsed_progress.append((name, n)))
+    combined = list(iter_combined_features(zip([name for name, _ in UPLOADS], parsed), parsed_renames))
+    assert streamed == combined
+    assert streamed_renames == parsed_renames and len(streamed_renames) == 2
+    assert streamed_progress == parsed_progress == [("a.geojson", 2), ("b.geojson", 2), ("c.geojsonl", 2)]
+
+
+def test_streaming_sources_reject_wrong_type_before_reading():
+    feature = json.dumps(collection("x")["features"][0]).encode()
+    progress = []
+    sources = iter_upload_sources([("a.geojson", io.BytesIO(UPLOADS[0][1])), ("f.geojson", io.BytesIO(feature))],
+                                  progress=lambda *args: progress.append(args))
+    with pytest.raises(ValueError, match="f.geojson: bukan FeatureCollection"):
+        next(sources)
+    assert progress == []
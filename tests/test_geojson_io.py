@@ -0,0 +1,87 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from engine import (
+    read_geojson_dataframe, geojson_to_dataframe, iter_geojson_features, iter_geojsonseq_features,
+    dataframe_to_geojson, dataframe_to_geojson_bytes, dataframe_to_geojsonseq_bytes,
+)
+
+COLLECTION = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "id": "a", "properties": {"nama": "Ä \"quoted\"", "n": 1, "x": 2.5, "tags": ["a", "b"]},
+     "geometry": {"type": "Point", "coordinates": [110.5, -7.25]}},
+    {"type": "Feature", "id": 7, "properties": {"nama": None, "nested": {"k": [1, 2]}},
+     "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}},
+    {"type": "Feature", "properties": {}, "geometry": None},
+    {"type": "Feature", "id": "a", "properties": {"n": 3}, "geometry": {"type": "MultiPoint", "coordinates": []}},
+]}
+
+
+def collection_bytes(indent=None):
+    return json.dumps(COLLECTION, indent=indent, ensure_ascii=False).encode("utf-8")
+
+
+def sequence_bytes(rs):
+    prefix = b"\x1e" if rs else b""
+    return b"".join(prefix + json.dumps(f, ensure_ascii=False).encode("utf-8") + b"\n" for f in COLLECTION["features"])
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_streaming_reader_matches_json_loads(indent):
+    assert list(iter_geojson_features(io.BytesIO(collection_bytes(indent)))) == COLLECTION["features"]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64])
+def test_streaming_reader_across_read_blocks(block_size):
+    features = iter_geojson_features(io.BytesIO(collection_bytes(2)), block_size=block_size)
+    assert list(features) == COLLECTION["features"]
+
+
+@pytest.mark.parametrize("rs", [False, True])
+def test_geojsonseq_reader_matches_json_loads(rs):
+    assert list(iter_geojsonseq_features(io.BytesIO(sequence_bytes(rs)))) == COLLECTION["features"]
+
+
+@pytest.mark.parametrize("name, data", [
+    ("x.geojson", collection_bytes()),
+    ("x.geojson", collection_bytes(2)),
+    ("x.geojsonl", sequence_bytes(False)),
+    ("x.geojsons", sequence_bytes(True)),
+])
+def test_read_geojson_dataframe_matches_geojson_to_dataframe(name, data):
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    pd.testing.assert_frame_equal(read_geojson_dataframe(buffer), geojson_to_dataframe(json.loads(collection_bytes())))
+
+
+def test_reader_rejects_other_document_types():
+    feature = json.dumps(COLLECTION["features"][0]).encode("utf-8")
+    with pytest.raises(ValueError, match="bukan FeatureCollection"):
+        list(iter_geojson_features(io.BytesIO(feature), "FeatureCollection"))
+
+
+def test_geojson_writer_round_trip():
+    df = geojson_to_dataframe(COLLECTION)
+    data = dataframe_to_geojson_bytes(df)
+    assert data == json.dumps(dataframe_to_geojson(df), indent=2, ensure_ascii=False).encode("utf-8")
+    out = json.loads(data)["features"]
+    assert [f["geometry"] for f in out] == [f["geometry"] for f in COLLECTION["features"]]
+    # Null properties are dropped and missing ids filled in once; a second pass changes nothing.
+    assert out[0] == COLLECTION["features"][0] and out[1]["properties"] == {"nested": {"k": [1, 2]}}
+    assert dataframe_to_geojson_bytes(geojson_to_dataframe(json.loads(data))) == data
+
+
+@pytest.mark.parametrize("rs", [False, True])
+def test_geojsonseq_writer_matches_geojson_writer(rs):
+    df = geojson_to_dataframe(COLLECTION)
+    seq = list(iter_geojsonseq_features(io.BytesIO(dataframe_to_geojsonseq_bytes(df, rs=rs))))
+    assert seq == json.loads(dataframe_to_geojson_bytes(df))["features"]
+
+
+def test_empty_collection_round_trip():
+    empty = {"type": "FeatureCollection", "features": []}
+    df = geojson_to_dataframe(empty)
+    assert json.loads(dataframe_to_geojson_bytes(df)) == empty
+    assert list(iter_geojson_features(io.BytesIO(json.dumps(empty).encode()))) == []
@@ -0,0 +1,24 @@
+import io
+import json
+
+from engine import read_geojson_dataframe, feature_ids_digest, dataframe_to_csv_bytes, geometry_key
+from pipeline import read_table
+
+
+def test_feature_ids_digest_ignores_order_and_duplicates():
+    assert feature_ids_digest([1, "2", 3, 3]) == feature_ids_digest(["3", 2, "1"])
+    assert feature_ids_digest([1, 2, 3]) != feature_ids_digest([1, 2])
+    assert feature_ids_digest(["feature_0", "feature_1"]) != feature_ids_digest(["feature_0", "feature_2"])
+
+
+def test_feature_ids_digest_survives_the_csv_round_trip():
+    features = [{"type": "Feature", "id": i, "properties": {"nama": f"F{i}"},
+                 "geometry": {"type": "Point", "coordinates": [i, i]}} for i in range(5)]
+    features.append({"type": "Feature", "id": "x-1", "properties": {}, "geometry": None})
+    store = {}
+    df = read_geojson_dataframe(io.StringIO(json.dumps({"type": "FeatureCollection", "features": features})),
+                                geometry_store=store)
+    assert set(store) == {geometry_key(i) for i in range(5)}
+    edited = read_table(io.BytesIO(dataframe_to_csv_bytes(df)), "edited.csv")
+    assert "geometry_json" not in edited.columns
+    assert feature_ids_digest(edited["_feature_id"].tolist()) == feature_ids_digest(df["_feature_id"].tolist())
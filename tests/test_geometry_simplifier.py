@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from engine import GeometrySimplifier
+
+INT_POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [10, 0], [10, 10], [5, 11], [0, 10], [0, 0]]]}
+MIXED_LINE = {"type": "LineString", "coordinates": [[115, -8], [115.1234567, -8.7654321], [116, -9]]}
+
+
+@pytest.mark.parametrize("tolerance, precision", [(0.0, None), (0.0, 6), (0.5, None), (0.5, 3)])
+def test_integer_coordinates_are_written_as_ints(tolerance, precision):
+    simplifier = GeometrySimplifier(tolerance, precision)
+    [result] = simplifier.simplify_batch([INT_POLYGON])
+    assert json.dumps(result) == json.dumps(INT_POLYGON)
+    assert simplifier.stats["bytes_after"] <= simplifier.stats["bytes_before"]
+
+
+def test_only_changed_positions_are_rounded():
+    result = GeometrySimplifier(0.0, 3).simplify(MIXED_LINE)
+    assert result["coordinates"] == [[115, -8], [115.123, -8.765], [116, -9]]
+    assert all(isinstance(v, int) for v in result["coordinates"][0] + result["coordinates"][2])
+
+
+def test_simplified_parts_keep_their_original_vertices():
+    line = {"type": "LineString", "coordinates": [[0, 0], [1, 0.01], [2, 0], [3, 5], [4, 0]]}
+    result = GeometrySimplifier(0.1).simplify(line)
+    assert result["coordinates"] == [[0, 0], [2, 0], [3, 5], [4, 0]]
+    assert all(isinstance(v, int) for position in result["coordinates"] for v in position)
+    assert line["coordinates"][1] == [1, 0.01]  # the input is not modified
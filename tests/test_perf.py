@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+import perf
+
+
+@pytest.fixture
+def memory_level():
+    level = perf.get_level()
+    perf.set_level(perf.MEMORY)
+    yield
+    perf.set_level(level)
+
+
+def test_memory_stage_records_its_peak(memory_level):
+    records = []
+    perf.use_records(records)
+    with perf.stage("alloc"):
+        block = bytearray(4 << 20)
+        del block
+    assert records[-1]["stage"] == "alloc" and records[-1]["peak_mb"] >= 4
+
+
+def test_overlapping_memory_stages_on_two_threads_report_no_peak(memory_level):
+    entered, release = threading.Event(), threading.Event()
+    records = {}
+
+    def worker():
+        perf.use_records(records.setdefault("worker", []))
+        with perf.stage("worker"):
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    entered.wait(5)
+    perf.use_records(records.setdefault("main", []))
+    with perf.stage("main"):
+        release.set()
+        thread.join()
+    for name in ("worker", "main"):
+        record = records[name][-1]
+        assert record["peak_shared"] is True and "peak_mb" not in record
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from engine import style_columns, iter_styled_features
+from pipeline import bulk_apply_html_styling, make_styling_cache
+from styling import process_pipe_separated_data, extract_fields_from_pipe
+
+# GeoJSON properties can hold arrays and objects next to pipe-separated text.
+CELLS = [["a", "b"], {"Desa": "A"}, "Desa: B | Informasi: x", None, 0, [], "Desa: B | Informasi: x", ["a", "b"]]
+
+
+def expected_html(value, compact=False):
+    if isinstance(value, (list, dict)):
+        value = str(value)
+    return process_pipe_separated_data(value, compact)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_style_columns_styles_list_and_dict_cells_as_text(compact):
+    df = pd.DataFrame({"k": CELLS})
+    cache = make_styling_cache()
+    styled = style_columns(df, ["k"], cache, compact=compact)["k"]
+    assert styled.tolist() == [expected_html(v, compact) for v in CELLS]
+    # The stringified cells go through the shared cache like plain text.
+    assert cache.get((compact, str(["a", "b"]))) == expected_html(["a", "b"], compact)
+
+
+def test_bulk_apply_html_styling_with_list_and_dict_cells():
+    df = pd.DataFrame({"k": CELLS, "other": range(len(CELLS))})
+    out = bulk_apply_html_styling(df, ["k"], make_styling_cache(), field_columns=True)
+    assert out["k_styled"].tolist() == [expected_html(v) for v in CELLS]
+    assert out.loc[0, "k.Informasi"] == extract_fields_from_pipe(str(["a", "b"]))["Informasi"]
+    assert out.loc[2, "k.Desa"] == "B" and out.loc[2, "k.Informasi"] == "x"
+    assert out.loc[3, "k_styled"] == "" and out.loc[4, "k_styled"] == ""
+
+
+def test_iter_styled_features_with_list_and_dict_cells():
+    features = [{"type": "Feature", "properties": {"k": v}, "geometry": None} for v in CELLS]
+    styled = list(iter_styled_features(features, ["k"], make_styling_cache(), field_columns=True))
+    assert [f["properties"].get("k_styled", "") for f in styled] == [expected_html(v) for v in CELLS]
+    assert styled[0]["properties"]["k.Informasi"] == extract_fields_from_pipe(str(["a", "b"]))["Informasi"]